@@ -0,0 +1,372 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+
+from app import db
+from cache_service import bump_version, get_json, get_version, release_lock, set_json, try_lock
+from db_routing import primary_reads
+from db_upsert import upsert_increment
+from event_service import publish
+from models import TestCase, CodeAnalysis, Repository, Analytics, AnalyticsTechnologyCount
+from rollup_service import activity_series, count_source_rows, rebuild_rollups, record_activity, recent_bucket_starts
+from vulnerability_service import SEVERITIES, severity_counts
+
+ACTIVITY_WINDOW_DAYS = 30
+TOP_NOTCH_THRESHOLD = 8.0
+RECONCILE_DELAY = 60  # triggers within this many seconds share one reconciliation
+RECONCILE_LOCK_SECONDS = 900  # a queued reconciliation that never starts stops blocking new ones after this
+
+LANGUAGE_NAMES = {
+    'python': 'Python', 'javascript': 'JavaScript', 'typescript': 'TypeScript',
+    'java': 'Java', 'csharp': 'C#', 'php': 'PHP', 'ruby': 'Ruby',
+    'go': 'Go', 'rust': 'Rust', 'swift': 'Swift', 'kotlin': 'Kotlin'
+}
+
+
+def _test_case_stats(user_id):
+    """Counts and quality sums for a user's test cases.
+
+    Grouping on every column of ``ix_test_cases_user_stats`` lets the
+    database answer from the covering index in one ordered pass, without
+    reading test content or evaluating per-row expressions; the few hundred
+    groups are folded here.
+    """
+    rows = db.session.query(
+        TestCase.technology, TestCase.status, TestCase.quality_score, func.count()
+    ).filter(TestCase.user_id == user_id).group_by(
+        TestCase.technology, TestCase.status, TestCase.quality_score
+    ).all()
+
+    stats = {'total': 0, 'committed': 0, 'scored': 0, 'quality_sum': 0.0, 'top_notch': 0, 'technologies': {}}
+    for technology, status, quality_score, count in rows:
+        technology = technology or 'unknown'
+        stats['technologies'][technology] = stats['technologies'].get(technology, 0) + count
+        stats['total'] += count
+        if status == 'committed':
+            stats['committed'] += count
+        if quality_score:  # unscored (NULL/0) suites are left out of quality metrics
+            stats['scored'] += count
+            stats['quality_sum'] += quality_score * count
+            if quality_score >= TOP_NOTCH_THRESHOLD:
+                stats['top_notch'] += count
+    return stats
+
+
+def daily_activity(user_id, days=ACTIVITY_WINDOW_DAYS, now=None) -> Dict[str, Dict[str, int]]:
+    """Test cases and analyses per day counted from source rows, newest day first"""
+    starts = recent_bucket_starts('day', days, now)
+    counts = count_source_rows(user_id, 'day', starts)
+    return {
+        start.strftime('%Y-%m-%d'): {'test_cases': counts['test_cases'][index], 'analyses': counts['analyses'][index]}
+        for index, start in enumerate(starts)
+    }
+
+
+def compute_user_analytics(user_id, now=None) -> Dict[str, Any]:
+    """Compute a user's dashboard metrics with database-side aggregates"""
+    stats = _test_case_stats(user_id)
+
+    total_analyses, refactor_analyses, total_repos = db.session.execute(select(
+        select(func.count()).select_from(CodeAnalysis)
+        .where(CodeAnalysis.user_id == user_id).scalar_subquery(),
+        select(func.count()).select_from(CodeAnalysis)
+        .where(CodeAnalysis.user_id == user_id, CodeAnalysis.analysis_type == 'refactor').scalar_subquery(),
+        select(func.count()).select_from(Repository)
+        .where(Repository.user_id == user_id, Repository.vanished_at.is_(None)).scalar_subquery(),
+    )).one()
+
+    language_breakdown = {}
+    for technology, count in stats['technologies'].items():
+        language = LANGUAGE_NAMES.get(technology.lower(), technology.title())
+        language_breakdown[language] = language_breakdown.get(language, 0) + count
+
+    scored = stats['scored']
+    return {
+        'total_files_generated': stats['total'],
+        'total_commits': stats['committed'],
+        'total_repos': total_repos,
+        'total_analyses': total_analyses,
+        'average_quality_score': stats['quality_sum'] / scored if scored else 0,
+        'top_notch_percentage': stats['top_notch'] / scored * 100 if scored else 0,
+        'quality_score_sum': stats['quality_sum'],
+        'quality_score_count': scored,
+        'top_notch_count': stats['top_notch'],
+        'technology_breakdown': stats['technologies'],
+        'language_breakdown': language_breakdown,
+        'vulnerabilities': severity_counts(user_id),
+        'refactoring_suggestions_generated': refactor_analyses,
+        'daily_activity': daily_activity(user_id, now=now),
+    }
+
+
+# Write path: every generation, analysis and commit is recorded as atomic
+# increments in the caller's transaction, so concurrent requests and
+# workers never overwrite each other's counts. The caller commits.
+
+_CHANGED_USERS = 'analytics_changed_users'
+
+
+def mark_analytics_changed(user_id, delta: Dict[str, Any] = None):
+    """Bump the user's analytics version once the current transaction commits"""
+    changes = db.session.info.setdefault(_CHANGED_USERS, {}).setdefault(user_id, {})
+    for name, amount in (delta or {}).items():
+        changes[name] = changes.get(name, 0) + amount
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_changed_versions(session):
+    # Bumping only after commit means a reader can never cache
+    # pre-commit counters under the new version
+    # Imported here: report_service builds on this module
+    from report_service import schedule_report_pregeneration
+    for user_id, delta in session.info.pop(_CHANGED_USERS, {}).items():
+        version = bump_version(f'analytics:{user_id}')
+        # Doubles as the cache-invalidation notice for open dashboards
+        publish(user_id, 'analytics', {'version': version, 'delta': delta})
+        schedule_report_pregeneration(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_versions(session):
+    session.info.pop(_CHANGED_USERS, None)
+
+
+def _record(user_id, totals: Dict[str, Any], activity: Dict[str, int], when=None):
+    mark_analytics_changed(user_id, totals)
+    upsert_increment(Analytics, {'user_id': user_id}, totals, {'last_updated': datetime.utcnow()})
+    if activity:
+        record_activity(user_id, activity, when)
+
+
+def record_test_generated(user_id, technology, quality_score=None, when=None):
+    """Count a newly saved test suite"""
+    totals = {'total_files_generated': 1}
+    if quality_score:
+        totals.update(
+            quality_score_sum=quality_score,
+            quality_score_count=1,
+            top_notch_count=1 if quality_score >= TOP_NOTCH_THRESHOLD else 0
+        )
+    _record(user_id, totals, {'test_cases': 1}, when)
+    upsert_increment(AnalyticsTechnologyCount, {'user_id': user_id, 'technology': technology or 'unknown'}, {'count': 1})
+
+    if quality_score:
+        db.session.execute(
+            update(Analytics).where(Analytics.user_id == user_id).values(
+                average_quality_score=Analytics.quality_score_sum / Analytics.quality_score_count,
+                top_notch_percentage=Analytics.top_notch_count * 100.0 / Analytics.quality_score_count
+            )
+        )
+
+
+def record_analysis(user_id, analysis_type, severities: Iterable[str] = (), when=None):
+    """Count a saved code analysis and the severities of its findings"""
+    totals = {'total_analyses': 1}
+    if analysis_type == 'refactor':
+        totals['refactoring_suggestions_generated'] = 1
+    for severity in severities:
+        if severity in SEVERITIES:
+            counter = f'{severity}_vulnerabilities_found'
+            totals[counter] = totals.get(counter, 0) + 1
+    _record(user_id, totals, {'analyses': 1}, when)
+
+
+def record_commit(user_id, when=None):
+    """Count tests committed to a repository"""
+    _record(user_id, {'total_commits': 1}, {'commits': 1}, when)
+
+
+def record_repository_total(user_id):
+    """Set the repository total from the repositories table in one statement"""
+    mark_analytics_changed(user_id)
+    total = (
+        select(func.count()).select_from(Repository)
+        .where(Repository.user_id == user_id, Repository.vanished_at.is_(None))
+        .scalar_subquery()
+    )
+    upsert_increment(Analytics, {'user_id': user_id}, {}, {'total_repos': total, 'last_updated': datetime.utcnow()})
+
+
+# Read path
+
+def get_user_analytics(user_id, now=None) -> Dict[str, Any]:
+    """Dashboard metrics from the maintained counters.
+
+    Reads the user's counter row, technology rows and the day buckets of
+    the activity window. Counters that have never been reconciled (new
+    users, or rows from before the counters existed) are rebuilt first.
+    """
+    analytics = Analytics.query.filter_by(user_id=user_id).first()
+    if analytics is None or analytics.reconciled_at is None:
+        reconcile_user_analytics(user_id, now=now)
+        db.session.commit()
+        analytics = Analytics.query.filter_by(user_id=user_id).first()
+
+    technology_breakdown = {
+        row.technology: row.count
+        for row in AnalyticsTechnologyCount.query.filter_by(user_id=user_id)
+        if row.count
+    }
+    language_breakdown = {}
+    for technology, count in technology_breakdown.items():
+        language = LANGUAGE_NAMES.get(technology.lower(), technology.title())
+        language_breakdown[language] = language_breakdown.get(language, 0) + count
+
+    now = now or datetime.utcnow()
+    series = activity_series(
+        user_id, 'day', now - timedelta(days=ACTIVITY_WINDOW_DAYS - 1), now, ('test_cases', 'analyses')
+    )
+    daily = {
+        bucket['start'][:10]: {'test_cases': bucket['test_cases'], 'analyses': bucket['analyses']}
+        for bucket in reversed(series)
+    }
+
+    scored = analytics.quality_score_count or 0
+    return {
+        'total_files_generated': analytics.total_files_generated or 0,
+        'total_commits': analytics.total_commits or 0,
+        'total_repos': analytics.total_repos or 0,
+        'total_analyses': analytics.total_analyses or 0,
+        'average_quality_score': (analytics.quality_score_sum or 0.0) / scored if scored else 0,
+        'top_notch_percentage': (analytics.top_notch_count or 0) / scored * 100 if scored else 0,
+        'technology_breakdown': technology_breakdown,
+        'language_breakdown': language_breakdown,
+        'vulnerabilities': {
+            severity: getattr(analytics, f'{severity}_vulnerabilities_found') or 0 for severity in SEVERITIES
+        },
+        'refactoring_suggestions_generated': analytics.refactoring_suggestions_generated or 0,
+        'daily_activity': daily,
+        'last_updated': analytics.last_updated.isoformat() if analytics.last_updated else None,
+    }
+
+
+def performance_indicators(metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """Scores derived from the dashboard metrics"""
+    average_quality = metrics['average_quality_score']
+    serious = metrics['vulnerabilities']['critical'] + metrics['vulnerabilities']['high']
+    return {
+        'productivity_score': round(
+            (metrics['total_files_generated'] + metrics['total_analyses']) / max(metrics['total_repos'], 1), 2
+        ),
+        'quality_trend': (
+            'improving' if average_quality > 7.0 else 'stable' if average_quality > 5.0 else 'needs_improvement'
+        ),
+        'security_health': 'excellent' if serious == 0 else 'good' if serious <= 2 else 'needs_attention',
+    }
+
+
+def analytics_etag(user_id, now=None):
+    """Validator for the user's analytics; changes on every recorded write and at midnight UTC.
+
+    Returns ``None`` when the cache is unavailable.
+    """
+    version = get_version(f'analytics:{user_id}')
+    if version is None:
+        return None
+    return f"analytics-{user_id}-{version}-{(now or datetime.utcnow()):%Y%m%d}"
+
+
+def get_cached_user_analytics(user_id, etag):
+    """``get_user_analytics`` cached under its validator.
+
+    Returns ``(metrics, etag)``. If the version moved while loading (a
+    concurrent write, or the reconcile of a user's first read) the result
+    is neither cached nor given a validator, so it can never be revalidated
+    as current later. Cache fills read the primary: a lagging replica's
+    counters cached under the new validator would be served until the next
+    write.
+    """
+    if etag is None:
+        return get_user_analytics(user_id), None
+
+    metrics = get_json(f'analytics:{etag}')
+    if metrics is None:
+        with primary_reads():
+            metrics = get_user_analytics(user_id)
+        if analytics_etag(user_id) != etag:
+            return metrics, None
+        set_json(f'analytics:{etag}', metrics)
+    return metrics, etag
+
+
+@primary_reads()
+def reconcile_user_analytics(user_id, now=None):
+    """Rebuild a user's counters from the source tables to repair drift.
+
+    Totals and technology counts are recomputed with
+    ``compute_user_analytics`` and recent activity rollups with
+    ``rebuild_rollups``. Commits are only ever recorded as events (a GitHub
+    commit has no row of its own), so ``total_commits`` and commit rollups
+    are kept as they are. The caller commits.
+
+    The counter row is locked before the source tables are read. Every
+    recorded write increments that row first, so a concurrent write either
+    commits before the reads see its rows or waits for this transaction and
+    adds on top of the rebuilt counts; none is overwritten.
+    """
+    mark_analytics_changed(user_id)
+    created = db.session.query(Analytics.id).filter_by(user_id=user_id).first() is None
+    upsert_increment(Analytics, {'user_id': user_id}, {}, {'last_updated': datetime.utcnow()})
+    metrics = compute_user_analytics(user_id, now=now)
+
+    analytics = Analytics.query.filter_by(user_id=user_id).populate_existing().one()
+    if created:
+        analytics.total_commits = metrics['total_commits']
+
+    analytics.total_files_generated = metrics['total_files_generated']
+    analytics.total_repos = metrics['total_repos']
+    analytics.total_analyses = metrics['total_analyses']
+    analytics.quality_score_count = metrics['quality_score_count']
+    analytics.quality_score_sum = metrics['quality_score_sum']
+    analytics.top_notch_count = metrics['top_notch_count']
+    analytics.average_quality_score = metrics['average_quality_score']
+    analytics.top_notch_percentage = metrics['top_notch_percentage']
+    analytics.technology_breakdown = metrics['technology_breakdown']
+    analytics.language_breakdown = metrics['language_breakdown']
+    analytics.refactoring_suggestions_generated = metrics['refactoring_suggestions_generated']
+    for severity, count in metrics['vulnerabilities'].items():
+        setattr(analytics, f'{severity}_vulnerabilities_found', count)
+    analytics.last_updated = analytics.reconciled_at = datetime.utcnow()
+
+    AnalyticsTechnologyCount.query.filter_by(user_id=user_id).delete()
+    db.session.add_all([
+        AnalyticsTechnologyCount(user_id=user_id, technology=technology, count=count)
+        for technology, count in metrics['technology_breakdown'].items()
+    ])
+
+    rebuild_rollups(user_id, now=now)
+
+
+def _reconcile_lock(user_id):
+    return f'analytics:reconcile:{user_id}'
+
+
+def schedule_reconcile(user_id) -> bool:
+    """Queue a delayed counter reconciliation unless one is already pending for the user.
+
+    The first trigger takes a per-user lock and queues
+    ``update_user_analytics`` RECONCILE_DELAY seconds out; later triggers
+    find the lock held and are covered by that task, which releases the
+    lock as it starts. Returns whether a task was queued. The lock lives in
+    the shared cache, so web processes and workers share it.
+    """
+    if not try_lock(_reconcile_lock(user_id), RECONCILE_LOCK_SECONDS):
+        return False
+
+    # Imported here: tasks imports this module
+    from tasks import update_user_analytics
+    try:
+        update_user_analytics.apply_async((user_id,), countdown=RECONCILE_DELAY)
+    except Exception as e:
+        logging.error(f"Failed to queue analytics reconciliation for user {user_id}: {e}")
+        release_lock(_reconcile_lock(user_id))
+        return False
+    return True
+
+
+def reconcile_started(user_id):
+    """Let triggers from now on queue a fresh reconciliation; call as the task starts"""
+    release_lock(_reconcile_lock(user_id))
@@ -5,13 +5,16 @@ from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 
+from config import configure_engine, engine_options, replica_binds
+from db_routing import RoutingSession
+
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 
 class Base(DeclarativeBase):
     pass
 
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
 
 # Create the app
 app = Flask(__name__)
@@ -20,21 +23,27 @@ app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
 # Configure the database
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///github_test_generator.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+app.config["SQLALCHEMY_BINDS"] = replica_binds(os.environ.get("DATABASE_REPLICA_URLS"))
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
 # Initialize the app with the extension
 db.init_app(app)
 
 with app.app_context():
+    for engine in db.engines.values():
+        configure_engine(engine)
+
     # Import models to ensure tables are created
     import models  # noqa: F401
+    # Registers the full-text index DDL and its maintenance on flush
+    import search_service  # noqa: F401
     db.create_all()
     logging.info("Database tables created")
 
+    from schema_upgrade import upgrade_schema
+    upgrade_schema()
+
 
 
 
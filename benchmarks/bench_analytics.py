@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Benchmark the /api/analytics endpoint for a user with a large history.
+
+Usage: python benchmarks/bench_analytics.py [--rows 100000] [--requests 50] [--budget-ms 50]
+
+Seeds a throwaway SQLite database (or DATABASE_URL if set) with ``--rows``
+test cases and ``--rows`` code analyses for one user, spread over 90 days,
+then times the endpoint through the Flask test client. The rows are bulk
+inserted without analytics events, so the first request also reconciles the
+user's counters. Exits non-zero if the median response time exceeds the
+budget.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from app import app, db  # noqa: E402
+from models import User, Repository, TestCase, CodeAnalysis  # noqa: E402
+import routes  # noqa: E402,F401
+
+BATCH_SIZE = 10000
+TECHNOLOGIES = ('python', 'javascript', 'typescript', 'java', 'go')
+# Realistically sized Text columns; the aggregates must not have to read them
+TEST_CONTENT = "def test_example():\n    assert True\n" * 60
+SOURCE_CODE = "def example(value):\n    return value\n" * 60
+
+
+def seed(user_id, repository_id, rows):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    for start in range(0, rows, BATCH_SIZE):
+        size = min(BATCH_SIZE, rows - start)
+        test_cases, analyses = [], []
+        for offset in range(size):
+            created_at = now - timedelta(minutes=rng.randrange(90 * 24 * 60))
+            test_cases.append({
+                'user_id': user_id, 'repository_id': repository_id,
+                'file_path': f'src/module_{start + offset}.py', 'test_content': TEST_CONTENT,
+                'technology': rng.choice(TECHNOLOGIES), 'quality_score': round(rng.uniform(3, 10), 1),
+                'status': 'committed' if rng.random() < 0.3 else 'generated', 'created_at': created_at,
+            })
+            analyses.append({
+                'user_id': user_id, 'repository_id': repository_id,
+                'file_path': f'src/module_{start + offset}.py',
+                'analysis_type': rng.choice(('refactor', 'vulnerability')),
+                'original_code': SOURCE_CODE, 'analysis_result': 'report', 'created_at': created_at,
+            })
+        db.session.execute(TestCase.__table__.insert(), test_cases)
+        db.session.execute(CodeAnalysis.__table__.insert(), analyses)
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--budget-ms', type=float, default=50.0)
+    args = parser.parse_args()
+
+    with app.app_context():
+        user = User(github_id='bench', username='bench', access_token='bench')
+        db.session.add(user)
+        db.session.flush()
+        repo = Repository(github_id='bench', user_id=user.id, name='bench', full_name='bench/bench',
+                          clone_url='', html_url='')
+        db.session.add(repo)
+        db.session.commit()
+        user_id, repository_id = user.id, repo.id
+
+        started = time.perf_counter()
+        seed(user_id, repository_id, args.rows)
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+        print(f"Seeded {args.rows} test cases and {args.rows} analyses in {time.perf_counter() - started:.1f}s")
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['access_token'] = 'bench'
+        session['user_id'] = user_id
+
+    timings = []
+    for _ in range(args.requests):
+        started = time.perf_counter()
+        response = client.get('/api/analytics')
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.get_json()
+
+    payload = response.get_json()
+    assert payload['total_files_generated'] == args.rows
+    timings.sort()
+    median = statistics.median(timings)
+    print(f"/api/analytics: median {median:.1f} ms, p95 {timings[int(len(timings) * 0.95) - 1]:.1f} ms")
+
+    if median > args.budget_ms:
+        print(f"FAIL: median exceeds the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Measure the space saved by moving test and analysis text into content blobs.
+
+Usage: python benchmarks/bench_blob_storage.py [--files 500] [--test-cases 20000] [--analyses 5000] [--min-saved 50]
+
+Seeds a throwaway SQLite database (or DATABASE_URL if set) the way older
+releases wrote it, with every row's text inline: test suites are
+regenerated for a fixed set of source files, so many suites repeat, and
+every analysis stores the full source it looked at. Then runs the blob
+migration and compares the logical text bytes and the on-disk size of the
+database before and after. Exits non-zero if less than ``--min-saved``
+percent of the on-disk size was saved.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from sqlalchemy import func, select, text  # noqa: E402
+
+from app import app, db  # noqa: E402
+from models import User, Repository, TestCase, CodeAnalysis, ContentBlob  # noqa: E402
+from blob_service import BLOB_COLUMNS, migrate_inline_content  # noqa: E402
+
+BATCH_SIZE = 5000
+WORDS = ('user', 'repo', 'token', 'cache', 'score', 'file', 'path', 'result', 'count', 'items', 'config', 'value')
+
+
+def fake_module(rng, functions=12):
+    """A few KB of plausible Python source"""
+    lines = []
+    for index in range(functions):
+        name = '_'.join(rng.sample(WORDS, 2))
+        args = ', '.join(rng.sample(WORDS, 3))
+        lines += [
+            f"def {name}_{index}({args}):",
+            f"    \"\"\"Compute the {rng.choice(WORDS)} for {rng.choice(WORDS)}\"\"\"",
+            f"    {rng.choice(WORDS)} = {{{', '.join(repr(w) for w in rng.sample(WORDS, 4))}}}",
+            f"    for {rng.choice(WORDS)} in range({rng.randrange(100)}):",
+            f"        if {rng.choice(WORDS)} > {rng.randrange(1000)}:",
+            f"            return {rng.choice(WORDS)}",
+            f"    return None",
+            "",
+        ]
+    return '\n'.join(lines)
+
+
+def fake_suite(rng, source):
+    tests = [
+        f"def test_{line.split('(')[0][4:]}():\n    assert {line.split('(')[0][4:]}(1, 2, 3) is not None\n"
+        for line in source.splitlines() if line.startswith('def ')
+    ]
+    return 'import pytest\n\n' + '\n'.join(rng.sample(tests, len(tests)))
+
+
+def seed(user_id, repository_id, args):
+    rng = random.Random(42)
+    sources = [fake_module(rng) for _ in range(args.files)]
+    # A handful of suites per file: regenerations often produce the same one
+    suites = [[fake_suite(rng, source) for _ in range(3)] for source in sources]
+    reports = [f"<h3>Refactoring</h3><p>Extract {word} handling.</p>" * 5 for word in WORDS]
+
+    for start in range(0, args.test_cases, BATCH_SIZE):
+        rows = []
+        for _ in range(min(BATCH_SIZE, args.test_cases - start)):
+            file_index = rng.randrange(args.files)
+            rows.append({
+                'user_id': user_id, 'repository_id': repository_id, 'file_path': f'src/module_{file_index}.py',
+                'test_content': rng.choice(suites[file_index]), 'technology': 'python', 'status': 'generated',
+            })
+        db.session.execute(TestCase.__table__.insert(), rows)
+    for start in range(0, args.analyses, BATCH_SIZE):
+        rows = []
+        for _ in range(min(BATCH_SIZE, args.analyses - start)):
+            file_index = rng.randrange(args.files)
+            rows.append({
+                'user_id': user_id, 'repository_id': repository_id, 'file_path': f'src/module_{file_index}.py',
+                'analysis_type': 'refactor', 'original_code': sources[file_index],
+                'analysis_result': rng.choice(reports),
+            })
+        db.session.execute(CodeAnalysis.__table__.insert(), rows)
+    db.session.commit()
+
+
+def text_bytes():
+    """Bytes of text held inline plus the compressed bytes held in blobs"""
+    inline = 0
+    for model, columns in BLOB_COLUMNS.items():
+        for column in columns:
+            inline += db.session.scalar(select(func.coalesce(func.sum(func.length(getattr(model, f'{column}_inline'))), 0)))
+    blobs = db.session.scalar(select(func.coalesce(func.sum(func.length(ContentBlob.data)), 0)))
+    return inline, blobs
+
+
+def disk_bytes():
+    """Database size after reclaiming free space"""
+    db.session.commit()
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        if db.engine.dialect.name == 'postgresql':
+            tables = [TestCase.__tablename__, CodeAnalysis.__tablename__, ContentBlob.__tablename__]
+            total = 0
+            for table in tables:
+                connection.execute(text(f'VACUUM FULL {table}'))
+                total += connection.execute(text(f"SELECT pg_total_relation_size('{table}')")).scalar()
+            return total
+        connection.execute(text('VACUUM'))
+        page_count = connection.execute(text('PRAGMA page_count')).scalar()
+        return page_count * connection.execute(text('PRAGMA page_size')).scalar()
+
+
+def mb(size):
+    return f"{size / 2 ** 20:.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=500)
+    parser.add_argument('--test-cases', type=int, default=20000)
+    parser.add_argument('--analyses', type=int, default=5000)
+    parser.add_argument('--min-saved', type=float, default=50.0)
+    args = parser.parse_args()
+
+    with app.app_context():
+        user = User(github_id='bench', username='bench', access_token='bench')
+        db.session.add(user)
+        db.session.flush()
+        repo = Repository(github_id='bench', user_id=user.id, name='bench', full_name='bench/bench',
+                          clone_url='', html_url='')
+        db.session.add(repo)
+        db.session.commit()
+
+        seed(user.id, repo.id, args)
+        inline_before, _ = text_bytes()
+        disk_before = disk_bytes()
+        print(f"Seeded {args.test_cases} test cases and {args.analyses} analyses over {args.files} files")
+        print(f"Before: {mb(inline_before)} of inline text, {mb(disk_before)} on disk")
+
+        started = time.perf_counter()
+        for model, columns in BLOB_COLUMNS.items():
+            for column in columns:
+                after_id = migrate_inline_content(model, column, batch_size=1000)
+                while after_id:
+                    after_id = migrate_inline_content(model, column, batch_size=1000, after_id=after_id)
+        elapsed = time.perf_counter() - started
+
+        inline_after, blob_bytes = text_bytes()
+        disk_after = disk_bytes()
+        blobs = db.session.scalar(select(func.count()).select_from(ContentBlob))
+        print(f"Migrated in {elapsed:.1f}s into {blobs} distinct blobs")
+        print(f"After: {mb(inline_after)} inline, {mb(blob_bytes)} compressed in blobs, {mb(disk_after)} on disk")
+
+        saved = 100 * (1 - disk_after / disk_before)
+        print(f"Text bytes saved: {100 * (1 - (inline_after + blob_bytes) / inline_before):.1f}%, "
+              f"on-disk size saved: {saved:.1f}%")
+        if saved < args.min_saved:
+            print(f"FAIL: saved less than {args.min_saved:.0f}% of the database size")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
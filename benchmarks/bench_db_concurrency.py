@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Benchmark SQLite write throughput under concurrent worker processes.
+
+Usage: python benchmarks/bench_db_concurrency.py [--workers 8] [--readers 4] [--seconds 10] [--max-failures 0]
+
+Mimics a single-node gunicorn deployment on the default SQLite file: each
+of ``--workers`` processes opens its own engine and commits small write
+transactions (insert a test case, bump the repository's sync time) while
+``--readers`` processes run the dashboard's recent-test-cases query. This
+runs twice on fresh database files, once with the old engine options
+(rollback journal, driver defaults) and once with ``config.engine_options``
+plus the SQLite pragmas from ``config.configure_engine``. Reports committed
+writes per second, "database is locked" failures and the p99 commit
+latency. Exits non-zero if the tuned profile fails more than
+``--max-failures`` writes.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from sqlalchemy import create_engine, select, update  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from app import db  # noqa: E402
+from config import configure_engine, engine_options  # noqa: E402
+from models import User, Repository, TestCase  # noqa: E402
+
+LEGACY_OPTIONS = {"pool_recycle": 300, "pool_pre_ping": True}
+TEST_CONTENT = "def test_example():\n    assert True\n" * 8
+READ_LIMIT = 20
+
+
+def make_engine(url, tuned):
+    if not tuned:
+        return create_engine(url, **LEGACY_OPTIONS)
+    engine = create_engine(url, **engine_options(url))
+    configure_engine(engine)
+    return engine
+
+
+def writer(url, tuned, deadline, results):
+    engine = make_engine(url, tuned)
+    latencies, failures = [], 0
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            with engine.begin() as connection:
+                connection.execute(TestCase.__table__.insert().values(
+                    user_id=1, repository_id=1, file_path=f'src/module_{os.getpid()}.py',
+                    test_content=TEST_CONTENT, technology='python', status='generated', created_at=datetime.utcnow()
+                ))
+                connection.execute(
+                    update(Repository.__table__).where(Repository.__table__.c.id == 1)
+                    .values(cache_updated_at=datetime.utcnow())
+                )
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            failures += 1
+    engine.dispose()
+    results.put(('writer', latencies, failures))
+
+
+def reader(url, tuned, deadline, results):
+    engine = make_engine(url, tuned)
+    table = TestCase.__table__
+    query = (
+        select(table.c.id, table.c.file_path, table.c.created_at)
+        .where(table.c.user_id == 1).order_by(table.c.created_at.desc()).limit(READ_LIMIT)
+    )
+    reads, failures = 0, 0
+    while time.time() < deadline:
+        try:
+            with engine.connect() as connection:
+                connection.execute(query).all()
+            reads += 1
+        except OperationalError:
+            failures += 1
+    engine.dispose()
+    results.put(('reader', reads, failures))
+
+
+def run(name, tuned, args):
+    url = f"sqlite:///{tempfile.mkdtemp()}/concurrency.db"
+    engine = make_engine(url, tuned)
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert().values(id=1, github_id='bench', username='bench',
+                                                          access_token='bench'))
+        connection.execute(Repository.__table__.insert().values(id=1, github_id='bench', user_id=1, name='bench',
+                                                                full_name='bench/bench', clone_url='', html_url=''))
+    engine.dispose()
+
+    results = multiprocessing.Queue()
+    deadline = time.time() + args.seconds
+    processes = [multiprocessing.Process(target=writer, args=(url, tuned, deadline, results))
+                 for _ in range(args.workers)]
+    processes += [multiprocessing.Process(target=reader, args=(url, tuned, deadline, results))
+                  for _ in range(args.readers)]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = sorted(latency for kind, values, _ in outcomes if kind == 'writer' for latency in values) or [0.0]
+    writes = len(latencies) if latencies != [0.0] else 0
+    write_failures = sum(failures for kind, _, failures in outcomes if kind == 'writer')
+    reads = sum(values for kind, values, _ in outcomes if kind == 'reader')
+    read_failures = sum(failures for kind, _, failures in outcomes if kind == 'reader')
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name}: {writes / args.seconds:,.0f} writes/s, {write_failures} failed, "
+          f"p99 commit {p99 * 1000:.0f} ms; {reads / args.seconds:,.0f} reads/s, {read_failures} failed")
+    return write_failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--max-failures', type=int, default=0)
+    args = parser.parse_args()
+
+    run('legacy', False, args)
+    failures = run('tuned', True, args)
+    if failures > args.max_failures:
+        print(f"FAIL: the tuned profile failed {failures} writes with \"database is locked\"")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
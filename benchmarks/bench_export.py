@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Benchmark memory use of the streaming export endpoint.
+
+Usage: python benchmarks/bench_export.py [--rows 1000000] [--format ndjson] [--gzip] [--budget-mb 32]
+
+Seeds a throwaway SQLite database (or DATABASE_URL if set) with ``--rows``
+test cases for one user, then streams /api/export/test-cases through the
+Flask test client without buffering the body, sampling the process RSS as
+chunks arrive. Exits non-zero if RSS grows by more than the budget between
+the first sample (after the first chunk) and the end of the stream.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from app import app, db  # noqa: E402
+from models import User, Repository, TestCase  # noqa: E402
+import routes  # noqa: E402,F401
+
+BATCH_SIZE = 20000
+SAMPLE_EVERY = 20  # chunks
+TECHNOLOGIES = ('python', 'javascript', 'typescript', 'java', 'go')
+TEST_CONTENT = "def test_example():\n    assert True\n" * 8
+
+
+def rss_mb():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def seed(user_id, repository_id, rows):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    for start in range(0, rows, BATCH_SIZE):
+        size = min(BATCH_SIZE, rows - start)
+        db.session.execute(TestCase.__table__.insert(), [{
+            'user_id': user_id, 'repository_id': repository_id,
+            'file_path': f'src/module_{start + offset}.py', 'test_content': TEST_CONTENT,
+            'technology': rng.choice(TECHNOLOGIES), 'quality_score': round(rng.uniform(3, 10), 1),
+            'edge_cases': ['null', 'empty'], 'status': 'generated',
+            'created_at': now - timedelta(minutes=rng.randrange(365 * 24 * 60)),
+        } for offset in range(size)])
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--format', choices=('ndjson', 'csv'), default='ndjson')
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--budget-mb', type=float, default=32.0)
+    args = parser.parse_args()
+
+    with app.app_context():
+        user = User(github_id='bench', username='bench', access_token='bench')
+        db.session.add(user)
+        db.session.flush()
+        repo = Repository(github_id='bench', user_id=user.id, name='bench', full_name='bench/bench',
+                          clone_url='', html_url='')
+        db.session.add(repo)
+        db.session.commit()
+        user_id = user.id
+
+        started = time.perf_counter()
+        seed(user_id, repo.id, args.rows)
+        print(f"Seeded {args.rows} test cases in {time.perf_counter() - started:.1f}s")
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['access_token'] = 'bench'
+        session['user_id'] = user_id
+
+    url = f"/api/export/test-cases?format={args.format}{'&gzip=true' if args.gzip else ''}"
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    assert response.status_code == 200
+
+    samples, size, lines = [], 0, 0
+    for index, chunk in enumerate(response.response):
+        size += len(chunk)
+        if not args.gzip:
+            lines += chunk.count(b'\n') if isinstance(chunk, bytes) else chunk.count('\n')
+        if index % SAMPLE_EVERY == 0:
+            samples.append(rss_mb())
+    response.close()
+    samples.append(rss_mb())
+    elapsed = time.perf_counter() - started
+
+    if not args.gzip:
+        assert lines >= args.rows, f"expected {args.rows} rows, streamed {lines} lines"
+    growth = samples[-1] - samples[0]
+    print(f"Streamed {size / 2 ** 20:.1f} MB in {elapsed:.1f}s ({args.rows / elapsed:,.0f} rows/s)")
+    print(f"RSS: first {samples[0]:.1f} MB, peak {max(samples):.1f} MB, last {samples[-1]:.1f} MB, "
+          f"growth {growth:+.1f} MB over {len(samples)} samples")
+
+    if max(samples) - samples[0] > args.budget_mb:
+        print(f"FAIL: RSS grew by more than {args.budget_mb:.0f} MB while streaming")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
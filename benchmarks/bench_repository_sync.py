@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Benchmark the repository sync against a large organisation.
+
+Usage: python benchmarks/bench_repository_sync.py [--repos 5000] [--max-statements 100]
+
+Runs the old per-repository sync loop from tasks.sync_repositories and
+``repository_sync_service.sync_user_repositories`` on a throwaway SQLite
+database (or DATABASE_URL if set), each for a first sync of ``--repos``
+repositories and a re-sync where 5% changed, 1% disappeared and 1% are new.
+Reports wall time and the number of statements sent. Exits non-zero if a
+set-based sync sends more than ``--max-statements``.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from sqlalchemy import delete, event  # noqa: E402
+
+from app import app, db  # noqa: E402
+from models import User, Repository  # noqa: E402
+from analytics_service import record_repository_total  # noqa: E402
+from repository_sync_service import sync_user_repositories  # noqa: E402
+
+
+def listing(repos, changed=0.0, vanished=0.0, added=0.0):
+    """A GitHub /user/repos listing; the fractions edit it like a day of org activity"""
+    removed = int(repos * vanished)
+    data = []
+    for github_id in range(removed, repos + int(repos * added)):
+        name = f'service-{github_id}'
+        data.append({
+            'id': github_id, 'name': name, 'full_name': f'bench-org/{name}',
+            'description': 'changed' if github_id < removed + repos * changed else f'Service {github_id}',
+            'language': 'Python', 'private': True,
+            'clone_url': f'https://github.com/bench-org/{name}.git', 'html_url': f'https://github.com/bench-org/{name}',
+        })
+    return data
+
+
+def legacy_sync(user_id, repos_data):
+    """The loop tasks.sync_repositories ran before the set-based sync"""
+    for repo_data in repos_data:
+        existing_repo = Repository.query.filter_by(github_id=str(repo_data['id']), user_id=user_id).first()
+        if existing_repo:
+            existing_repo.name = repo_data['name']
+            existing_repo.description = repo_data.get('description')
+            existing_repo.language = repo_data.get('language')
+            existing_repo.cache_updated_at = datetime.utcnow()
+        else:
+            db.session.add(Repository(
+                github_id=str(repo_data['id']), user_id=user_id, name=repo_data['name'],
+                full_name=repo_data['full_name'], description=repo_data.get('description'),
+                language=repo_data.get('language'), private=repo_data.get('private', False),
+                clone_url=repo_data['clone_url'], html_url=repo_data['html_url'], cache_updated_at=datetime.utcnow()
+            ))
+    db.session.flush()
+    record_repository_total(user_id)
+
+
+def measure(name, sync, user_id, repos_data):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    started = time.perf_counter()
+    try:
+        sync(user_id, repos_data)
+        db.session.commit()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    elapsed = time.perf_counter() - started
+    db.session.expunge_all()
+    print(f"{name}: {len(repos_data)} repositories in {elapsed * 1000:.0f} ms, {len(statements)} statements")
+    return len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repos', type=int, default=5000)
+    parser.add_argument('--max-statements', type=int, default=100)
+    args = parser.parse_args()
+
+    with app.app_context():
+        user = User(github_id='bench', username='bench', access_token='bench')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        first, resync = listing(args.repos), listing(args.repos, changed=0.05, vanished=0.01, added=0.01)
+
+        measure('legacy first sync', legacy_sync, user_id, first)
+        measure('legacy re-sync', legacy_sync, user_id, resync)
+        db.session.execute(delete(Repository).where(Repository.user_id == user_id))
+        db.session.commit()
+
+        worst = max(
+            measure('set-based first sync', sync_user_repositories, user_id, first),
+            measure('set-based re-sync', sync_user_repositories, user_id, resync),
+        )
+        remaining = Repository.query.filter_by(user_id=user_id).count()
+        assert remaining == len(resync), f"expected {len(resync)} repositories, found {remaining}"
+
+        if worst > args.max_statements:
+            print(f"FAIL: a set-based sync sent more than {args.max_statements} statements")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Benchmark retention cleanup throughput and how long it blocks other writers.
+
+Usage: python benchmarks/bench_retention.py [--rows 100000] [--batch-size 1000] [--archive] [--skip-legacy] [--budget-ms 500]
+
+Seeds a throwaway SQLite database (or DATABASE_URL if set) with ``--rows``
+expired test cases, each with a source fingerprint and LSH bands, then
+deletes them twice on identical seeds: the old way (load every row through
+the ORM and delete it in one transaction) and with
+``retention_service.purge_expired``. During each run a second thread
+inserts a fresh test case every 20 ms and records how long each insert
+waited, which is the lock time other writers see. Exits non-zero if the
+longest batched transaction exceeds the budget.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from sqlalchemy import delete, func, select  # noqa: E402
+
+from app import app, db  # noqa: E402
+from models import User, Repository, TestCase, SourceFingerprint, SourceFingerprintBand  # noqa: E402
+from blob_service import store_blob  # noqa: E402
+from retention_service import purge_expired  # noqa: E402
+
+SEED_BATCH = 10000
+BANDS = 4
+PROBE_INTERVAL = 0.02
+TEST_CONTENT = "def test_example():\n    assert True\n" * 8
+
+
+def seed(user_id, repository_id, rows):
+    content_hash = store_blob(TEST_CONTENT).hash
+    created_at = datetime.utcnow() - timedelta(days=90)
+    next_id = (db.session.scalar(select(func.max(TestCase.id))) or 0) + 1
+    for start in range(0, rows, SEED_BATCH):
+        ids = range(next_id + start, next_id + min(start + SEED_BATCH, rows))
+        db.session.execute(TestCase.__table__.insert(), [{
+            'id': test_case_id, 'user_id': user_id, 'repository_id': repository_id,
+            'file_path': f'src/module_{test_case_id}.py', 'test_content': '', 'test_content_hash': content_hash,
+            'technology': 'python', 'status': 'generated', 'created_at': created_at,
+        } for test_case_id in ids])
+        db.session.execute(SourceFingerprint.__table__.insert(), [{
+            'id': test_case_id, 'test_case_id': test_case_id, 'user_id': user_id,
+            'content_hash': f'{test_case_id:064x}', 'signature': [test_case_id] * 8, 'created_at': created_at,
+        } for test_case_id in ids])
+        db.session.execute(SourceFingerprintBand.__table__.insert(), [{
+            'fingerprint_id': test_case_id, 'user_id': user_id, 'band': band, 'bucket': test_case_id * BANDS + band,
+        } for test_case_id in ids for band in range(BANDS)])
+        db.session.commit()
+
+
+def legacy_cleanup(cutoff):
+    """The cleanup task before batching"""
+    old_test_cases = TestCase.query.filter(TestCase.created_at < cutoff).all()
+    for test_case in old_test_cases:
+        db.session.delete(test_case)
+    db.session.commit()
+    return len(old_test_cases)
+
+
+class WriterProbe(threading.Thread):
+    """Inserts a test case every ``PROBE_INTERVAL`` seconds and records each wait"""
+
+    def __init__(self, user_id, repository_id):
+        super().__init__(daemon=True)
+        self.user_id, self.repository_id = user_id, repository_id
+        self.waits, self.failures = [], 0
+        self.stopping = threading.Event()
+
+    def run(self):
+        with app.app_context():
+            while not self.stopping.is_set():
+                started = time.perf_counter()
+                try:
+                    db.session.execute(TestCase.__table__.insert().values(
+                        user_id=self.user_id, repository_id=self.repository_id, file_path='probe.py',
+                        test_content='probe', technology='python', created_at=datetime.utcnow()
+                    ))
+                    db.session.commit()
+                    self.waits.append(time.perf_counter() - started)
+                except Exception:
+                    db.session.rollback()
+                    self.failures += 1
+                time.sleep(PROBE_INTERVAL)
+            db.session.remove()
+
+    def summary(self):
+        waits = sorted(self.waits) or [0.0]
+        p99 = waits[min(len(waits) - 1, int(len(waits) * 0.99))]
+        return (f"writer inserts: {len(self.waits)} ok, {self.failures} failed, "
+                f"p99 wait {p99 * 1000:.0f} ms, max wait {waits[-1] * 1000:.0f} ms")
+
+
+def run(name, cleanup, user_id, repository_id, rows):
+    seed(user_id, repository_id, rows)
+    probe = WriterProbe(user_id, repository_id)
+    probe.start()
+    time.sleep(0.2)
+    started = time.perf_counter()
+    result = cleanup()
+    elapsed = time.perf_counter() - started
+    probe.stopping.set()
+    probe.join()
+
+    remaining = db.session.scalar(
+        select(func.count()).select_from(TestCase).where(TestCase.created_at < datetime.utcnow() - timedelta(days=30))
+    )
+    assert remaining == 0, f"{remaining} expired rows left"
+    db.session.execute(delete(TestCase).where(TestCase.file_path == 'probe.py'))
+    db.session.commit()
+    print(f"{name}: {rows} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s); {probe.summary()}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--archive', action='store_true')
+    parser.add_argument('--skip-legacy', action='store_true')
+    parser.add_argument('--budget-ms', type=float, default=500.0)
+    args = parser.parse_args()
+
+    with app.app_context():
+        user = User(github_id='bench', username='bench', access_token='bench')
+        db.session.add(user)
+        db.session.flush()
+        repo = Repository(github_id='bench', user_id=user.id, name='bench', full_name='bench/bench',
+                          clone_url='', html_url='')
+        db.session.add(repo)
+        db.session.commit()
+        user_id, repository_id = user.id, repo.id
+        cutoff = datetime.utcnow() - timedelta(days=30)
+
+        if not args.skip_legacy:
+            run('legacy', lambda: legacy_cleanup(cutoff), user_id, repository_id, args.rows)
+            db.session.expunge_all()
+
+        archive_dir = tempfile.mkdtemp() if args.archive else None
+        result = run('batched', lambda: purge_expired('test-cases', cutoff, args.batch_size, archive_dir),
+                     user_id, repository_id, args.rows)
+        longest_ms = result['longest_batch_seconds'] * 1000
+        print(f"batched: {result['batches']} transactions, longest {longest_ms:.0f} ms")
+        if result['archive']:
+            print(f"archive: {os.path.getsize(result['archive']) / 2 ** 20:.1f} MB at {result['archive']}")
+
+        if longest_ms > args.budget_ms:
+            print(f"FAIL: a batch held its transaction for more than {args.budget_ms:.0f} ms")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Benchmark full-text search latency against a LIKE scan.
+
+Usage: python benchmarks/bench_search.py [--rows 1000000] [--users 1000] [--queries 200] [--budget-ms 50]
+
+Seeds a throwaway SQLite database (or DATABASE_URL if set) with ``--rows``
+test cases spread over ``--users`` users, each a few lines of generated
+test code kept inline, and indexes them with
+``search_service.index_documents``. Then times ``LIKE '%term%'`` over the
+inline text of all rows and of one user's rows (blob-stored text cannot be
+matched in SQL at all), and ``--queries`` random
+one- and two-term searches (first and second page) through
+``search_service.search``. Exits non-zero if the p95 search exceeds the
+budget.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app import app, db  # noqa: E402
+from models import User, Repository, TestCase  # noqa: E402
+from search_service import document, index_documents, search  # noqa: E402
+
+SEED_BATCH = 20000
+VOCABULARY = 20000
+LINES = 6
+
+
+def words(rng, count):
+    # Zipf-like: a few identifiers everywhere, most of them rare
+    return [f'w{int(rng.paretovariate(1.1)) % VOCABULARY}' for _ in range(count)]
+
+
+def body(rng):
+    lines = []
+    for _ in range(LINES):
+        name, call, value = words(rng, 3)
+        lines.append(f"    assert {call}_{name}({value}) == {rng.randint(0, 99)}")
+    return f"def test_{words(rng, 1)[0]}():\n" + "\n".join(lines) + "\n"
+
+
+def seed(rows, users):
+    rng = random.Random(7)
+    db.session.execute(User.__table__.insert(), [
+        {'id': user_id, 'github_id': f'bench-{user_id}', 'username': f'bench-{user_id}', 'access_token': 'bench'}
+        for user_id in range(1, users + 1)
+    ])
+    db.session.execute(Repository.__table__.insert(), [
+        {'id': user_id, 'github_id': f'bench-{user_id}', 'user_id': user_id, 'name': 'bench',
+         'full_name': f'bench-{user_id}/bench', 'clone_url': '', 'html_url': ''}
+        for user_id in range(1, users + 1)
+    ])
+    created_at = datetime.utcnow() - timedelta(days=1)
+    for start in range(1, rows + 1, SEED_BATCH):
+        batch = []
+        for row_id in range(start, min(start + SEED_BATCH, rows + 1)):
+            user_id = row_id % users + 1
+            batch.append({
+                'id': row_id, 'user_id': user_id, 'repository_id': user_id,
+                'file_path': f"src/{words(rng, 1)[0]}/{words(rng, 1)[0]}.py", 'test_content': body(rng),
+                'technology': 'python', 'status': 'generated', 'created_at': created_at,
+            })
+        db.session.execute(TestCase.__table__.insert(), batch)
+        index_documents(db.session.connection(), [
+            document('test-cases', row['id'], row['user_id'], row['file_path'], row['test_content']) for row in batch
+        ])
+        db.session.commit()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--budget-ms', type=float, default=50.0)
+    args = parser.parse_args()
+
+    with app.app_context():
+        started = time.perf_counter()
+        seed(args.rows, args.users)
+        print(f"seeded and indexed {args.rows} test cases in {time.perf_counter() - started:.0f}s")
+
+        rng = random.Random(11)
+        user_id, term = rng.randint(1, args.users), words(rng, 1)[0]
+        for scope, criteria in (('all users', ()), ('one user', (TestCase.user_id == user_id,))):
+            started = time.perf_counter()
+            db.session.scalar(
+                select(func.count()).select_from(TestCase)
+                .where(*criteria, TestCase.test_content_inline.like(f'%{term}%'))
+            )
+            print(f"LIKE '%{term}%' over {scope}: {(time.perf_counter() - started) * 1000:.0f} ms, "
+                  f"no ranking or snippets")
+
+        first_pages, next_pages, hits = [], [], []
+        for _ in range(args.queries):
+            user_id = rng.randint(1, args.users)
+            query = ' '.join(words(rng, rng.choice((1, 2))))
+            started = time.perf_counter()
+            results, cursor = search(user_id, query)
+            first_pages.append((time.perf_counter() - started) * 1000)
+            hits.append(len(results))
+            if cursor:
+                started = time.perf_counter()
+                search(user_id, query, cursor=cursor)
+                next_pages.append((time.perf_counter() - started) * 1000)
+            db.session.rollback()
+
+        print(f"search first page: p50 {statistics.median(first_pages):.1f} ms, "
+              f"p95 {percentile(first_pages, 0.95):.1f} ms, max {max(first_pages):.1f} ms "
+              f"({sum(1 for count in hits if count)} of {len(hits)} queries had hits)")
+        if next_pages:
+            print(f"search next page: p50 {statistics.median(next_pages):.1f} ms, "
+                  f"p95 {percentile(next_pages, 0.95):.1f} ms ({len(next_pages)} queries)")
+
+        worst = percentile(first_pages + next_pages, 0.95)
+        if worst > args.budget_ms:
+            print(f"FAIL: p95 search took {worst:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Benchmark the local security pre-scan on one core.
+
+Usage: python benchmarks/bench_security_scanner.py [--files 5000] [--lines 200]
+
+Generates a synthetic mix of clean and risky Python and JavaScript files
+and reports scan throughput.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from security_scanner import rank_files  # noqa: E402
+
+CLEAN_PY = [
+    "def compute_{n}(values):\n    return sum(v * {n} for v in values)\n",
+    "class Model{n}:\n    def __init__(self):\n        self.items = []\n\n    def add(self, item):\n        self.items.append(item)\n",
+    "RESULTS_{n} = [x for x in range({n})]\n",
+]
+RISKY_PY = [
+    "def run_{n}(cmd):\n    subprocess.run(cmd, shell=True)\n",
+    "def find_{n}(cursor, name):\n    cursor.execute(f\"SELECT * FROM t WHERE name = '{{name}}'\")\n",
+    "def load_{n}(blob):\n    return pickle.loads(blob)\n",
+]
+CLEAN_JS = ["function compute{n}(values) {{\n  return values.map(v => v * {n});\n}}\n"]
+RISKY_JS = ["function render{n}(el, html) {{\n  el.innerHTML = html;\n}}\n"]
+
+
+def make_file(rng, index, lines):
+    python = index % 2 == 0
+    clean, risky = (CLEAN_PY, RISKY_PY) if python else (CLEAN_JS, RISKY_JS)
+    parts = ["import os\nimport pickle\nimport subprocess\n\n" if python else ""]
+    while sum(part.count("\n") for part in parts) < lines:
+        pool = risky if rng.random() < 0.02 else clean
+        parts.append(rng.choice(pool).format(n=rng.randint(0, 10000)) + "\n")
+    return (f"src/module_{index}.{'py' if python else 'js'}", "".join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=5000)
+    parser.add_argument('--lines', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    files = [make_file(rng, index, args.lines) for index in range(args.files)]
+    total_bytes = sum(len(content) for _, content in files)
+
+    started = time.perf_counter()
+    ranked = rank_files(files)
+    elapsed = time.perf_counter() - started
+
+    deep = sum(1 for result in ranked if result['needs_deep_scan'])
+    print(f"Scanned {len(files)} files ({total_bytes / 1e6:.1f} MB) in {elapsed:.2f}s")
+    print(f"  {len(files) / elapsed:.0f} files/s, {total_bytes / 1e6 / elapsed:.1f} MB/s")
+    print(f"  {deep} files flagged for an LLM deep scan")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Benchmark near-duplicate lookups against a large LSH index.
+
+Usage: python benchmarks/bench_similarity_lookup.py [--files 1000000] [--queries 200]
+
+Seeds a throwaway SQLite database (or DATABASE_URL if set) with random
+fingerprints for one user and reports per-lookup latency.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from app import app, db  # noqa: E402
+from models import User, Repository, TestCase, SourceFingerprint, SourceFingerprintBand  # noqa: E402
+from similarity_service import (  # noqa: E402
+    band_buckets, fingerprint_source, find_similar_by_fingerprint, NUM_PERMUTATIONS
+)
+
+BATCH_SIZE = 10000
+
+
+def seed(user_id, repository_id, files):
+    rng = random.Random(42)
+    for start in range(0, files, BATCH_SIZE):
+        size = min(BATCH_SIZE, files - start)
+        test_cases, fingerprints, bands = [], [], []
+        for offset in range(size):
+            row_id = start + offset + 1
+            signature = [rng.getrandbits(32) for _ in range(NUM_PERMUTATIONS)]
+            test_cases.append({
+                'id': row_id, 'user_id': user_id, 'repository_id': repository_id,
+                'file_path': f'src/module_{row_id}.py', 'test_content': '', 'technology': 'python',
+            })
+            fingerprints.append({
+                'id': row_id, 'test_case_id': row_id, 'user_id': user_id,
+                'content_hash': f'{row_id:064x}', 'signature': signature,
+            })
+            bands.extend(
+                {'fingerprint_id': row_id, 'user_id': user_id, 'band': band, 'bucket': bucket}
+                for band, bucket in enumerate(band_buckets(signature))
+            )
+        db.session.execute(TestCase.__table__.insert(), test_cases)
+        db.session.execute(SourceFingerprint.__table__.insert(), fingerprints)
+        db.session.execute(SourceFingerprintBand.__table__.insert(), bands)
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    with app.app_context():
+        user = User(github_id='bench', username='bench', access_token='bench')
+        db.session.add(user)
+        db.session.flush()
+        repo = Repository(github_id='bench', user_id=user.id, name='bench', full_name='bench/bench',
+                          clone_url='', html_url='')
+        db.session.add(repo)
+        db.session.commit()
+
+        started = time.perf_counter()
+        seed(user.id, repo.id, args.files)
+        print(f"Seeded {args.files} fingerprints in {time.perf_counter() - started:.1f}s")
+
+        sources = [
+            "\n".join(f"def helper_{q}_{i}(value):\n    return value * {i}" for i in range(20))
+            for q in range(args.queries)
+        ]
+        fingerprint_timings, lookup_timings = [], []
+        for source in sources:
+            started = time.perf_counter()
+            digest, signature = fingerprint_source(source)
+            fingerprinted = time.perf_counter()
+            find_similar_by_fingerprint(user.id, digest, signature)
+            fingerprint_timings.append((fingerprinted - started) * 1000)
+            lookup_timings.append((time.perf_counter() - fingerprinted) * 1000)
+
+        print(f"Lookups: {len(lookup_timings)}")
+        report('Fingerprint (CPU)', fingerprint_timings)
+        report('Index lookup', lookup_timings)
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    print(f"  {label}: median {statistics.median(timings):.3f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95) - 1]:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Benchmark the fixed cost a Celery task pays before doing any work.
+
+Usage: python benchmarks/bench_task_overhead.py [--tasks 200] [--budget-ms 2]
+
+Runs a probe task that loads one user, in process through ``Task.apply``,
+two ways against a throwaway SQLite database (or DATABASE_URL if set):
+the old per-invocation setup, which built a Flask app, initialised the
+extension on it and ran the start-up schema work (create_all and
+upgrade_schema, as ``app.py`` does) before each task, and the
+worker-scoped ``WorkerContextTask`` that reuses the worker's app and
+engine. Reports the time per task, its overhead over the bare query and
+the database connections opened per task. Exits non-zero if the
+worker-scoped overhead exceeds the budget.
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from app import app, db  # noqa: E402
+from celery_app import celery  # noqa: E402
+from config import configure_engine  # noqa: E402
+from models import User  # noqa: E402
+from schema_upgrade import upgrade_schema  # noqa: E402
+
+connections = 0
+
+
+@event.listens_for(Engine, 'connect')
+def count_connection(dbapi_connection, connection_record):
+    global connections
+    connections += 1
+
+
+def load_user(user_id):
+    return db.session.get(User, user_id) is not None
+
+
+@celery.task
+def worker_scoped_probe(user_id):
+    return load_user(user_id)
+
+
+@celery.task
+def per_invocation_probe(user_id):
+    task_app = Flask('app')
+    task_app.config.update({key: value for key, value in app.config.items() if key.startswith('SQLALCHEMY_')})
+    db.init_app(task_app)
+    with task_app.app_context():
+        try:
+            for engine in db.engines.values():
+                configure_engine(engine)
+            db.create_all()
+            upgrade_schema()
+            return load_user(user_id)
+        finally:
+            # The old tasks left this to the garbage collector
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+def timed(run, count):
+    global connections
+    connections = 0
+    durations = []
+    for _ in range(count):
+        started = time.perf_counter()
+        run()
+        durations.append((time.perf_counter() - started) * 1000)
+    return statistics.median(durations), connections / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tasks', type=int, default=200)
+    parser.add_argument('--budget-ms', type=float, default=2.0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with app.app_context():
+        if not db.session.get(User, 1):
+            db.session.add(User(id=1, github_id='bench', username='bench', access_token='bench'))
+            db.session.commit()
+        bare, _ = timed(lambda: load_user(1), args.tasks)
+        db.session.remove()
+    print(f"bare query: {bare:.2f} ms")
+
+    results = {}
+    for name, task in (('per-invocation app', per_invocation_probe), ('worker-scoped app', worker_scoped_probe)):
+        assert task.apply(args=(1,)).get() is True
+        median, opened = timed(lambda: task.apply(args=(1,)).get(), args.tasks)
+        results[name] = median - bare
+        print(f"{name}: {median:.2f} ms per task, {median - bare:.2f} ms overhead, "
+              f"{opened:.2f} connections opened per task")
+
+    overhead = results['worker-scoped app']
+    if overhead > args.budget_ms:
+        print(f"FAIL: worker-scoped task overhead {overhead:.2f} ms is over the {args.budget_ms:.1f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
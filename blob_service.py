@@ -0,0 +1,106 @@
+import hashlib
+import zlib
+
+from sqlalchemy import delete, exists, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from models import CodeAnalysis, ContentBlob, TestCase
+
+COMPRESSION_LEVEL = 6
+# Text columns kept in content_blobs, per model
+BLOB_COLUMNS = {
+    TestCase: ('test_content',),
+    CodeAnalysis: ('original_code', 'analysis_result'),
+}
+
+_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def compress(raw: bytes):
+    """``(codec, data)`` for ``raw``; data that does not shrink is stored as is"""
+    compressed = zlib.compress(raw, COMPRESSION_LEVEL)
+    if len(compressed) < len(raw):
+        return 'zlib', compressed
+    return 'none', raw
+
+
+def decompress(codec, data) -> str:
+    if codec == 'zlib':
+        return zlib.decompress(data).decode()
+    if codec == 'none':
+        return bytes(data).decode()
+    raise ValueError(f"Unknown blob codec: {codec}")
+
+
+def store_blob(text: str) -> ContentBlob:
+    """The blob holding ``text``, written only if no row has the same content yet.
+
+    The insert ignores a conflicting hash, so concurrent writers of the same
+    content end up sharing one row. The caller commits.
+    """
+    digest = content_hash(text)
+    with db.session.no_autoflush:
+        blob = db.session.get(ContentBlob, digest)
+        if blob is None:
+            raw = text.encode()
+            codec, data = compress(raw)
+            values = {'hash': digest, 'codec': codec, 'size': len(raw), 'data': data}
+            insert = _INSERTS.get(db.session.get_bind().dialect.name)
+            if insert is not None:
+                db.session.execute(insert(ContentBlob.__table__).values(**values).on_conflict_do_nothing())
+                blob = db.session.get(ContentBlob, digest)
+            else:
+                blob = ContentBlob(**values)
+                db.session.add(blob)
+    blob.remember_text(text)
+    return blob
+
+
+def delete_orphan_blobs(hashes) -> int:
+    """Delete the blobs among ``hashes`` that no row references any more.
+
+    Called with the hashes of rows just deleted, so only those blobs are
+    checked. The caller commits.
+    """
+    hashes = {content for content in hashes if content}
+    if not hashes:
+        return 0
+    still_referenced = [
+        exists().where(getattr(model, f'{column}_hash') == ContentBlob.hash)
+        for model, columns in BLOB_COLUMNS.items()
+        for column in columns
+    ]
+    result = db.session.execute(
+        delete(ContentBlob)
+        .where(ContentBlob.hash.in_(hashes), *[~referenced for referenced in still_referenced])
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def migrate_inline_content(model, column, batch_size=500, after_id=0) -> int:
+    """Move one batch of ``column`` values still stored inline into blobs.
+
+    Walks the primary key from ``after_id`` so each batch is a range read;
+    returns the last id seen, or 0 once no rows are left.
+    """
+    hash_column = getattr(model, f'{column}_hash')
+    rows = db.session.scalars(
+        select(model)
+        .where(model.id > after_id, hash_column.is_(None))
+        .order_by(model.id)
+        .limit(batch_size)
+    ).all()
+
+    for row in rows:
+        inline = getattr(row, f'{column}_inline')
+        if inline:
+            setattr(row, column, inline)
+
+    db.session.commit()
+    return rows[-1].id if len(rows) == batch_size else 0
@@ -1,8 +1,11 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, current_app, request, jsonify, session
 from app import db, limiter
-from models import User, Repository, TestCase, Analytics
+from models import User, Repository, TestCase
 from github_service import GitHubService
 from groq_service import GroqService
+from analytics_service import analytics_etag, get_cached_user_analytics
+from db_routing import replica_reads
+from listing_service import MAX_PAGE_SIZE, TOTAL_MODES, count_test_cases, list_test_cases, summarize_test_case
 import logging
 
 api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
@@ -18,40 +21,38 @@ def api_login_required(f):
     return decorated_function
 
 @api_bp.route('/test-cases', methods=['GET'])
+@replica_reads()
 @api_login_required
 @limiter.limit("30 per minute")
 def get_test_cases():
-    """Get user's test cases"""
+    """Get user's test cases, newest first, one keyset page at a time"""
     user_id = session.get('user_id')
-    page = request.args.get('page', 1, type=int)
-    per_page = min(request.args.get('per_page', 10, type=int), 50)
+    per_page = request.args.get('per_page', 10, type=int)
+    total_mode = request.args.get('total', 'none')
+    if total_mode not in TOTAL_MODES:
+        return jsonify({'error': f"total must be one of {', '.join(TOTAL_MODES)}"}), 400
     
-    test_cases = TestCase.query.filter_by(user_id=user_id)\
-                              .order_by(TestCase.created_at.desc())\
-                              .paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        test_cases, next_cursor = list_test_cases(user_id, per_page, request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    pagination = {
+        'per_page': min(max(per_page, 1), MAX_PAGE_SIZE),
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    }
+    if total_mode != 'none':
+        pagination['total'] = count_test_cases(user_id, total_mode)
+        pagination['total_is_approximate'] = total_mode == 'approximate'
     
     return jsonify({
-        'test_cases': [{
-            'id': tc.id,
-            'file_path': tc.file_path,
-            'technology': tc.technology,
-            'quality_score': tc.quality_score,
-            'status': tc.status,
-            'created_at': tc.created_at.isoformat(),
-            'repository': {
-                'name': tc.repository.name,
-                'full_name': tc.repository.full_name
-            }
-        } for tc in test_cases.items],
-        'pagination': {
-            'page': page,
-            'pages': test_cases.pages,
-            'per_page': per_page,
-            'total': test_cases.total
-        }
+        'test_cases': [summarize_test_case(tc) for tc in test_cases],
+        'pagination': pagination
     })
 
 @api_bp.route('/test-cases/<int:test_case_id>', methods=['GET'])
+@replica_reads()
 @api_login_required
 @limiter.limit("50 per minute")
 def get_test_case(test_case_id):
@@ -78,26 +79,39 @@ def get_test_case(test_case_id):
     })
 
 @api_bp.route('/analytics', methods=['GET'])
+@replica_reads()
 @api_login_required
 @limiter.limit("20 per minute")
 def get_analytics():
     """Get user analytics"""
     user_id = session.get('user_id')
-    analytics = Analytics.query.filter_by(user_id=user_id).first()
     
-    if not analytics:
-        return jsonify({'message': 'No analytics data available'}), 404
+    # Shares the version counter and cache with /api/analytics
+    etag = analytics_etag(user_id)
+    if etag and request.if_none_match.contains(etag):
+        return _revalidate(current_app.response_class(status=304), etag)
     
-    return jsonify({
-        'total_files_generated': analytics.total_files_generated,
-        'total_repos': analytics.total_repos,
-        'average_quality_score': analytics.average_quality_score,
-        'technology_breakdown': analytics.technology_breakdown,
-        'daily_activity': analytics.daily_activity,
-        'last_updated': analytics.last_updated.isoformat()
+    analytics, etag = get_cached_user_analytics(user_id, etag)
+    
+    response = jsonify({
+        'total_files_generated': analytics['total_files_generated'],
+        'total_repos': analytics['total_repos'],
+        'average_quality_score': analytics['average_quality_score'],
+        'technology_breakdown': analytics['technology_breakdown'],
+        'daily_activity': analytics['daily_activity'],
+        'last_updated': analytics['last_updated']
     })
+    return _revalidate(response, etag)
+
+def _revalidate(response, etag):
+    """Let clients keep the response but check the ETag before reusing it"""
+    if etag:
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @api_bp.route('/repositories/<int:repo_id>/files', methods=['GET'])
+@replica_reads()
 @api_login_required
 @limiter.limit("30 per minute")
 def get_repository_files(repo_id):
@@ -6,6 +6,7 @@ from models import User, Repository, TestCase, Analytics
 from github_service import GitHubService
 from groq_service import GroqService
 from forms import TestGenerationForm, RepositorySelectionForm
+from version_service import record_version
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 
@@ -138,6 +139,7 @@ def generate_tests():
             edge_cases=json.loads(form.edge_cases.data) if form.edge_cases.data else None,
             quality_score=quality_analysis.get('score', 5.0)
         )
+        record_version(test_case)
         
         db.session.add(test_case)
         db.session.commit()
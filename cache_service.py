@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Optional
+
+import redis
+
+DEFAULT_TTL = 3600  # seconds
+DEFAULT_REDIS_URL = 'redis://localhost:6379/0'  # Celery's default broker
+
+
+class MemoryCache:
+    """In-process cache for tests and single-process tools.
+
+    Workers and other web processes will not see each other's entries or
+    version bumps, so it must never back a multi-process deployment.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _live_value(self, key) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def get(self, key) -> Optional[str]:
+        with self._lock:
+            return self._live_value(key)
+
+    def set(self, key, value, ttl=None, only_if_missing=False) -> bool:
+        with self._lock:
+            if only_if_missing and self._live_value(key) is not None:
+                return False
+            self._entries[key] = (value, time.monotonic() + ttl if ttl else None)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def incr(self, key) -> int:
+        with self._lock:
+            value, expires_at = self._entries.get(key, ('0', None))
+            value = str(int(value) + 1)
+            self._entries[key] = (value, expires_at)
+            return int(value)
+
+
+class RedisCache:
+    """Cache shared by every web process and Celery worker"""
+
+    def __init__(self, url):
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key) -> Optional[str]:
+        return self._client.get(key)
+
+    def set(self, key, value, ttl=None, only_if_missing=False) -> bool:
+        return bool(self._client.set(key, value, ex=ttl, nx=only_if_missing))
+
+    def delete(self, key):
+        self._client.delete(key)
+
+    def incr(self, key) -> int:
+        return self._client.incr(key)
+
+
+_cache = None
+
+
+def get_cache():
+    """The Redis cache at REDIS_URL, or at the server Celery uses by default.
+
+    Every web and Celery process must share it: an in-process fallback would
+    keep serving 304s for analytics another process has since changed. When
+    Redis is down, callers degrade to uncached reads.
+    """
+    global _cache
+    if _cache is None:
+        _cache = RedisCache(os.environ.get('REDIS_URL') or DEFAULT_REDIS_URL)
+    return _cache
+
+
+def get_version(name) -> Optional[str]:
+    """Current value of a version counter.
+
+    A missing counter (never bumped, or evicted) starts from the current
+    time rather than 0, so entries cached under an older incarnation of the
+    counter can never be mistaken for fresh ones.
+    """
+    cache = get_cache()
+    key = f'version:{name}'
+    try:
+        version = cache.get(key)
+        if version is None:
+            cache.set(key, str(time.time_ns()), only_if_missing=True)
+            version = cache.get(key)
+        return version
+    except redis.RedisError as e:
+        logging.error(f"Cache unavailable reading {key}: {e}")
+        return None
+
+
+def bump_version(name) -> Optional[str]:
+    """Invalidate everything cached under the previous version; returns the new one"""
+    cache = get_cache()
+    key = f'version:{name}'
+    try:
+        if cache.get(key) is None:
+            get_version(name)
+        return str(cache.incr(key))
+    except redis.RedisError as e:
+        logging.error(f"Cache unavailable bumping {key}: {e}")
+        return None
+
+
+def try_lock(key, ttl) -> bool:
+    """Take a lock that expires after ``ttl`` seconds; False if held or the cache is down"""
+    try:
+        return get_cache().set(f'lock:{key}', '1', ttl=ttl, only_if_missing=True)
+    except redis.RedisError as e:
+        logging.error(f"Cache unavailable locking {key}: {e}")
+        return False
+
+
+def release_lock(key):
+    """Release a lock taken with ``try_lock`` before it expires"""
+    try:
+        get_cache().delete(f'lock:{key}')
+    except redis.RedisError as e:
+        logging.error(f"Cache unavailable unlocking {key}: {e}")
+
+
+def get_json(key) -> Any:
+    try:
+        value = get_cache().get(key)
+    except redis.RedisError as e:
+        logging.error(f"Cache unavailable reading {key}: {e}")
+        return None
+    return json.loads(value) if value is not None else None
+
+
+def set_json(key, value, ttl=DEFAULT_TTL):
+    try:
+        get_cache().set(key, json.dumps(value), ttl=ttl)
+    except redis.RedisError as e:
+        logging.error(f"Cache unavailable writing {key}: {e}")
@@ -1,4 +1,5 @@
-from celery import Celery
+from celery import Celery, Task
+from celery.signals import worker_process_init
 import os
 
 def make_celery(app):
@@ -19,8 +20,20 @@ def make_celery(app):
     celery.Task = ContextTask
     return celery
 
+class WorkerContextTask(Task):
+    """Run each task in an app context of the worker's single Flask app
+    
+    The app and its engines are built once when ``tasks`` is imported, so a
+    task only pays for a fresh context and its scoped session, which hands
+    its connection back to the pool when the context ends.
+    """
+    def __call__(self, *args, **kwargs):
+        from app import app
+        with app.app_context():
+            return self.run(*args, **kwargs)
+
 # Standalone Celery instance for worker
-celery = Celery('gitgenius')
+celery = Celery('gitgenius', task_cls=WorkerContextTask)
 celery.config_from_object({
     'broker_url': os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
     'result_backend': os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
@@ -30,3 +43,15 @@ celery.config_from_object({
     'timezone': 'UTC',
     'enable_utc': True,
 })
+
+@worker_process_init.connect
+def reset_engine_pools(**kwargs):
+    """Drop pooled connections a prefork child inherited from the worker parent
+    
+    ``close=False`` leaves the parent's sockets open for the parent; the
+    child opens its own connections on first use.
+    """
+    from app import app, db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,57 @@
+from typing import Any, Dict
+
+from app import db
+from analytics_service import record_analysis
+from models import CodeAnalysis
+from security_scanner import format_prescan_report, scan_source
+from vulnerability_service import attach_findings, extract_findings
+
+ANALYSIS_TYPES = ('refactor', 'vulnerability')
+
+
+def analyze_file(groq_service, github_service, user_id, repo_name, file_path, analysis_type,
+                 deep_scan=False) -> Dict[str, Any]:
+    """Run a refactoring or vulnerability analysis of one file and save it.
+
+    Vulnerability analyses run the local rules first and only send files
+    worth a deep scan (or any file when ``deep_scan``) to the model. Raises
+    ValueError for an unknown ``analysis_type`` and LookupError when the
+    file cannot be fetched. Returns ``result`` and ``prescan``; the caller
+    commits.
+    """
+    if analysis_type not in ANALYSIS_TYPES:
+        raise ValueError('Invalid analysis type')
+
+    content = github_service.get_file_content(repo_name, file_path)
+    if not content:
+        raise LookupError('File not found')
+
+    prescan = None
+    findings = []
+    findings_source = 'model'
+    if analysis_type == 'refactor':
+        result = groq_service.refactor_code(content, file_path)
+    else:
+        prescan = scan_source(content, file_path)
+        if prescan['needs_deep_scan'] or deep_scan:
+            result = groq_service.check_vulnerabilities(content, file_path, prescan['findings'])
+            findings, result = extract_findings(result)
+        else:
+            result = format_prescan_report(prescan)
+            findings = prescan['findings']
+            findings_source = 'static'
+
+    analysis = CodeAnalysis()
+    analysis.user_id = user_id
+    analysis.repository_id = github_service.get_repository_id(user_id, repo_name)
+    analysis.file_path = file_path
+    analysis.analysis_type = analysis_type
+    analysis.original_code = content
+    analysis.analysis_result = result
+    if analysis_type == 'vulnerability':
+        attach_findings(analysis, findings, findings_source)
+    db.session.add(analysis)
+
+    record_analysis(user_id, analysis_type, [finding['severity'] for finding in findings])
+
+    return {'result': result, 'prescan': prescan}
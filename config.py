@@ -1,14 +1,87 @@
 import os
 from datetime import timedelta
 
+# Applied to every new SQLite connection; see sqlite_pragmas()
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # readers and the single writer stop blocking each other
+    'synchronous': 'NORMAL',  # with WAL only checkpoints fsync; a power cut can lose the last commits, never corrupt
+    'busy_timeout': 5000,  # ms a writer waits for the lock before "database is locked"
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negative means KiB, so 64 MiB of page cache per connection
+}
+
+# Connections the web tier may hold on a Postgres server, leaving room for
+# Celery workers, migrations and psql under the default max_connections=100
+POSTGRES_CONNECTION_BUDGET = 60
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name) or default)
+
+
+def sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply SQLITE_PRAGMAS to a new DBAPI connection; ``SQLITE_<NAME>`` overrides an integer pragma"""
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        value = _env_int(f'SQLITE_{name.upper()}', value) if isinstance(value, int) else value
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def postgres_pool_size():
+    """(pool_size, max_overflow) per process from the gunicorn worker and thread counts.
+
+    Each worker keeps one pooled connection per thread and may burst to its
+    share of POSTGRES_CONNECTION_BUDGET (``DB_CONNECTION_BUDGET``), so the
+    whole web tier never opens more than the budget.
+    """
+    workers = _env_int('WEB_CONCURRENCY', 4)
+    threads = _env_int('GUNICORN_THREADS', 1)
+    per_worker = max(1, _env_int('DB_CONNECTION_BUDGET', POSTGRES_CONNECTION_BUDGET) // workers)
+    pool_size = min(threads, per_worker)
+    return pool_size, per_worker - pool_size
+
+
+def engine_options(database_uri):
+    """SQLAlchemy engine options for the deployment profile matching the database URI"""
+    options = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    if database_uri.startswith('postgres'):
+        pool_size, max_overflow = postgres_pool_size()
+        statement_timeout = _env_int('DB_STATEMENT_TIMEOUT_MS', 30000)
+        idle_timeout = _env_int('DB_IDLE_IN_TRANSACTION_TIMEOUT_MS', 60000)
+        options.update({
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_timeout": 10,
+            "connect_args": {
+                "options": f"-c statement_timeout={statement_timeout} "
+                           f"-c idle_in_transaction_session_timeout={idle_timeout}",
+            },
+        })
+    return options
+
+
+def replica_binds(replica_urls):
+    """``SQLALCHEMY_BINDS`` for comma-separated read replica URLs, each tuned for its own dialect"""
+    urls = [url.strip() for url in (replica_urls or '').split(',') if url.strip()]
+    return {f'replica_{number}': {'url': url, **engine_options(url)} for number, url in enumerate(urls, 1)}
+
+
+def configure_engine(engine):
+    """Register per-connection setup for the engine's dialect"""
+    if engine.dialect.name == 'sqlite':
+        from sqlalchemy import event
+        event.listen(engine, 'connect', sqlite_pragmas)
+
 class Config:
     """Base configuration class"""
     SECRET_KEY = os.environ.get('SESSION_SECRET') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///github_test_generator.db'
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        "pool_recycle": 300,
-        "pool_pre_ping": True,
-    }
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_BINDS = replica_binds(os.environ.get('DATABASE_REPLICA_URLS'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
     # GitHub OAuth
@@ -45,6 +118,8 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_BINDS = {}
     WTF_CSRF_ENABLED = False
     RATELIMIT_ENABLED = False
 
@@ -0,0 +1,190 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from flask import has_request_context, session as request_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.sql import CompoundSelect, Select
+
+MAX_REPLICA_LAG_SECONDS = 5.0  # replicas further behind are skipped
+REPLICA_CHECK_SECONDS = 1.0  # how long a measured replica position is trusted
+HEARTBEAT_INTERVAL_SECONDS = 1.0  # writes outside requests stamp the heartbeat at most this often
+WRITTEN_AT_KEY = 'db_written_at'  # Flask session key: heartbeat sequence of the user's last write
+
+_WROTE = 'routing_wrote'
+_REPLICA = 'routing_replica'
+
+# Lag in seconds the current reads tolerate; None keeps them on the primary
+_max_lag = ContextVar('replica_max_lag', default=None)
+_positions = {}  # bind key -> (checked at, sequence, lag seconds or None when unreachable)
+_positions_lock = threading.Lock()
+_last_beat = 0.0
+
+
+@contextmanager
+def replica_reads(max_lag=MAX_REPLICA_LAG_SECONDS):
+    """Send SELECTs in this block to a replica at most ``max_lag`` seconds behind.
+
+    Also usable as a decorator. Reads stay on the primary when no replica
+    qualifies, once the transaction has written, and until a replica has
+    caught up with the current user's last write.
+    """
+    token = _max_lag.set(max_lag)
+    try:
+        yield
+    finally:
+        _max_lag.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Keep every read in this block on the primary, e.g. reads that feed a write"""
+    token = _max_lag.set(None)
+    try:
+        yield
+    finally:
+        _max_lag.reset(token)
+
+
+def replica_keys(engines):
+    return [key for key in engines if key is not None and key.startswith('replica')]
+
+
+def _heartbeat(engine):
+    # Imported here: the models import the app, which imports this module
+    from models import ReplicationHeartbeat
+    with engine.connect() as connection:
+        return connection.execute(
+            select(ReplicationHeartbeat.sequence, ReplicationHeartbeat.beat_at).where(ReplicationHeartbeat.id == 1)
+        ).first()
+
+
+def replica_positions(engines):
+    """``{bind key: (sequence, lag seconds)}`` for each replica, re-measured every REPLICA_CHECK_SECONDS.
+
+    Lag is the primary's heartbeat time minus the replica's copy of it, or
+    None when the replica could not be read.
+    """
+    now = time.monotonic()
+    with _positions_lock:
+        stale = [key for key in replica_keys(engines)
+                 if key not in _positions or now - _positions[key][0] >= REPLICA_CHECK_SECONDS]
+        if stale:
+            primary = _heartbeat(engines[None])
+            for key in stale:
+                try:
+                    replica = _heartbeat(engines[key])
+                except Exception as e:
+                    logging.error(f"Replica {key} unavailable: {e}")
+                    _positions[key] = (now, 0, None)
+                    continue
+                if primary is None:
+                    _positions[key] = (now, 0, 0.0)
+                elif replica is None:
+                    _positions[key] = (now, 0, float('inf'))
+                else:
+                    lag = max((primary.beat_at - replica.beat_at).total_seconds(), 0.0)
+                    _positions[key] = (now, replica.sequence, lag)
+        return {key: _positions[key][1:] for key in replica_keys(engines)}
+
+
+def forget_replica_positions():
+    """Drop measured positions so the next read re-checks every replica"""
+    with _positions_lock:
+        _positions.clear()
+
+
+class RoutingSession(Session):
+    """Session that sends SELECTs inside ``replica_reads`` to a replica bind"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and isinstance(clause, (Select, CompoundSelect)):
+            engine = self._replica_engine(clause)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_engine(self, clause):
+        max_lag = _max_lag.get()
+        if (max_lag is None or self._flushing or self.info.get(_WROTE)
+                or getattr(clause, '_for_update_arg', None) is not None):
+            return None
+        engines = self._db.engines
+        # One choice per transaction, so its reads never move backwards in time
+        if _REPLICA not in self.info:
+            written = request_session.get(WRITTEN_AT_KEY) if has_request_context() else None
+            eligible = [
+                key for key, (sequence, lag) in replica_positions(engines).items()
+                if lag is not None and lag <= max_lag and (written is None or sequence >= written)
+            ]
+            self.info[_REPLICA] = random.choice(eligible) if eligible else None
+        return engines[self.info[_REPLICA]] if self.info[_REPLICA] else None
+
+
+def stamp_heartbeat(engines, force=False):
+    """Advance the primary's heartbeat and return its new sequence, or None if skipped.
+
+    Only runs when replicas are configured; unless ``force`` it runs at most
+    every HEARTBEAT_INTERVAL_SECONDS per process.
+    """
+    global _last_beat
+    if not replica_keys(engines):
+        return None
+    now = time.monotonic()
+    if not force and now - _last_beat < HEARTBEAT_INTERVAL_SECONDS:
+        return None
+    _last_beat = now
+
+    from models import ReplicationHeartbeat
+    table = ReplicationHeartbeat.__table__
+    with engines[None].begin() as connection:
+        beat_at = datetime.utcnow()
+        result = connection.execute(
+            update(table).where(table.c.id == 1).values(sequence=table.c.sequence + 1, beat_at=beat_at)
+        )
+        if not result.rowcount:
+            connection.execute(insert(table).values(id=1, sequence=1, beat_at=beat_at))
+        return connection.scalar(select(table.c.sequence).where(table.c.id == 1))
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_WROTE] = True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_flush(session, flush_context):
+    session.info[_WROTE] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _record_write(session):
+    if not session.info.pop(_WROTE, False):
+        return
+    # A user's own writes are stamped right away so their next reads know
+    # which replicas have them; background writes only keep lag measurable
+    in_request = has_request_context()
+    try:
+        sequence = stamp_heartbeat(session._db.engines, force=in_request)
+    except Exception as e:
+        logging.error(f"Failed to stamp replication heartbeat: {e}")
+        return
+    if in_request and sequence is not None:
+        request_session[WRITTEN_AT_KEY] = sequence
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_write(session):
+    session.info.pop(_WROTE, None)
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _forget_replica(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_REPLICA, None)
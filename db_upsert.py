@@ -0,0 +1,44 @@
+from typing import Any, Dict
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+
+_UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def upsert_increment(model, keys: Dict[str, Any], increments: Dict[str, Any], values: Dict[str, Any] = None):
+    """``UPDATE ... SET x = x + n`` for the row identified by ``keys``, inserting it if missing.
+
+    ``keys`` must match a unique constraint or index. SQLite and Postgres use
+    ``INSERT ... ON CONFLICT DO UPDATE``; other databases fall back to an
+    UPDATE followed by an INSERT when no row matched. ``values`` are plain
+    assignments applied in the same statement. The caller commits.
+    """
+    table = model.__table__
+    values = values or {}
+    insert = _UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+
+    if insert is not None:
+        statement = insert(table).values(**keys, **increments, **values)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={
+                **{name: func.coalesce(table.c[name], 0) + statement.excluded[name] for name in increments},
+                **{name: statement.excluded[name] for name in values},
+            }
+        )
+        db.session.execute(statement)
+        return
+
+    result = db.session.execute(
+        update(table)
+        .where(*[table.c[name] == value for name, value in keys.items()])
+        .values({
+            **{name: func.coalesce(table.c[name], 0) + value for name, value in increments.items()},
+            **values,
+        })
+    )
+    if result.rowcount == 0:
+        db.session.execute(table.insert().values(**keys, **increments, **values))
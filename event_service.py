@@ -0,0 +1,238 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional
+
+import redis
+
+REPLAY_EVENTS = 200  # per user, for clients resuming with Last-Event-ID
+REPLAY_TTL = 3600  # seconds an idle user's Redis replay buffer is kept
+HEARTBEAT_SECONDS = 15
+RETRY_MS = 3000
+SUBSCRIBER_QUEUE_SIZE = 100
+
+CHANNEL_PREFIX = 'events:'
+
+# Appends to the user's capped stream and publishes the same event in one
+# step, so live subscribers receive events in stream (event ID) order
+_PUBLISH_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'event', ARGV[2], 'data', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('PUBLISH', KEYS[1], cjson.encode({id = id, event = ARGV[2], data = ARGV[3]}))
+return id
+"""
+
+
+def _id_key(event_id):
+    """Sort key for ``<milliseconds>-<sequence>`` event IDs, None if malformed"""
+    try:
+        return tuple(int(part) for part in event_id.split('-'))
+    except (AttributeError, ValueError):
+        return None
+
+
+class Subscription:
+    """One open event stream's queue of live events"""
+
+    def __init__(self, user_id, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.user_id = str(user_id)
+        self.queue = queue.Queue(maxsize)
+        self.overflowed = False
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # A stalled client is disconnected instead of buffering without
+            # bound; it resumes from the replay buffer when it reconnects
+            self.overflowed = True
+
+
+class _Broker:
+    """Fans published events out to this process's subscriptions"""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id) -> Subscription:
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscriptions.setdefault(subscription.user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def _deliver(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(str(user_id), ()))
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+
+class MemoryBroker(_Broker):
+    """In-process broker used when no Redis server is configured.
+
+    Only events published by this process reach its subscribers, so Celery
+    workers' progress is not seen by web processes in this mode.
+    """
+
+    def __init__(self, replay_size=REPLAY_EVENTS):
+        super().__init__()
+        self._replay_size = replay_size
+        self._history = {}
+        self._last_id = (0, 0)
+
+    def _next_id(self):
+        # Same shape as Redis stream IDs, and time-based so IDs issued
+        # after a restart still sort after those a client already has
+        milliseconds = int(time.time() * 1000)
+        last_milliseconds, sequence = self._last_id
+        self._last_id = (
+            (milliseconds, 0) if milliseconds > last_milliseconds else (last_milliseconds, sequence + 1)
+        )
+        return '%d-%d' % self._last_id
+
+    def publish(self, user_id, event_type, data) -> str:
+        with self._lock:
+            event = {'id': self._next_id(), 'event': event_type, 'data': data}
+            history = self._history.setdefault(str(user_id), deque(maxlen=self._replay_size))
+            history.append(event)
+            subscriptions = list(self._subscriptions.get(str(user_id), ()))
+        for subscription in subscriptions:
+            subscription.deliver(event)
+        return event['id']
+
+    def replay(self, user_id, last_event_id) -> List[Dict[str, Any]]:
+        after = _id_key(last_event_id)
+        if after is None:
+            return []
+        with self._lock:
+            history = list(self._history.get(str(user_id), ()))
+        return [event for event in history if _id_key(event['id']) > after]
+
+
+class RedisBroker(_Broker):
+    """Broker shared by every web process and Celery worker.
+
+    Events are appended to a capped per-user stream, which doubles as the
+    replay buffer, and published on the user's channel. Each process holds
+    a single pattern subscription and fans messages out to its own
+    subscriptions, so open event streams cost no Redis connections.
+    """
+
+    def __init__(self, url, replay_size=REPLAY_EVENTS):
+        super().__init__()
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self._publish = self._client.register_script(_PUBLISH_SCRIPT)
+        self._replay_size = replay_size
+        self._listener = None
+
+    def subscribe(self, user_id) -> Subscription:
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+                self._listener.start()
+        return super().subscribe(user_id)
+
+    def _listen(self):
+        while True:
+            pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(CHANNEL_PREFIX + '*')
+                for message in pubsub.listen():
+                    payload = json.loads(message['data'])
+                    self._deliver(message['channel'][len(CHANNEL_PREFIX):], {
+                        'id': payload['id'], 'event': payload['event'], 'data': json.loads(payload['data'])
+                    })
+            except redis.RedisError as e:
+                logging.error(f"Event listener lost Redis connection: {e}")
+                time.sleep(1)
+            finally:
+                pubsub.close()
+
+    def publish(self, user_id, event_type, data) -> str:
+        return self._publish(
+            keys=[f'{CHANNEL_PREFIX}{user_id}'],
+            args=[self._replay_size, event_type, json.dumps(data), REPLAY_TTL]
+        )
+
+    def replay(self, user_id, last_event_id) -> List[Dict[str, Any]]:
+        if _id_key(last_event_id) is None:
+            return []
+        entries = self._client.xrange(f'{CHANNEL_PREFIX}{user_id}', min=f'({last_event_id}', max='+')
+        return [
+            {'id': event_id, 'event': fields['event'], 'data': json.loads(fields['data'])}
+            for event_id, fields in entries
+        ]
+
+
+_broker = None
+
+
+def get_broker():
+    """Redis when REDIS_URL is set, otherwise an in-process broker"""
+    global _broker
+    if _broker is None:
+        url = os.environ.get('REDIS_URL')
+        _broker = RedisBroker(url) if url else MemoryBroker()
+    return _broker
+
+
+def publish(user_id, event_type, data) -> Optional[str]:
+    """Push an event to the user's open dashboards; never raises"""
+    try:
+        return get_broker().publish(user_id, event_type, data)
+    except redis.RedisError as e:
+        logging.error(f"Failed to publish {event_type} event for user {user_id}: {e}")
+        return None
+
+
+def format_event(event) -> str:
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+def stream_events(user_id, last_event_id=None, heartbeat=HEARTBEAT_SECONDS) -> Iterator[str]:
+    """Server-sent event stream: missed events since ``last_event_id``, then live ones.
+
+    Subscribes before replaying so nothing published in between is lost;
+    live events already covered by the replay are skipped. A comment line
+    is sent whenever the stream is idle for ``heartbeat`` seconds, which
+    keeps proxies from closing the connection and detects gone clients.
+    """
+    broker = get_broker()
+    subscription = broker.subscribe(user_id)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+
+        last_key = _id_key(last_event_id)
+        try:
+            missed = broker.replay(user_id, last_event_id)
+        except redis.RedisError as e:
+            logging.error(f"Failed to replay events for user {user_id}: {e}")
+            missed = []
+        for event in missed:
+            last_key = _id_key(event['id'])
+            yield format_event(event)
+
+        while not subscription.overflowed:
+            try:
+                event = subscription.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': heartbeat\n\n'
+                continue
+            if last_key is not None and _id_key(event['id']) <= last_key:
+                continue
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
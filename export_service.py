@@ -0,0 +1,156 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from app import db
+from blob_service import BLOB_COLUMNS, decompress
+from models import ContentBlob, TestCase, CodeAnalysis
+
+FORMATS = ('ndjson', 'csv')
+BATCH_SIZE = 1000  # rows fetched from the cursor and serialized per chunk
+
+# Exportable columns per dataset; bulky text columns come last and can be
+# left out with ``columns``
+EXPORTS = {
+    'test-cases': (TestCase, (
+        'id', 'repository_id', 'file_path', 'technology', 'status', 'quality_score',
+        'edge_cases', 'created_at', 'test_content',
+    )),
+    'analyses': (CodeAnalysis, (
+        'id', 'repository_id', 'file_path', 'analysis_type', 'max_severity',
+        'created_at', 'original_code', 'analysis_result',
+    )),
+}
+
+
+def resolve_columns(dataset, requested=None) -> List[str]:
+    """Validate a column selection; all columns when nothing is requested"""
+    available = EXPORTS[dataset][1]
+    if not requested:
+        return list(available)
+    unknown = [column for column in requested if column not in available]
+    if unknown:
+        raise ValueError(f"Unknown columns for {dataset}: {', '.join(unknown)}")
+    return list(dict.fromkeys(requested))
+
+
+def iter_rows(dataset, user_id, columns: List[str], batch_size=BATCH_SIZE) -> Iterator[Tuple]:
+    """Stream the user's rows of ``dataset`` in id order"""
+    model = EXPORTS[dataset][0]
+    return select_rows(model, columns, model.user_id == user_id, batch_size=batch_size)
+
+
+def select_rows(model, columns: List[str], *criteria, batch_size=BATCH_SIZE) -> Iterator[Tuple]:
+    """Stream ``columns`` of the rows matching ``criteria`` in id order through a server-side cursor.
+
+    Selecting plain columns instead of entities keeps rows out of the
+    session's identity map, and ``yield_per`` fetches ``batch_size`` rows at
+    a time (with a named cursor on PostgreSQL), so memory does not grow
+    with the table. Text kept in ``content_blobs`` is joined in by hash and
+    decompressed row by row; text held in neither a blob nor the inline
+    column, such as older test versions stored as deltas, is loaded
+    through the model.
+    """
+    selected, blob_starts, joins = [], {}, []
+    for column in columns:
+        if column not in BLOB_COLUMNS.get(model, ()):
+            selected.append(getattr(model, column))
+            continue
+        blob = aliased(ContentBlob)
+        blob_starts[len(selected)] = column
+        selected += [getattr(model, f'{column}_inline'), blob.codec, blob.data]
+        joins.append((blob, blob.hash == getattr(model, f'{column}_hash')))
+
+    statement = select(*selected, model.id) if blob_starts else select(*selected)
+    for blob, on in joins:
+        statement = statement.outerjoin(blob, on)
+    statement = (
+        statement
+        .where(*criteria)
+        .order_by(model.id)
+        .execution_options(yield_per=batch_size)
+    )
+    rows = db.session.execute(statement)
+    if not blob_starts:
+        yield from rows
+        return
+
+    for row in rows:
+        values, index, row_id = [], 0, row[-1]
+        while index < len(row) - 1:
+            if index in blob_starts:
+                inline, codec, data = row[index:index + 3]
+                if data is not None:
+                    values.append(decompress(codec, data))
+                elif inline:
+                    values.append(inline)
+                else:
+                    values.append(getattr(db.session.get(model, row_id), blob_starts[index]))
+                index += 3
+            else:
+                values.append(row[index])
+                index += 1
+        yield tuple(values)
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _batches(rows: Iterable[Tuple], size) -> Iterator[List[Tuple]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ndjson_chunks(rows: Iterable[Tuple], columns: List[str], batch_size=BATCH_SIZE) -> Iterator[str]:
+    for batch in _batches(rows, batch_size):
+        yield ''.join(
+            json.dumps(dict(zip(columns, map(_value, row))), separators=(',', ':')) + '\n' for row in batch
+        )
+
+
+def csv_chunks(rows: Iterable[Tuple], columns: List[str], batch_size=BATCH_SIZE) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in _batches(rows, batch_size):
+        for row in batch:
+            # JSON columns are written as JSON text rather than Python reprs
+            writer.writerow([
+                json.dumps(value) if isinstance(value, (dict, list)) else _value(value) for value in row
+            ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks: Iterable[str]) -> Iterator[bytes]:
+    """Compress a text stream into one gzip member as it is produced"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode())
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_stream(dataset, user_id, export_format='ndjson', columns=None, compress=False) -> Iterator:
+    """Encoded export body for one of the ``EXPORTS`` datasets"""
+    columns = resolve_columns(dataset, columns)
+    serialize = ndjson_chunks if export_format == 'ndjson' else csv_chunks
+    chunks = serialize(iter_rows(dataset, user_id, columns), columns)
+    return gzip_chunks(chunks) if compress else chunks
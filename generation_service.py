@@ -0,0 +1,134 @@
+from typing import Any, Callable, Dict, List, Optional
+
+from app import db
+from analytics_service import record_test_generated
+from event_service import publish
+from models import TestCase
+from similarity_service import find_similar_by_fingerprint, fingerprint_source, index_source
+from symbol_service import extract_symbols, generate_tests_incrementally, is_incremental_candidate
+
+
+def latest_test_case(user_id, repository_id, file_path):
+    """Get the most recent test case generated for a file"""
+    if repository_id is None:
+        return None
+    return TestCase.query.filter_by(
+        user_id=user_id,
+        repository_id=repository_id,
+        file_path=file_path
+    ).order_by(TestCase.created_at.desc()).first()
+
+
+def generate_for_file(groq_service, user_id, repository_id, file_path, file_content,
+                      technology, edge_cases, reuse_similar=True) -> Dict[str, Any]:
+    """Produce tests for one file as cheaply as possible.
+
+    In order of preference: reuse the previous suite for this file when its
+    symbols are unchanged, regenerate only the changed symbols, reuse or adapt
+    the suite of a near-duplicate file, and finally generate from scratch.
+
+    Returns a dict with ``test_content``, ``symbol_hashes``, ``mode``
+    (``unchanged``, ``incremental``, ``reused``, ``adapted`` or ``full``),
+    ``previous`` and ``similar_match``. Nothing is saved.
+    """
+    previous = latest_test_case(user_id, repository_id, file_path)
+    result = {'previous': previous, 'similar_match': None}
+
+    if previous is None and reuse_similar:
+        digest, signature = fingerprint_source(file_content)
+        match = find_similar_by_fingerprint(user_id, digest, signature, technology=technology)
+        if match:
+            similar_case, similarity = match
+            result['similar_match'] = {'test_case_id': similar_case.id, 'similarity': round(similarity, 3)}
+
+            # A full MinHash estimate can still hide small edits, and a suite
+            # imports from its file's module; only an identical source at the
+            # same path (a fork or copy of the repository) takes it as it is
+            if similar_case.fingerprint.content_hash == digest and similar_case.file_path == file_path:
+                test_content, mode = similar_case.test_content, 'reused'
+            else:
+                test_content = groq_service.adapt_test_cases(
+                    similar_case.test_content, file_content, file_path, technology
+                )
+                mode = 'adapted'
+
+            if test_content:
+                symbol_hashes = (
+                    extract_symbols(file_content) if is_incremental_candidate(file_path, technology) else None
+                )
+                result.update(test_content=test_content, symbol_hashes=symbol_hashes, mode=mode)
+                return result
+
+    test_content, symbol_hashes, mode = generate_tests_incrementally(
+        groq_service, previous, file_content, file_path, technology, edge_cases
+    )
+    result.update(test_content=test_content, symbol_hashes=symbol_hashes, mode=mode)
+    return result
+
+
+def generate_tests_for_files(groq_service, github_service, user_id, files, technology, edge_cases,
+                             reuse_similar=True,
+                             progress: Optional[Callable[[int, int, str], None]] = None) -> List[Dict[str, Any]]:
+    """Generate and save tests for ``files`` (``{'path', 'repo'}`` dicts) of one request.
+
+    Publishes a ``generation`` event, and calls ``progress(index, total,
+    file_path)`` when given, before each file. Files whose content cannot
+    be fetched are skipped. Returns one result dict per generated file;
+    the caller commits.
+    """
+    # Imported here: version_service imports this module
+    from version_service import record_version
+
+    results = []
+    for index, file_info in enumerate(files):
+        file_path = file_info['path']
+        repo_name = file_info['repo']
+        publish(user_id, 'generation', {
+            'current': index, 'total': len(files), 'file_path': file_path, 'status': 'generating'
+        })
+        if progress:
+            progress(index, len(files), file_path)
+
+        content = github_service.get_file_content(repo_name, file_path)
+        if not content:
+            continue
+        repository_id = github_service.get_repository_id(user_id, repo_name)
+
+        generation = generate_for_file(
+            groq_service, user_id, repository_id, file_path, content, technology, edge_cases,
+            reuse_similar=reuse_similar
+        )
+        if generation['mode'] == 'unchanged':
+            results.append({
+                'file_path': file_path,
+                'test_content': generation['test_content'],
+                'quality_score': generation['previous'].quality_score,
+                'generation_mode': generation['mode']
+            })
+            continue
+
+        quality_analysis = groq_service.analyze_code_quality(content)
+
+        test_case = TestCase(
+            user_id=user_id,
+            repository_id=repository_id,
+            file_path=file_path,
+            test_content=generation['test_content'],
+            technology=technology,
+            edge_cases=edge_cases,
+            quality_score=quality_analysis.get('score', 5.0),
+            symbol_hashes=generation['symbol_hashes']
+        )
+        record_version(test_case, generation['previous'])
+        db.session.add(test_case)
+        index_source(test_case, content)
+        record_test_generated(user_id, technology, test_case.quality_score)
+
+        results.append({
+            'file_path': file_path,
+            'test_content': generation['test_content'],
+            'quality_score': quality_analysis.get('score', 5.0),
+            'generation_mode': generation['mode'],
+            'similar_match': generation['similar_match']
+        })
+    return results
@@ -1,11 +1,15 @@
 import requests
 import os
 import logging
+import tarfile
 from datetime import datetime, timedelta
 from app import db
 from models import Repository
+from repository_sync_service import sync_user_repositories
 from urllib.parse import quote
 
+REPOS_PER_PAGE = 100  # the GitHub maximum
+
 class GitHubService:
     def __init__(self, access_token):
         self.access_token = access_token
@@ -25,11 +29,11 @@ class GitHubService:
             logging.error(f"Error fetching user info: {e}")
             return None
     
-    def get_user_repositories(self, user_id):
-        """Get user repositories with caching"""
+    def get_user_repositories(self, user_id, refresh=False):
+        """Get user repositories with caching; ``refresh`` skips the cache"""
         try:
             # Check cache first
-            cached_repos = Repository.query.filter_by(user_id=user_id).all()
+            cached_repos = [] if refresh else Repository.query.filter_by(user_id=user_id, vanished_at=None).all()
             
             # If cache is recent (less than 1 hour), use it
             if cached_repos and all(repo.cache_updated_at and 
@@ -38,11 +42,7 @@ class GitHubService:
                 return [self._repo_to_dict(repo) for repo in cached_repos]
             
             # Fetch from GitHub API
-            response = requests.get(f"{self.base_url}/user/repos", 
-                                  headers=self.headers, 
-                                  params={"per_page": 100, "sort": "updated"})
-            response.raise_for_status()
-            repos_data = response.json()
+            repos_data = self.fetch_user_repositories()
             
             # Update cache
             self._update_repository_cache(user_id, repos_data)
@@ -52,6 +52,38 @@ class GitHubService:
             logging.error(f"Error fetching repositories: {e}")
             return []
     
+    def get_repository_id(self, user_id, full_name):
+        """ID of the user's stored repository, syncing from GitHub once if it is not stored yet"""
+        repo = Repository.query.filter_by(full_name=full_name, user_id=user_id).first()
+        if repo:
+            return repo.id
+        
+        try:
+            self.get_user_repositories(user_id, refresh=True)
+            repo = Repository.query.filter_by(full_name=full_name, user_id=user_id).first()
+            if repo:
+                return repo.id
+        except Exception as e:
+            logging.error(f"Error creating repository record: {e}")
+        
+        return None
+    
+    def fetch_user_repositories(self):
+        """Every repository of the authenticated user, following pagination; raises on API errors"""
+        # A partial listing would make the sync treat the missing repositories as gone
+        repos_data = []
+        page = 1
+        while True:
+            response = requests.get(f"{self.base_url}/user/repos", 
+                                  headers=self.headers, 
+                                  params={"per_page": REPOS_PER_PAGE, "sort": "updated", "page": page})
+            response.raise_for_status()
+            page_data = response.json()
+            repos_data.extend(page_data)
+            if len(page_data) < REPOS_PER_PAGE:
+                return repos_data
+            page += 1
+    
     def get_repository_contents(self, full_name, path=""):
         """Get repository contents (files and folders)"""
         try:
@@ -64,6 +96,46 @@ class GitHubService:
             logging.error(f"Error fetching repository contents: {e}")
             return []
     
+    def get_repository_tree(self, full_name, ref="HEAD"):
+        """Get every blob in the repository tree in a single request"""
+        try:
+            url = f"{self.base_url}/repos/{full_name}/git/trees/{quote(ref)}"
+            response = requests.get(url, headers=self.headers, params={"recursive": 1})
+            response.raise_for_status()
+            data = response.json()
+            if data.get('truncated'):
+                logging.warning(f"Repository tree for {full_name} was truncated by GitHub")
+            return [item for item in data.get('tree', []) if item.get('type') == 'blob']
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error fetching repository tree: {e}")
+            return []
+    
+    def get_archive_files(self, full_name, ref="HEAD", include=None, limit=None):
+        """Text of the repository's files from a single tarball download, as ``{path: content}``
+        
+        ``include(path, size)`` picks the files to read and ``limit`` caps how
+        many are read; binary files are skipped. Costs one API request however
+        many files are read. Raises on API and archive errors, since an empty
+        result would read as a repository with nothing to scan.
+        """
+        files = {}
+        url = f"{self.base_url}/repos/{full_name}/tarball/{quote(ref)}"
+        response = requests.get(url, headers=self.headers, stream=True)
+        response.raise_for_status()
+        with tarfile.open(fileobj=response.raw, mode="r|gz") as archive:
+            for member in archive:
+                # Members sit under an "<owner>-<repo>-<sha>/" directory
+                path = member.name.partition("/")[2]
+                if not member.isfile() or (include and not include(path, member.size)):
+                    continue
+                try:
+                    files[path] = archive.extractfile(member).read().decode("utf-8")
+                except UnicodeDecodeError:
+                    continue
+                if limit and len(files) >= limit:
+                    break
+        return files
+    
     def get_file_content(self, full_name, file_path):
         """Get file content"""
         try:
@@ -121,26 +193,9 @@ class GitHubService:
     def _update_repository_cache(self, user_id, repos_data):
         """Update repository cache in database"""
         try:
-            # Clear existing cache for user
-            Repository.query.filter_by(user_id=user_id).delete()
-            
-            # Add new repositories
-            for repo_data in repos_data:
-                repo = Repository(
-                    github_id=str(repo_data['id']),
-                    user_id=user_id,
-                    name=repo_data['name'],
-                    full_name=repo_data['full_name'],
-                    description=repo_data.get('description'),
-                    language=repo_data.get('language'),
-                    private=repo_data['private'],
-                    clone_url=repo_data['clone_url'],
-                    html_url=repo_data['html_url'],
-                    cache_updated_at=datetime.utcnow()
-                )
-                db.session.add(repo)
-            
+            result = sync_user_repositories(user_id, repos_data)
             db.session.commit()
+            logging.info(f"Synced repositories for user {user_id}: {result}")
         except Exception as e:
             logging.error(f"Error updating repository cache: {e}")
             db.session.rollback()
@@ -12,9 +12,15 @@ class GroqService:
             "Content-Type": "application/json"
         }
     
-    def generate_test_cases(self, file_content, file_path, technology, edge_cases):
-        """Generate comprehensive test cases for given code"""
-        prompt = self._create_test_generation_prompt(file_content, file_path, technology, edge_cases)
+    def generate_test_cases(self, file_content, file_path, technology, edge_cases, target_symbols=None):
+        """Generate comprehensive test cases for given code
+
+        When ``target_symbols`` is given, ``file_content`` holds only those
+        symbols and the model is asked to test just them.
+        """
+        prompt = self._create_test_generation_prompt(
+            file_content, file_path, technology, edge_cases, target_symbols
+        )
         
         try:
             response = requests.post(
@@ -43,6 +49,49 @@ class GroqService:
             logging.error(f"Error generating test cases: {e}")
             return f"Error generating test cases: {str(e)}"
     
+    def adapt_test_cases(self, existing_tests, file_content, file_path, technology):
+        """Adapt tests written for a near-identical file to this file"""
+        prompt = f"""
+        The following test suite was generated for a file that is nearly identical to `{file_path}`.
+        Update it so it targets `{file_path}`: fix import paths, renamed symbols and changed behaviour.
+        Keep every test that still applies unchanged and do not add commentary.
+        
+        Technology: {technology}
+        
+        Existing tests:
+        {existing_tests}
+        
+        New file:
+        {file_content}
+        """
+        
+        try:
+            response = requests.post(
+                self.base_url,
+                headers=self.headers,
+                json={
+                    "model": "openai/gpt-oss-20b",
+                    "messages": [
+                        {
+                            "role": "system",
+                            "content": "You are an expert software testing engineer. Make minimal edits to existing test suites."
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    "max_tokens": 4000,
+                    "temperature": 0.1
+                }
+            )
+            response.raise_for_status()
+            result = response.json()
+            return result['choices'][0]['message']['content']
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error adapting test cases: {e}")
+            return None
+    
     def analyze_code_quality(self, code_content):
         """Analyze code quality and provide a comprehensive report with score"""
         prompt = f"""
@@ -227,8 +276,19 @@ class GroqService:
             logging.error(f"Error refactoring code: {e}")
             return f"Error analyzing code: {str(e)}"
     
-    def check_vulnerabilities(self, code_content, file_path):
-        """Generate a comprehensive security vulnerability report"""
+    def check_vulnerabilities(self, code_content, file_path, prescan_findings=None):
+        """Generate a comprehensive security vulnerability report
+
+        ``prescan_findings`` from the local rule engine are listed in the
+        prompt so the model confirms and explains them first.
+        """
+        prescan_text = "None"
+        if prescan_findings:
+            prescan_text = "\n".join(
+                f"        - Line {finding['line']}: {finding['message']} ({finding['severity']})"
+                for finding in prescan_findings
+            )
+        
         prompt = f"""
         # 🔒 Security Analysis Report
         
@@ -240,6 +300,10 @@ class GroqService:
         {code_content[:2000]}  # First 2000 chars to avoid token limits
         ```
         
+        ## 🧪 Local Static Analysis Findings
+        Verify these first, marking any false positives:
+{prescan_text}
+        
         ## 📋 Executive Summary
         - **Overall Risk Level:** [Critical/High/Medium/Low]
         - **Vulnerabilities Found:** [Number]
@@ -313,8 +377,14 @@ class GroqService:
         - [Security Best Practices Guide]
         
         **Format:** Use GitHub-flavored markdown with proper headers, code blocks, and emoji for better readability.
+
+        **Machine-readable summary:** End the report with a fenced ```json block listing every
+        confirmed vulnerability (use an empty list when there are none):
+        ```json
+        {{"findings": [{{"severity": "critical|high|medium|low", "title": "...", "location": "file.py:XX"}}]}}
+        ```
         """
-        
+
         try:
             response = requests.post(
                 self.base_url,
@@ -342,8 +412,8 @@ class GroqService:
             logging.error(f"Error checking for vulnerabilities: {e}")
             return f"Error checking for vulnerabilities: {str(e)}"
     
-    def generate_ai_report(self, prompt):
-        """Generate AI-powered analytics report"""
+    def generate_ai_report(self, prompt, fallback=True):
+        """Generate AI-powered analytics report; with ``fallback=False`` errors are raised"""
         try:
             response = requests.post(
                 self.base_url,
@@ -370,6 +440,8 @@ class GroqService:
             
         except Exception as e:
             logging.error(f"Error generating AI report: {e}")
+            if not fallback:
+                raise
             return f"""
             <h3>📊 Analytics Summary</h3>
             <p>Unable to generate AI insights at this time. Here's a basic summary of your development activity:</p>
@@ -380,10 +452,31 @@ class GroqService:
             </ul>
             """
     
-    def _create_test_generation_prompt(self, file_content, file_path, technology, edge_cases):
+    def _create_test_generation_prompt(self, file_content, file_path, technology, edge_cases, target_symbols=None):
         """Create a comprehensive prompt for test case generation"""
         edge_cases_text = ", ".join(edge_cases) if edge_cases else "standard edge cases"
         
+        if target_symbols:
+            return f"""
+        Generate test cases for the changed parts of the following code file.
+        
+        File Path: {file_path}
+        Technology: {technology}
+        Symbols to Test: {", ".join(target_symbols)}
+        Edge Cases to Include: {edge_cases_text}
+        
+        Code (only the changed symbols and the module imports are shown):
+        {file_content}
+        
+        Requirements:
+        1. Only generate tests for the listed symbols; tests for the rest of the file already exist
+        2. Output plain {technology} code with the imports the new tests need
+        3. Name each test function or test class after the symbol it covers
+        4. Test edge cases: {edge_cases_text}
+        5. Include positive and negative test scenarios
+        6. Follow {technology} testing best practices
+        """
+        
         return f"""
         Generate comprehensive test cases for the following code file.
         
@@ -0,0 +1,35 @@
+import uuid
+from typing import Any, Dict, Optional
+
+from celery_app import celery
+
+
+def enqueue(task, user_id, *args) -> str:
+    """Queue ``task(user_id, *args)`` and return its job ID.
+
+    The ID is the Celery task ID prefixed with the owner, so the status
+    API can tell whose job it is from Celery state alone.
+    """
+    return task.apply_async(args=(user_id, *args), task_id=f'{user_id}-{uuid.uuid4().hex}').id
+
+
+def job_owner(job_id) -> Optional[int]:
+    """The user ID a job ID was issued to, or None if it is not one of ours"""
+    owner, _, token = job_id.partition('-')
+    return int(owner) if owner.isdigit() and token else None
+
+
+def describe_job(job_id) -> Dict[str, Any]:
+    """A job's Celery state with its progress, result or error.
+
+    Unknown and expired jobs read as ``PENDING``, like in Celery.
+    """
+    result = celery.AsyncResult(job_id)
+    status = {'job_id': job_id, 'state': result.state}
+    if result.state == 'PROGRESS':
+        status['progress'] = result.info
+    elif result.state == 'SUCCESS':
+        status['result'] = result.result
+    elif result.state == 'FAILURE':
+        status['error'] = str(result.info)
+    return status
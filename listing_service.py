@@ -0,0 +1,94 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import joinedload, load_only
+
+from app import db
+from models import Analytics, Repository, TestCase
+
+MAX_PAGE_SIZE = 50
+TOTAL_MODES = ('none', 'approximate', 'exact')
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor for the position just after a row"""
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of ``encode_cursor``; raises ValueError for anything else"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def list_test_cases(user_id, limit=10, cursor: Optional[str] = None) -> Tuple[List[TestCase], Optional[str]]:
+    """One page of the user's test cases, newest first, and the cursor for the next.
+
+    Pages are found by seeking past ``(created_at, id)`` of the previous
+    page's last row on the ``(user_id, created_at)`` index instead of
+    skipping rows with OFFSET, so every page costs the same. Only listing
+    columns are loaded; the test content stays deferred and each row's
+    repository name comes from the same query.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = (
+        TestCase.query
+        .options(
+            load_only(
+                TestCase.id, TestCase.file_path, TestCase.technology, TestCase.quality_score,
+                TestCase.status, TestCase.created_at
+            ),
+            joinedload(TestCase.repository).load_only(Repository.name, Repository.full_name)
+        )
+        .filter(TestCase.user_id == user_id)
+    )
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(TestCase.created_at, TestCase.id) < tuple_(created_at, row_id))
+
+    # One extra row tells whether another page exists without counting
+    rows = query.order_by(TestCase.created_at.desc(), TestCase.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+def count_test_cases(user_id, mode='approximate') -> Optional[int]:
+    """Total for ``mode``: ``approximate`` reads the analytics counter, ``exact`` counts rows.
+
+    The counter is maintained on every generation and repaired on
+    reconciliation, so it is at most briefly off; ``exact`` scans the
+    user's index entries and grows with their history.
+    """
+    if mode == 'approximate':
+        total = db.session.scalar(select(Analytics.total_files_generated).where(Analytics.user_id == user_id))
+        if total is not None:
+            return total
+        mode = 'exact'
+    if mode == 'exact':
+        return db.session.scalar(select(func.count()).select_from(TestCase).where(TestCase.user_id == user_id))
+    return None
+
+
+def summarize_test_case(test_case: TestCase) -> Dict[str, Any]:
+    return {
+        'id': test_case.id,
+        'file_path': test_case.file_path,
+        'technology': test_case.technology,
+        'quality_score': test_case.quality_score,
+        'status': test_case.status,
+        'created_at': test_case.created_at.isoformat(),
+        'repository': {
+            'name': test_case.repository.name,
+            'full_name': test_case.repository.full_name
+        }
+    }
@@ -1,6 +1,45 @@
 from datetime import datetime
 from app import db
 from sqlalchemy import Text, JSON
+from sqlalchemy.ext.hybrid import hybrid_property
+
+def blob_text(name, reconstruct=None):
+    """Text attribute stored compressed and deduplicated in ``content_blobs``.
+
+    Rows reference their blob through ``<name>_hash`` and load it lazily on
+    first access. ``<name>_inline`` is the original column: rows written
+    before blobs existed are still read from it, and it is left empty once
+    a blob holds the text. ``reconstruct`` rebuilds the text of rows that
+    keep it in some other form and returns None for the rest. On the class
+    the attribute is the hash column, so queries can compare or group rows
+    by content without loading it.
+    """
+    inline, blob = f'{name}_inline', f'{name}_blob'
+
+    def fget(self):
+        content = getattr(self, blob)
+        if content is not None:
+            return content.text
+        if reconstruct is not None:
+            text = reconstruct(self)
+            if text is not None:
+                return text
+        return getattr(self, inline)
+
+    def fset(self, value):
+        # Imported here: blob_service imports the models
+        from blob_service import store_blob
+        if value is None:
+            setattr(self, blob, None)
+            setattr(self, inline, None)
+            return
+        setattr(self, blob, store_blob(value))
+        setattr(self, inline, '')
+
+    def expr(cls):
+        return getattr(cls, f'{name}_hash')
+
+    return hybrid_property(fget, fset, expr=expr)
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -33,11 +72,44 @@ class Repository(db.Model):
     html_url = db.Column(db.String(500), nullable=False)
     cached_content = db.Column(JSON, nullable=True)  # Cache repository structure
     cache_updated_at = db.Column(db.DateTime, nullable=True)
+    vanished_at = db.Column(db.DateTime, nullable=True)  # no longer listed by GitHub but still referenced by tests or analyses
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Lookups by name from the generator and by GitHub id when syncing; user_id
+        # leads so the per-user listings and deletes use them too
+        db.Index('ix_repositories_user_full_name', 'user_id', 'full_name'),
+        # Conflict target of the repository sync upsert
+        db.Index('uq_repositories_user_github', 'user_id', 'github_id', unique=True),
+    )
+    
     # Relationships
     test_cases = db.relationship('TestCase', backref='repository', lazy=True, cascade='all, delete-orphan')
 
+class ContentBlob(db.Model):
+    __tablename__ = 'content_blobs'
+    
+    hash = db.Column(db.String(64), primary_key=True)  # sha256 of the uncompressed text
+    codec = db.Column(db.String(10), nullable=False)  # zlib, none
+    size = db.Column(db.Integer, nullable=False)  # uncompressed bytes
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @property
+    def text(self):
+        if '_text' not in self.__dict__:
+            from blob_service import decompress
+            self._text = decompress(self.codec, self.data)
+        return self._text
+    
+    def remember_text(self, text):
+        self._text = text
+
+def _reconstruct_test_content(test_case):
+    # Imported here: version_service imports the models
+    from version_service import reconstruct_content
+    return reconstruct_content(test_case)
+
 class TestCase(db.Model):
     __tablename__ = 'test_cases'
     
@@ -45,13 +117,39 @@ class TestCase(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     repository_id = db.Column(db.Integer, db.ForeignKey('repositories.id'), nullable=False)
     file_path = db.Column(db.String(500), nullable=False)
-    test_content = db.Column(Text, nullable=False)
+    test_content_inline = db.Column('test_content', Text, nullable=False, default='')
+    test_content_hash = db.Column(db.String(64), db.ForeignKey('content_blobs.hash'), nullable=True)
     technology = db.Column(db.String(50), nullable=False)
     edge_cases = db.Column(JSON, nullable=True)
     quality_score = db.Column(db.Float, nullable=True)  # AI-generated quality assessment
     status = db.Column(db.String(20), default='generated')  # generated, committed, pushed
+    symbol_hashes = db.Column(JSON, nullable=True)  # {symbol: ast hash} of the source the tests cover
+    version = db.Column(db.Integer, nullable=True)  # 1, 2, ... per repository file; NULL for rows from before versioning
+    previous_version_id = db.Column(db.Integer, db.ForeignKey('test_cases.id', ondelete='SET NULL'), nullable=True)
+    delta_base_id = db.Column(db.Integer, db.ForeignKey('test_cases.id'), nullable=True)  # newer version the delta applies to
+    test_content_delta = db.Column(db.LargeBinary, nullable=True)  # compressed reverse delta; the content is not stored otherwise
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Covering indexes for the analytics aggregates, so they never touch test_content
+        db.Index('ix_test_cases_user_stats', 'user_id', 'technology', 'status', 'quality_score'),
+        db.Index('ix_test_cases_user_created', 'user_id', 'created_at'),
+        # Latest suite for a file; also serves the repository foreign key
+        db.Index('ix_test_cases_file_history', 'repository_id', 'file_path', 'created_at'),
+        # Retention cleanup across all users
+        db.Index('ix_test_cases_created', 'created_at'),
+        # Foreign key checks when older versions are deleted
+        db.Index('ix_test_cases_previous_version', 'previous_version_id'),
+        db.Index('ix_test_cases_delta_base', 'delta_base_id'),
+        # Blob garbage collection checks whether a hash is still referenced
+        db.Index('ix_test_cases_content_hash', 'test_content_hash'),
+    )
+    
+    test_content_blob = db.relationship('ContentBlob', foreign_keys=[test_content_hash])
+    test_content = blob_text('test_content', reconstruct=_reconstruct_test_content)
+    previous_version = db.relationship('TestCase', remote_side=[id], foreign_keys=[previous_version_id])
+    delta_base = db.relationship('TestCase', remote_side=[id], foreign_keys=[delta_base_id], post_update=True)
+    
 class Analytics(db.Model):
     __tablename__ = 'analytics'
     
@@ -67,6 +165,9 @@ class Analytics(db.Model):
     # Quality Metrics
     average_quality_score = db.Column(db.Float, default=0.0)
     top_notch_percentage = db.Column(db.Float, default=0.0)
+    quality_score_sum = db.Column(db.Float, default=0.0, server_default='0')  # running totals behind the two averages above
+    quality_score_count = db.Column(db.Integer, default=0, server_default='0')
+    top_notch_count = db.Column(db.Integer, default=0, server_default='0')
     average_vulnerability_score = db.Column(db.Float, default=0.0)
     average_refactor_score = db.Column(db.Float, default=0.0)
     
@@ -96,9 +197,42 @@ class Analytics(db.Model):
     code_quality_improvements = db.Column(db.Integer, default=0)
     
     last_updated = db.Column(db.DateTime, default=datetime.utcnow)
+    reconciled_at = db.Column(db.DateTime, nullable=True)  # NULL until counters are first rebuilt from source rows
+    
+    __table_args__ = (
+        # One row per user; the event layer upserts against it
+        db.Index('ix_analytics_user_id', 'user_id', unique=True),
+    )
     
     user = db.relationship('User', backref='analytics')
 
+class AnalyticsTechnologyCount(db.Model):
+    __tablename__ = 'analytics_technology_counts'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    technology = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'technology', name='uq_analytics_technology_counts_user_technology'),
+    )
+
+class ActivityRollup(db.Model):
+    __tablename__ = 'activity_rollups'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    granularity = db.Column(db.String(10), nullable=False)  # hour, day, month
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    metric = db.Column(db.String(30), nullable=False)  # test_cases, analyses, commits
+    value = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'granularity', 'metric', 'bucket_start', name='uq_activity_rollups_bucket'),
+        db.Index('ix_activity_rollups_retention', 'granularity', 'bucket_start'),
+    )
+
 class CodeAnalysis(db.Model):
     __tablename__ = 'code_analysis'
     
@@ -107,9 +241,129 @@ class CodeAnalysis(db.Model):
     repository_id = db.Column(db.Integer, db.ForeignKey('repositories.id'), nullable=False)
     file_path = db.Column(db.String(500), nullable=False)
     analysis_type = db.Column(db.String(50), nullable=False)  # refactor, vulnerability
-    original_code = db.Column(Text, nullable=False)
-    analysis_result = db.Column(Text, nullable=False)
+    original_code_inline = db.Column('original_code', Text, nullable=False, default='')
+    original_code_hash = db.Column(db.String(64), db.ForeignKey('content_blobs.hash'), nullable=True)
+    analysis_result_inline = db.Column('analysis_result', Text, nullable=False, default='')
+    analysis_result_hash = db.Column(db.String(64), db.ForeignKey('content_blobs.hash'), nullable=True)
+    max_severity = db.Column(db.String(10), nullable=True, index=True)  # critical, high, medium, low, none; NULL until parsed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_code_analysis_user_type', 'user_id', 'analysis_type'),
+        db.Index('ix_code_analysis_user_created', 'user_id', 'created_at'),
+        db.Index('ix_code_analysis_repository', 'repository_id'),
+        db.Index('ix_code_analysis_original_code_hash', 'original_code_hash'),
+        db.Index('ix_code_analysis_analysis_result_hash', 'analysis_result_hash'),
+    )
+    
     user = db.relationship('User', backref='code_analyses')
     repository = db.relationship('Repository', backref='code_analyses')
+    original_code_blob = db.relationship('ContentBlob', foreign_keys=[original_code_hash])
+    analysis_result_blob = db.relationship('ContentBlob', foreign_keys=[analysis_result_hash])
+    original_code = blob_text('original_code')
+    analysis_result = blob_text('analysis_result')
+
+class VulnerabilityFinding(db.Model):
+    __tablename__ = 'vulnerability_findings'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    analysis_id = db.Column(db.Integer, db.ForeignKey('code_analysis.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    severity = db.Column(db.String(10), nullable=False)  # critical, high, medium, low
+    title = db.Column(db.String(300), nullable=True)
+    location = db.Column(db.String(300), nullable=True)
+    source = db.Column(db.String(10), default='model')  # model, static
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_vulnerability_findings_user_severity', 'user_id', 'severity'),
+    )
+    
+    analysis = db.relationship('CodeAnalysis', backref=db.backref('findings', cascade='all, delete-orphan'))
+
+class SourceFingerprint(db.Model):
+    __tablename__ = 'source_fingerprints'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    test_case_id = db.Column(db.Integer, db.ForeignKey('test_cases.id'), nullable=False, unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)  # sha256 of normalized source tokens
+    signature = db.Column(JSON, nullable=False)  # MinHash signature of the source file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_source_fingerprints_user_hash', 'user_id', 'content_hash'),
+    )
+    
+    test_case = db.relationship('TestCase', backref=db.backref('fingerprint', uselist=False, cascade='all, delete-orphan'))
+
+class SourceFingerprintBand(db.Model):
+    __tablename__ = 'source_fingerprint_bands'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    fingerprint_id = db.Column(db.Integer, db.ForeignKey('source_fingerprints.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    band = db.Column(db.Integer, nullable=False)
+    bucket = db.Column(db.BigInteger, nullable=False)  # hash of the band number and its signature rows
+    
+    __table_args__ = (
+        db.Index('ix_source_fingerprint_bands_lookup', 'user_id', 'bucket'),
+        db.Index('ix_source_fingerprint_bands_fingerprint', 'fingerprint_id'),
+    )
+    
+    fingerprint = db.relationship('SourceFingerprint', backref=db.backref('bands', cascade='all, delete-orphan'))
+
+class GenerationJob(db.Model):
+    __tablename__ = 'generation_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    repository_id = db.Column(db.Integer, db.ForeignKey('repositories.id'), nullable=False)
+    technology = db.Column(db.String(50), nullable=False)
+    edge_cases = db.Column(JSON, nullable=True)
+    status = db.Column(db.String(20), default='pending')  # pending, running, cancelled, completed
+    max_parallel = db.Column(db.Integer, default=4)
+    total_files = db.Column(db.Integer, default=0)
+    completed_files = db.Column(db.Integer, default=0)
+    failed_files = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        # Repository sync checks whether a vanished repository is still referenced
+        db.Index('ix_generation_jobs_repository', 'repository_id'),
+    )
+    
+    user = db.relationship('User', backref='generation_jobs')
+    repository = db.relationship('Repository', backref='generation_jobs')
+    files = db.relationship('GenerationJobFile', backref='job', lazy='dynamic', cascade='all, delete-orphan')
+
+class GenerationJobFile(db.Model):
+    __tablename__ = 'generation_job_files'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('generation_jobs.id'), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)
+    status = db.Column(db.String(20), default='pending')  # pending, queued, running, completed, failed
+    generation_mode = db.Column(db.String(20), nullable=True)  # full, incremental, unchanged, reused, adapted
+    test_case_id = db.Column(db.Integer, db.ForeignKey('test_cases.id'), nullable=True)
+    error = db.Column(Text, nullable=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('job_id', 'file_path', name='uq_generation_job_files_path'),
+        db.Index('ix_generation_job_files_job_status', 'job_id', 'status'),
+        db.Index('ix_generation_job_files_test_case', 'test_case_id'),
+    )
+
+class ReplicationHeartbeat(db.Model):
+    __tablename__ = 'replication_heartbeat'
+    
+    # A single row stamped on the primary after writing commits. A replica
+    # whose copy has reached a sequence number has every commit before it;
+    # how far its beat_at trails the primary's is its replication lag
+    id = db.Column(db.Integer, primary_key=True)
+    sequence = db.Column(db.Integer, nullable=False, default=0)
+    beat_at = db.Column(db.DateTime, nullable=False)
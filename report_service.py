@@ -0,0 +1,175 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict
+
+from analytics_service import get_user_analytics, performance_indicators
+from cache_service import get_json, set_json, try_lock
+from groq_service import GroqService
+from vulnerability_service import SEVERITIES
+
+# Bump when the prompt changes so reports written for the old one are not served
+REPORT_PROMPT_VERSION = 1
+REPORT_TTL = 7 * 24 * 3600  # seconds
+REPORT_USER_TTL = 30 * 24 * 3600  # users who asked for a report recently get pregenerated ones
+PREGENERATE_INTERVAL = 300  # at most one pregeneration per user in this many seconds
+PREGENERATE_DELAY = 60  # lets a burst of writes settle before generating
+
+FALLBACK_REPORT = """
+<h3>📊 Analytics Summary</h3>
+<p>Unable to generate AI insights at this time. Please try again shortly.</p>
+"""
+
+
+def _significant(value, digits=2):
+    """Round to ``digits`` significant figures; small counts stay exact"""
+    rounded = float(f'{value:.{digits}g}')
+    return int(rounded) if isinstance(value, int) else rounded
+
+
+def report_snapshot(metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """The report inputs, bucketed so that small changes map to the same snapshot.
+
+    Counts and scores are kept to two significant figures, the quality
+    score to the nearest half point and the top-notch share to the nearest
+    5%, so a report is only regenerated once the numbers it discusses have
+    moved noticeably.
+    """
+    indicators = performance_indicators(metrics)
+    return {
+        'total_files_generated': _significant(metrics['total_files_generated']),
+        'total_repos': _significant(metrics['total_repos']),
+        'total_commits': _significant(metrics['total_commits']),
+        'total_analyses': _significant(metrics['total_analyses']),
+        'average_quality_score': round(metrics['average_quality_score'] * 2) / 2,
+        'top_notch_percentage': 5 * round(metrics['top_notch_percentage'] / 5),
+        'productivity_score': _significant(indicators['productivity_score']),
+        'quality_trend': indicators['quality_trend'],
+        'security_health': indicators['security_health'],
+        'vulnerabilities': {
+            severity: _significant(metrics['vulnerabilities'][severity]) for severity in SEVERITIES
+        },
+        'technology_breakdown': {
+            technology: _significant(count)
+            for technology, count in sorted(metrics['technology_breakdown'].items())
+        },
+    }
+
+
+def snapshot_hash(snapshot: Dict[str, Any]) -> str:
+    canonical = json.dumps([REPORT_PROMPT_VERSION, snapshot], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def build_report_prompt(snapshot: Dict[str, Any]) -> str:
+    """Prompt for the AI report, built only from the bucketed snapshot it is cached under"""
+    vulnerabilities = snapshot['vulnerabilities']
+    return f"""
+        As an expert software development analyst, create a comprehensive and insightful analytics report based on the following data:
+
+        **Development Activity:**
+        - Total files generated: {snapshot['total_files_generated']}
+        - Total repositories: {snapshot['total_repos']}
+        - Total commits: {snapshot['total_commits']}
+        - Total code analyses: {snapshot['total_analyses']}
+
+        **Quality Metrics:**
+        - Average quality score: {snapshot['average_quality_score']}/10
+        - Top-notch code percentage: {snapshot['top_notch_percentage']}%
+        - Productivity score: {snapshot['productivity_score']}
+
+        **Security Analysis:**
+        - Critical vulnerabilities: {vulnerabilities['critical']}
+        - High vulnerabilities: {vulnerabilities['high']}
+        - Medium vulnerabilities: {vulnerabilities['medium']}
+        - Low vulnerabilities: {vulnerabilities['low']}
+        - Security health: {snapshot['security_health']}
+
+        **Technology Breakdown:**
+        {snapshot['technology_breakdown']}
+
+        **Performance Indicators:**
+        - Quality trend: {snapshot['quality_trend']}
+
+        Please provide:
+        1. **Executive Summary** - Key insights and overall performance assessment
+        2. **Detailed Analysis** - Breakdown of each metric with actionable insights
+        3. **Recommendations** - Specific suggestions for improvement
+        4. **Trend Analysis** - Patterns and predictions based on the data
+        5. **Action Items** - Prioritized next steps for the developer
+
+        Format the response in HTML with proper styling, using emojis and clear sections. Make it engaging and professional.
+        """
+
+
+def _generate(snapshot, key) -> Dict[str, Any]:
+    content = GroqService().generate_ai_report(build_report_prompt(snapshot), fallback=False)
+    report = {'content': content, 'generated_at': datetime.utcnow().isoformat()}
+    set_json(f'ai-report:{key}', report, ttl=REPORT_TTL)
+    return report
+
+
+def get_ai_report(user_id, refresh=False) -> Dict[str, Any]:
+    """The user's AI report, served from cache unless ``refresh`` forces a new one.
+
+    Reports are keyed by snapshot hash alone: the prompt holds nothing but
+    the bucketed numbers, so users whose numbers coincide share a report.
+    A failed generation returns a fallback that is never cached.
+    """
+    set_json(f'ai-report:user:{user_id}', True, ttl=REPORT_USER_TTL)
+    snapshot = report_snapshot(get_user_analytics(user_id))
+    key = snapshot_hash(snapshot)
+
+    report = None if refresh else get_json(f'ai-report:{key}')
+    cached = report is not None
+    if report is None:
+        try:
+            report = _generate(snapshot, key)
+        except Exception as e:
+            logging.error(f"AI report generation failed for user {user_id}: {e}")
+            return {'content': FALLBACK_REPORT, 'generated_at': None, 'cached': False, 'snapshot_hash': key}
+    return {**report, 'cached': cached, 'snapshot_hash': key}
+
+
+def report_payload(report) -> Dict[str, Any]:
+    """The ``/api/generate-ai-report`` response body for a report from ``get_ai_report``"""
+    return {
+        'success': True,
+        'report_content': report['content'],
+        'cached': report['cached'],
+        'generated_at': report['generated_at'],
+        'snapshot_hash': report['snapshot_hash']
+    }
+
+
+def pregenerate_report(user_id) -> bool:
+    """Generate the report for the user's current snapshot unless it is cached already"""
+    snapshot = report_snapshot(get_user_analytics(user_id))
+    key = snapshot_hash(snapshot)
+    if get_json(f'ai-report:{key}') is not None:
+        return False
+    _generate(snapshot, key)
+    return True
+
+
+def schedule_report_pregeneration(user_id):
+    """Queue a delayed pregeneration after the user's analytics changed.
+
+    Only users who asked for a report recently qualify, and at most one
+    task per user is queued every ``PREGENERATE_INTERVAL`` seconds; the
+    task itself calls the model only when the snapshot hash moved. Needs
+    the shared Redis broker, so it is skipped without ``REDIS_URL``.
+    """
+    if not os.environ.get('REDIS_URL') or not get_json(f'ai-report:user:{user_id}'):
+        return
+    if not try_lock(f'ai-report:pregenerate:{user_id}', PREGENERATE_INTERVAL):
+        return
+
+    # Imported here: tasks imports the analytics modules that call this
+    from tasks import pregenerate_ai_report
+    try:
+        pregenerate_ai_report.apply_async((user_id,), countdown=PREGENERATE_DELAY)
+    except Exception as e:
+        logging.error(f"Failed to queue AI report pregeneration for user {user_id}: {e}")
@@ -0,0 +1,235 @@
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import func, update
+
+from app import db
+from event_service import publish
+from models import GenerationJob, GenerationJobFile
+
+MAX_PARALLEL_LIMIT = 16
+MAX_FILE_SIZE = 100 * 1024  # bytes; larger files rarely fit the model context
+
+SOURCE_EXTENSIONS = {
+    'python': ('.py',),
+    'javascript': ('.js', '.jsx', '.mjs'),
+    'typescript': ('.ts', '.tsx'),
+    'java': ('.java',),
+    'csharp': ('.cs',),
+    'go': ('.go',),
+    'rust': ('.rs',),
+    'php': ('.php',),
+    'ruby': ('.rb',),
+}
+
+_EXCLUDED_DIRECTORIES = {
+    'node_modules', 'vendor', 'venv', '.venv', 'env', 'dist', 'build', 'target',
+    '__pycache__', 'migrations', 'site-packages', '.git', 'tests', 'test', '__tests__', 'spec',
+}
+
+IN_FLIGHT_STATUSES = ('queued', 'running')
+FINISHED_FILE_STATUSES = ('completed', 'failed')
+
+
+def _is_test_file(file_name: str) -> bool:
+    lowered = file_name.lower()
+    return (
+        lowered.startswith('test_')
+        or lowered.startswith('conftest')
+        or any(marker in lowered for marker in ('_test.', '.test.', '.spec.', 'tests.'))
+    )
+
+
+def discover_eligible_files(tree: List[Dict[str, Any]], technology: str) -> List[str]:
+    """Pick the source files in a repository tree that tests should be generated for"""
+    extensions = SOURCE_EXTENSIONS.get((technology or '').lower())
+    if not extensions:
+        return []
+
+    eligible = []
+    for item in tree:
+        path = item.get('path', '')
+        parts = path.split('/')
+        if not path.endswith(extensions):
+            continue
+        if any(part in _EXCLUDED_DIRECTORIES or part.startswith('.') for part in parts[:-1]):
+            continue
+        if _is_test_file(parts[-1]) or parts[-1] == '__init__.py':
+            continue
+        if item.get('size', 0) > MAX_FILE_SIZE or item.get('size') == 0:
+            continue
+        eligible.append(path)
+
+    return sorted(eligible)
+
+
+def create_job(user_id, repository_id, technology, edge_cases, file_paths, max_parallel=4) -> GenerationJob:
+    """Create a job record with one pending entry per file"""
+    job = GenerationJob(
+        user_id=user_id,
+        repository_id=repository_id,
+        technology=technology,
+        edge_cases=edge_cases,
+        max_parallel=max(1, min(int(max_parallel), MAX_PARALLEL_LIMIT)),
+        total_files=len(file_paths),
+    )
+    db.session.add(job)
+    db.session.flush()
+
+    db.session.execute(
+        GenerationJobFile.__table__.insert(),
+        [{'job_id': job.id, 'file_path': path, 'status': 'pending'} for path in file_paths]
+    )
+    db.session.commit()
+    return job
+
+
+def claim_next_files(job: GenerationJob) -> List[int]:
+    """Mark up to the job's free parallel slots as queued and return their ids.
+
+    Counting in-flight files rather than trusting the caller keeps the job
+    within ``max_parallel`` even if more than one dispatch chain is active,
+    e.g. after a resume while the previous wave is still finishing.
+    """
+    in_flight = GenerationJobFile.query.filter(
+        GenerationJobFile.job_id == job.id,
+        GenerationJobFile.status.in_(IN_FLIGHT_STATUSES)
+    ).count()
+    free_slots = job.max_parallel - in_flight
+    if free_slots <= 0:
+        return []
+
+    file_ids = [
+        row.id for row in
+        db.session.query(GenerationJobFile.id)
+                  .filter_by(job_id=job.id, status='pending')
+                  .order_by(GenerationJobFile.id)
+                  .limit(free_slots)
+    ]
+    if file_ids:
+        db.session.execute(
+            update(GenerationJobFile)
+            .where(GenerationJobFile.id.in_(file_ids), GenerationJobFile.status == 'pending')
+            .values(status='queued')
+        )
+    db.session.commit()
+    return file_ids
+
+
+def record_file_result(job_file: GenerationJobFile, status, test_case_id=None, generation_mode=None, error=None):
+    """Store a file's outcome and bump the job counters atomically"""
+    job_file.status = status
+    job_file.test_case_id = test_case_id
+    job_file.generation_mode = generation_mode
+    job_file.error = error
+    job_file.finished_at = datetime.utcnow()
+
+    counter = GenerationJob.completed_files if status == 'completed' else GenerationJob.failed_files
+    db.session.execute(
+        update(GenerationJob)
+        .where(GenerationJob.id == job_file.job_id)
+        .values({counter: counter + 1})
+    )
+    db.session.commit()
+
+    job = job_file.job
+    publish(job.user_id, 'job', {
+        'job_id': job.id,
+        'file_path': job_file.file_path,
+        'status': status,
+        'completed_files': job.completed_files,
+        'failed_files': job.failed_files,
+        'total_files': job.total_files
+    })
+
+
+def finish_job_if_done(job: GenerationJob) -> bool:
+    """Mark the job completed once no file is pending or in flight"""
+    remaining = GenerationJobFile.query.filter(
+        GenerationJobFile.job_id == job.id,
+        GenerationJobFile.status.in_(('pending',) + IN_FLIGHT_STATUSES)
+    ).count()
+    if remaining:
+        return False
+
+    job.status = 'completed'
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    return True
+
+
+def cancel_job(job: GenerationJob):
+    """Stop dispatching new files; files already running are allowed to finish"""
+    if job.status in ('pending', 'running'):
+        job.status = 'cancelled'
+        db.session.execute(
+            update(GenerationJobFile)
+            .where(GenerationJobFile.job_id == job.id, GenerationJobFile.status == 'queued')
+            .values(status='pending')
+        )
+        db.session.commit()
+
+
+def resume_job(job: GenerationJob) -> bool:
+    """Re-queue everything that has not completed; completed files are never re-run"""
+    if job.status == 'running':
+        return False
+
+    failed = GenerationJobFile.query.filter_by(job_id=job.id, status='failed').count()
+    db.session.execute(
+        update(GenerationJobFile)
+        .where(GenerationJobFile.job_id == job.id, GenerationJobFile.status == 'failed')
+        .values(status='pending', error=None, finished_at=None)
+    )
+    job.failed_files = max((job.failed_files or 0) - failed, 0)
+    # A job cancelled before its first wave goes back to pending so the
+    # dispatcher still stamps started_at when it picks the job up
+    job.status = 'running' if job.started_at else 'pending'
+    job.finished_at = None
+    db.session.commit()
+    return True
+
+
+def job_status(job: GenerationJob, include_files=True) -> Dict[str, Any]:
+    """Serialize a job with aggregated progress and throughput"""
+    state_counts = dict(
+        db.session.query(GenerationJobFile.status, func.count(GenerationJobFile.id))
+                  .filter_by(job_id=job.id)
+                  .group_by(GenerationJobFile.status)
+                  .all()
+    )
+
+    finished = (job.completed_files or 0) + (job.failed_files or 0)
+    throughput = None
+    if job.started_at:
+        elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+        if elapsed > 0:
+            throughput = round(finished / elapsed * 60, 2)
+
+    status = {
+        'id': job.id,
+        'repository_id': job.repository_id,
+        'technology': job.technology,
+        'status': job.status,
+        'max_parallel': job.max_parallel,
+        'total_files': job.total_files,
+        'completed_files': job.completed_files,
+        'failed_files': job.failed_files,
+        'progress': round(finished / job.total_files * 100, 1) if job.total_files else 100.0,
+        'file_states': state_counts,
+        'files_per_minute': throughput,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+    if include_files:
+        status['files'] = [{
+            'file_path': job_file.file_path,
+            'status': job_file.status,
+            'generation_mode': job_file.generation_mode,
+            'test_case_id': job_file.test_case_id,
+            'error': job_file.error,
+        } for job_file in job.files.order_by(GenerationJobFile.id)]
+
+    return status
@@ -0,0 +1,125 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import delete, exists, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from analytics_service import record_repository_total
+from app import db
+from models import CodeAnalysis, GenerationJob, Repository, TestCase
+
+BATCH_SIZE = 500  # rows per upsert or delete statement
+SYNCED_COLUMNS = ('name', 'full_name', 'description', 'language', 'private', 'clone_url', 'html_url')
+
+_UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def repository_values(repo_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Repository columns from a GitHub API repository object"""
+    return {
+        'github_id': str(repo_data['id']),
+        'name': repo_data['name'],
+        'full_name': repo_data['full_name'],
+        'description': repo_data.get('description'),
+        'language': repo_data.get('language'),
+        'private': repo_data.get('private', False),
+        'clone_url': repo_data['clone_url'],
+        'html_url': repo_data['html_url'],
+    }
+
+
+def _batches(items: List, size=BATCH_SIZE) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _upsert(user_id, rows: List[Dict[str, Any]], now):
+    """``INSERT ... ON CONFLICT (user_id, github_id) DO UPDATE`` where supported"""
+    insert = _UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    statement = Repository.__table__.insert()
+    if insert is not None:
+        statement = insert(Repository.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=['user_id', 'github_id'],
+            set_={name: statement.excluded[name] for name in (*SYNCED_COLUMNS, 'cache_updated_at', 'vanished_at')}
+        )
+    for batch in _batches(rows):
+        db.session.execute(statement, [
+            {**row, 'user_id': user_id, 'cache_updated_at': now, 'vanished_at': None} for row in batch
+        ])
+
+
+def sync_user_repositories(user_id, repos_data: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Make the user's repository rows match a full GitHub listing in a few set-based statements.
+
+    Existing rows are read in one query; new and changed repositories are
+    upserted on ``(user_id, github_id)`` in batches and the rest only get
+    their sync time bumped. Repositories missing from the listing are
+    deleted in batches unless test cases, analyses or jobs still refer to
+    them; those are marked ``vanished_at`` instead so their history stays.
+    The caller commits.
+    """
+    now = datetime.utcnow()
+    existing = {
+        row.github_id: row for row in db.session.execute(
+            select(Repository.id, Repository.github_id, Repository.vanished_at,
+                   *[getattr(Repository, name) for name in SYNCED_COLUMNS])
+            .where(Repository.user_id == user_id)
+        )
+    }
+    incoming = {}
+    for repo_data in repos_data:
+        values = repository_values(repo_data)
+        incoming[values['github_id']] = values
+
+    inserted = [values for github_id, values in incoming.items() if github_id not in existing]
+    changed = [
+        values for github_id, values in incoming.items()
+        if github_id in existing and (
+            existing[github_id].vanished_at is not None
+            or any(getattr(existing[github_id], name) != values[name] for name in SYNCED_COLUMNS)
+        )
+    ]
+    if _UPSERT_INSERTS.get(db.session.get_bind().dialect.name) is not None:
+        _upsert(user_id, inserted + changed, now)
+    else:
+        _upsert(user_id, inserted, now)
+        for batch in _batches(changed):
+            db.session.execute(update(Repository), [
+                {**values, 'id': existing[values['github_id']].id, 'cache_updated_at': now, 'vanished_at': None}
+                for values in batch
+            ])
+
+    vanished_ids = [row.id for github_id, row in existing.items() if github_id not in incoming]
+    deleted = 0
+    referenced = [
+        exists().where(model.repository_id == Repository.id) for model in (TestCase, CodeAnalysis, GenerationJob)
+    ]
+    for batch in _batches(vanished_ids):
+        result = db.session.execute(
+            delete(Repository)
+            .where(Repository.id.in_(batch), *[~reference for reference in referenced])
+            .execution_options(synchronize_session=False)
+        )
+        deleted += result.rowcount
+        db.session.execute(
+            update(Repository)
+            .where(Repository.id.in_(batch), Repository.vanished_at.is_(None))
+            .values(vanished_at=now)
+            .execution_options(synchronize_session=False)
+        )
+
+    # Unchanged repositories were seen in this sync too
+    db.session.execute(
+        update(Repository)
+        .where(Repository.user_id == user_id, Repository.vanished_at.is_(None))
+        .values(cache_updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    record_repository_total(user_id)
+    return {
+        'inserted': len(inserted),
+        'updated': len(changed),
+        'deleted': deleted,
+        'vanished': len(vanished_ids) - deleted,
+    }
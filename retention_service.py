@@ -0,0 +1,111 @@
+import gzip
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, select, update
+
+from app import db
+from blob_service import BLOB_COLUMNS, delete_orphan_blobs
+from export_service import EXPORTS, ndjson_chunks, select_rows
+from search_service import remove_rows
+from models import (
+    CodeAnalysis, GenerationJobFile, SourceFingerprint, SourceFingerprintBand, TestCase, VulnerabilityFinding
+)
+
+BATCH_SIZE = 1000  # rows deleted per transaction
+PAUSE_SECONDS = 0.05  # between batches, so other writers get the table
+# Datasets subject to retention, with the export name their archives follow
+RETAINED = {'test-cases': TestCase, 'analyses': CodeAnalysis}
+
+
+def _execute(statement):
+    # Bulk statements; the session holds none of these rows
+    return db.session.execute(statement.execution_options(synchronize_session=False))
+
+
+def _delete_dependents(model, in_batch):
+    """Set-based deletes of the rows that reference the batch, which ORM cascades would have removed"""
+    if model is TestCase:
+        fingerprints = select(SourceFingerprint.id).where(SourceFingerprint.test_case_id.in_(in_batch))
+        _execute(delete(SourceFingerprintBand).where(SourceFingerprintBand.fingerprint_id.in_(fingerprints)))
+        _execute(delete(SourceFingerprint).where(SourceFingerprint.test_case_id.in_(in_batch)))
+        _execute(
+            update(GenerationJobFile).where(GenerationJobFile.test_case_id.in_(in_batch)).values(test_case_id=None)
+        )
+        # Newer versions outlive the ones before them
+        _execute(
+            update(TestCase).where(TestCase.previous_version_id.in_(in_batch)).values(previous_version_id=None)
+        )
+    elif model is CodeAnalysis:
+        _execute(delete(VulnerabilityFinding).where(VulnerabilityFinding.analysis_id.in_(in_batch)))
+
+
+def _archive(path, model, columns, criteria):
+    """Append the batch to ``path`` as one gzip member, closed before the rows are deleted"""
+    with gzip.open(path, 'at', encoding='utf-8') as archive:
+        for chunk in ndjson_chunks(select_rows(model, columns, *criteria), columns):
+            archive.write(chunk)
+
+
+def purge_expired(dataset, cutoff: datetime, batch_size=BATCH_SIZE, archive_dir: Optional[str] = None,
+                  pause=PAUSE_SECONDS) -> Dict[str, Any]:
+    """Delete rows of ``dataset`` created before ``cutoff`` in short transactions.
+
+    Each batch is the next ``batch_size`` expired ids, deleted as one
+    primary-key range with set-based statements and committed on its own,
+    so locks are held for one batch at a time; ``pause`` seconds pass
+    between batches. With ``archive_dir`` every batch is first appended to
+    a gzipped NDJSON file in the export format plus ``user_id``. Blobs left
+    unreferenced are deleted with the rows.
+    """
+    model = RETAINED[dataset]
+    columns = ['user_id', *EXPORTS[dataset][1]]
+    hash_columns = [getattr(model, f'{column}_hash') for column in BLOB_COLUMNS[model]]
+    archive_path = None
+    if archive_dir:
+        os.makedirs(archive_dir, exist_ok=True)
+        archive_path = os.path.join(archive_dir, f"{dataset}-{cutoff:%Y%m%d}-{datetime.utcnow():%Y%m%d%H%M%S}.ndjson.gz")
+
+    deleted = batches = 0
+    longest = 0.0
+    after_id = 0
+    while True:
+        started = time.perf_counter()
+        ids = db.session.scalars(
+            select(model.id)
+            .where(model.created_at < cutoff, model.id > after_id)
+            .order_by(model.id)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            db.session.commit()
+            break
+
+        after_id = ids[-1]
+        criteria = (model.id.between(ids[0], ids[-1]), model.created_at < cutoff)
+        in_batch = select(model.id).where(*criteria)
+        if archive_path:
+            _archive(archive_path, model, columns, criteria)
+
+        hashes = set()
+        for row in db.session.execute(select(*hash_columns).where(*criteria)):
+            hashes.update(row)
+        _delete_dependents(model, in_batch)
+        remove_rows(dataset, ids)
+        result = _execute(delete(model).where(*criteria))
+        delete_orphan_blobs(hashes)
+        db.session.commit()
+
+        deleted += result.rowcount
+        batches += 1
+        longest = max(longest, time.perf_counter() - started)
+        if len(ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    logging.info(f"Retention removed {deleted} {dataset} rows created before {cutoff:%Y-%m-%d} in {batches} batches")
+    return {'deleted': deleted, 'batches': batches, 'longest_batch_seconds': longest, 'archive': archive_path}
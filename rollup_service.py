@@ -0,0 +1,186 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+
+from sqlalchemy import bindparam, func, select
+
+from app import db
+from db_upsert import upsert_increment
+from models import ActivityRollup, TestCase, CodeAnalysis
+
+GRANULARITIES = ('hour', 'day', 'month')
+METRICS = ('test_cases', 'analyses', 'commits')
+
+# Metrics that can be recounted from their own rows; commits only exist as events
+SOURCE_MODELS = {'test_cases': TestCase, 'analyses': CodeAnalysis}
+
+# How long each tier is kept; coarser tiers are written alongside, so
+# dropping an expired bucket loses no totals
+RETENTION = {'hour': timedelta(days=7), 'day': timedelta(days=365), 'month': None}
+
+# Buckets recounted from source rows when a user's analytics are reconciled
+REBUILD_BUCKETS = {'hour': 7 * 24, 'day': 30, 'month': 12}
+
+MAX_RANGE_BUCKETS = 1000
+
+_count_statements = {}
+
+
+def bucket_start(granularity, when: datetime) -> datetime:
+    """Start of the bucket containing ``when``"""
+    if granularity == 'hour':
+        return when.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        return when.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'month':
+        return when.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def next_bucket(granularity, start: datetime) -> datetime:
+    if granularity == 'hour':
+        return start + timedelta(hours=1)
+    if granularity == 'day':
+        return start + timedelta(days=1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def bucket_starts(granularity, start: datetime, end: datetime, limit=MAX_RANGE_BUCKETS) -> List[datetime]:
+    """Starts of every bucket overlapping ``[start, end]``, oldest first"""
+    starts = []
+    current = bucket_start(granularity, start)
+    while current <= end:
+        if len(starts) == limit:
+            raise ValueError(f"Range covers more than {limit} {granularity} buckets")
+        starts.append(current)
+        current = next_bucket(granularity, current)
+    return starts
+
+
+def recent_bucket_starts(granularity, count, now=None) -> List[datetime]:
+    """The ``count`` most recent bucket starts, newest first"""
+    starts = [bucket_start(granularity, now or datetime.utcnow())]
+    while len(starts) < count:
+        starts.append(bucket_start(granularity, starts[-1] - timedelta(microseconds=1)))
+    return starts
+
+
+def record_activity(user_id, amounts: Dict[str, int], when=None):
+    """Add to the hour, day and month buckets of each metric; the caller commits"""
+    when = when or datetime.utcnow()
+    for granularity in GRANULARITIES:
+        start = bucket_start(granularity, when)
+        for metric, amount in amounts.items():
+            upsert_increment(
+                ActivityRollup,
+                {'user_id': user_id, 'granularity': granularity, 'metric': metric, 'bucket_start': start},
+                {'value': amount}
+            )
+
+
+def activity_series(user_id, granularity, start: datetime, end: datetime, metrics: Iterable[str] = METRICS):
+    """Per-bucket values for ``[start, end]``, read from the rollups only.
+
+    One indexed range read returns at most one row per bucket and metric,
+    so the cost depends on the number of buckets, not on activity volume.
+    Buckets with no activity, or already dropped by retention, read as 0.
+    """
+    metrics = list(metrics)
+    starts = bucket_starts(granularity, start, end)
+    values = {bucket: dict.fromkeys(metrics, 0) for bucket in starts}
+    if not starts:
+        return []
+
+    rows = db.session.query(ActivityRollup.bucket_start, ActivityRollup.metric, ActivityRollup.value).filter(
+        ActivityRollup.user_id == user_id,
+        ActivityRollup.granularity == granularity,
+        ActivityRollup.metric.in_(metrics),
+        ActivityRollup.bucket_start >= starts[0],
+        ActivityRollup.bucket_start <= starts[-1]
+    )
+    for bucket, metric, value in rows:
+        if bucket in values:
+            values[bucket][metric] = value
+
+    return [{'start': bucket.isoformat(), **values[bucket]} for bucket in starts]
+
+
+def _count_statement(size):
+    """Range counts for ``size`` buckets of every source model, built once per size.
+
+    Each bucket is a count on the model's ``(user_id, created_at)`` index,
+    sent as scalar subqueries of a single SELECT; this avoids per-row date
+    functions, whose names and return types differ between SQLite and
+    Postgres.
+    """
+    if size not in _count_statements:
+        def bucket_count(model, index):
+            return select(func.count()).select_from(model).where(
+                model.user_id == bindparam('user_id'),
+                model.created_at >= bindparam(f'start_{index}'),
+                model.created_at < bindparam(f'end_{index}')
+            ).scalar_subquery()
+
+        _count_statements[size] = select(*[
+            bucket_count(model, index)
+            for model in SOURCE_MODELS.values()
+            for index in range(size)
+        ])
+    return _count_statements[size]
+
+
+def count_source_rows(user_id, granularity, starts: List[datetime]) -> Dict[str, List[int]]:
+    """Count test cases and analyses per bucket directly from their tables"""
+    params = {'user_id': user_id}
+    for index, start in enumerate(starts):
+        params[f'start_{index}'] = start
+        params[f'end_{index}'] = next_bucket(granularity, start)
+    counts = db.session.execute(_count_statement(len(starts)), params).one()
+
+    size = len(starts)
+    return {
+        metric: list(counts[position * size:(position + 1) * size])
+        for position, metric in enumerate(SOURCE_MODELS)
+    }
+
+
+def rebuild_rollups(user_id, now=None):
+    """Recount source metrics for each tier's recent buckets; the caller commits"""
+    for granularity, count in REBUILD_BUCKETS.items():
+        starts = recent_bucket_starts(granularity, count, now)
+        counts = count_source_rows(user_id, granularity, starts)
+
+        existing = {
+            (row.metric, row.bucket_start): row for row in ActivityRollup.query.filter(
+                ActivityRollup.user_id == user_id,
+                ActivityRollup.granularity == granularity,
+                ActivityRollup.metric.in_(list(SOURCE_MODELS)),
+                ActivityRollup.bucket_start >= starts[-1]
+            )
+        }
+        for metric, values in counts.items():
+            for start, value in zip(starts, values):
+                row = existing.get((metric, start))
+                if row is not None:
+                    row.value = value
+                elif value:
+                    db.session.add(ActivityRollup(
+                        user_id=user_id, granularity=granularity, metric=metric, bucket_start=start, value=value
+                    ))
+
+
+def compact_rollups(now=None) -> int:
+    """Drop buckets past their tier's retention; coarser tiers keep the totals"""
+    now = now or datetime.utcnow()
+    deleted = 0
+    for granularity, retention in RETENTION.items():
+        if retention is None:
+            continue
+        cutoff = bucket_start(granularity, now - retention)
+        deleted += ActivityRollup.query.filter(
+            ActivityRollup.granularity == granularity,
+            ActivityRollup.bucket_start < cutoff
+        ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
@@ -2,12 +2,28 @@ import os
 import json
 import base64
 from datetime import datetime
-from flask import render_template, request, redirect, url_for, session, jsonify, flash
+from flask import Response, render_template, request, redirect, url_for, session, jsonify, flash, stream_with_context
+from sqlalchemy import text
 from app import app, db
-from models import User, Repository, TestCase, Analytics, CodeAnalysis
+from models import User, Repository, TestCase, GenerationJob
 from github_service import GitHubService
 from groq_service import GroqService
 from summary_service import get_project_summary
+from generation_service import generate_tests_for_files
+from code_analysis_service import ANALYSIS_TYPES, analyze_file
+from repository_job_service import (
+    discover_eligible_files, create_job, cancel_job, resume_job, job_status
+)
+from rollup_service import GRANULARITIES, METRICS, RETENTION, activity_series, bucket_start, recent_bucket_starts
+from analytics_service import analytics_etag, get_cached_user_analytics, performance_indicators, record_commit
+from report_service import get_ai_report, report_payload
+from export_service import EXPORTS, FORMATS as EXPORT_FORMATS, export_stream, resolve_columns
+from version_service import diff_versions, version_history
+from event_service import publish, stream_events
+from db_routing import replica_reads
+from search_service import KINDS as SEARCH_KINDS, search
+from job_service import describe_job, enqueue, job_owner
+from tasks import ai_report_job, code_analysis_job, dispatch_repository_job, generate_tests_job, security_prescan_job
 import requests
 import logging
 
@@ -69,6 +85,21 @@ def api_project_summary():
         summary = PROJECT_SUMMARY
     return jsonify(summary)
 
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is serving requests; touches nothing else"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: the database answers a trivial query"""
+    try:
+        db.session.execute(text('SELECT 1'))
+    except Exception as e:
+        logging.error(f"Readiness check failed: {e}")
+        return jsonify({'status': 'unavailable'}), 503
+    return jsonify({'status': 'ok'})
+
 @app.route('/auth/github')
 def github_auth():
     """Redirect to GitHub OAuth"""
@@ -223,7 +254,7 @@ def api_file_content(full_name):
 
 @app.route('/api/generate-tests', methods=['POST'])
 def api_generate_tests():
-    """Generate test cases using AI"""
+    """Generate test cases using AI, or queue them with ``async=true``"""
     if 'access_token' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
@@ -231,136 +262,174 @@ def api_generate_tests():
     if not data or 'files' not in data:
         return jsonify({'error': 'Files required'}), 400
     
+    technology = data.get('technology', 'python')
+    edge_cases = data.get('edge_cases', [])
+    reuse_similar = data.get('reuse_similar', True)
+    
     try:
-        groq_service = GroqService()
-        github_service = GitHubService(session['access_token'])
-        
-        results = []
-        for file_info in data['files']:
-            file_path = file_info['path']
-            repo_name = file_info['repo']
-            
-            # Get file content
-            content = github_service.get_file_content(repo_name, file_path)
-            if content:
-                # Generate tests
-                test_content = groq_service.generate_test_cases(
-                    content, 
-                    file_path, 
-                    data.get('technology', 'python'),
-                    data.get('edge_cases', [])
-                )
-                
-                # Analyze quality
-                quality_analysis = groq_service.analyze_code_quality(content)
-                
-                # Save to database
-                test_case = TestCase()
-                test_case.user_id = session['user_id']
-                test_case.repository_id = _get_or_create_repo_id(repo_name)
-                test_case.file_path = file_path
-                test_case.test_content = test_content
-                test_case.technology = data.get('technology', 'python')
-                test_case.edge_cases = data.get('edge_cases', [])
-                test_case.quality_score = quality_analysis.get('score', 5.0)
-                db.session.add(test_case)
-                
-                # Update analytics in real-time
-                analytics = Analytics.query.filter_by(user_id=session['user_id']).first()
-                if analytics:
-                    analytics.total_files_generated += 1
-                    analytics.last_updated = datetime.utcnow()
-                    
-                    # Update technology breakdown
-                    if analytics.technology_breakdown is None:
-                        analytics.technology_breakdown = {}
-                    technology = data.get('technology', 'python')
-                    analytics.technology_breakdown[technology] = analytics.technology_breakdown.get(technology, 0) + 1
-                
-                results.append({
-                    'file_path': file_path,
-                    'test_content': test_content,
-                    'quality_score': quality_analysis.get('score', 5.0)
-                })
+        if _wants_async(data):
+            job_id = enqueue(generate_tests_job, session['user_id'], data['files'], technology, edge_cases,
+                             reuse_similar)
+            return _job_accepted(job_id)
+        
+        results = generate_tests_for_files(
+            GroqService(),
+            GitHubService(session['access_token']),
+            session['user_id'],
+            data['files'],
+            technology,
+            edge_cases,
+            reuse_similar=reuse_similar
+        )
         
         db.session.commit()
+        publish(session['user_id'], 'generation', {
+            'current': len(data['files']), 'total': len(data['files']), 'status': 'completed'
+        })
         return jsonify({'results': results})
         
     except Exception as e:
         logging.error(f"Error generating tests: {e}")
         return jsonify({'error': 'Failed to generate tests'}), 500
 
+@app.route('/api/repository-jobs', methods=['POST'])
+def api_create_repository_job():
+    """Start generating tests for every eligible file in a repository"""
+    if 'access_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    data = request.get_json()
+    if not data or 'repo_name' not in data:
+        return jsonify({'error': 'Repository name required'}), 400
+    
+    try:
+        repo_name = data['repo_name']
+        technology = data.get('technology', 'python')
+        
+        repository_id = _get_or_create_repo_id(repo_name)
+        if repository_id is None:
+            return jsonify({'error': 'Repository not found'}), 404
+        
+        github_service = GitHubService(session['access_token'])
+        tree = github_service.get_repository_tree(repo_name, data.get('ref', 'HEAD'))
+        file_paths = discover_eligible_files(tree, technology)
+        if not file_paths:
+            return jsonify({'error': 'No eligible files found'}), 400
+        
+        job = create_job(
+            session['user_id'],
+            repository_id,
+            technology,
+            data.get('edge_cases', []),
+            file_paths,
+            data.get('max_parallel', 4)
+        )
+        dispatch_repository_job.delay(job.id)
+        
+        return jsonify(job_status(job, include_files=False)), 202
+        
+    except Exception as e:
+        logging.error(f"Error creating repository job: {e}")
+        return jsonify({'error': 'Failed to start repository job'}), 500
+
+@app.route('/api/repository-jobs/<int:job_id>')
+def api_repository_job_status(job_id):
+    """Get aggregated progress and per-file state of a repository job"""
+    if 'access_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    job = GenerationJob.query.filter_by(id=job_id, user_id=session['user_id']).first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    include_files = request.args.get('files', 'true').lower() != 'false'
+    return jsonify(job_status(job, include_files=include_files))
+
+@app.route('/api/repository-jobs/<int:job_id>/cancel', methods=['POST'])
+def api_cancel_repository_job(job_id):
+    """Cancel a repository job"""
+    if 'access_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    job = GenerationJob.query.filter_by(id=job_id, user_id=session['user_id']).first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    cancel_job(job)
+    return jsonify(job_status(job, include_files=False))
+
+@app.route('/api/repository-jobs/<int:job_id>/resume', methods=['POST'])
+def api_resume_repository_job(job_id):
+    """Resume a cancelled or partially failed repository job"""
+    if 'access_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    job = GenerationJob.query.filter_by(id=job_id, user_id=session['user_id']).first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if not resume_job(job):
+        return jsonify({'error': 'Job is already running'}), 409
+    
+    dispatch_repository_job.delay(job.id)
+    return jsonify(job_status(job, include_files=False)), 202
+
 @app.route('/api/code-analysis', methods=['POST'])
 def api_code_analysis():
-    """Analyze code for refactoring or vulnerabilities"""
+    """Analyze code for refactoring or vulnerabilities, or queue the analysis with ``async=true``"""
     if 'access_token' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
     data = request.get_json()
     if not data or 'file_path' not in data or 'analysis_type' not in data:
         return jsonify({'error': 'File path and analysis type required'}), 400
+    if data['analysis_type'] not in ANALYSIS_TYPES:
+        return jsonify({'error': 'Invalid analysis type'}), 400
     
     try:
-        groq_service = GroqService()
-        github_service = GitHubService(session['access_token'])
-        
-        file_path = data['file_path']
-        repo_name = data['repo_name']
-        analysis_type = data['analysis_type']
-        
-        # Get file content
-        content = github_service.get_file_content(repo_name, file_path)
-        if not content:
-            return jsonify({'error': 'File not found'}), 404
-        
-        # Perform analysis
-        if analysis_type == 'refactor':
-            result = groq_service.refactor_code(content, file_path)
-        elif analysis_type == 'vulnerability':
-            result = groq_service.check_vulnerabilities(content, file_path)
-        else:
-            return jsonify({'error': 'Invalid analysis type'}), 400
-        
-        # Save analysis
-        analysis = CodeAnalysis()
-        analysis.user_id = session['user_id']
-        analysis.repository_id = _get_or_create_repo_id(repo_name)
-        analysis.file_path = file_path
-        analysis.analysis_type = analysis_type
-        analysis.original_code = content
-        analysis.analysis_result = result
-        db.session.add(analysis)
-        
-        # Update analytics in real-time
-        analytics = Analytics.query.filter_by(user_id=session['user_id']).first()
-        if analytics:
-            analytics.total_analyses += 1
-            analytics.last_updated = datetime.utcnow()
-            
-            # Update security metrics if vulnerability analysis
-            if analysis_type == 'vulnerability':
-                if 'critical' in result.lower():
-                    analytics.critical_vulnerabilities_found += 1
-                elif 'high' in result.lower():
-                    analytics.high_vulnerabilities_found += 1
-                elif 'medium' in result.lower():
-                    analytics.medium_vulnerabilities_found += 1
-                elif 'low' in result.lower():
-                    analytics.low_vulnerabilities_found += 1
-            
-            # Update refactoring metrics if refactor analysis
-            if analysis_type == 'refactor':
-                analytics.refactoring_suggestions_generated += 1
-        
+        if _wants_async(data):
+            job_id = enqueue(code_analysis_job, session['user_id'], data['repo_name'], data['file_path'],
+                             data['analysis_type'], bool(data.get('deep_scan')))
+            return _job_accepted(job_id)
+        
+        analysis = analyze_file(
+            GroqService(),
+            GitHubService(session['access_token']),
+            session['user_id'],
+            data['repo_name'],
+            data['file_path'],
+            data['analysis_type'],
+            deep_scan=bool(data.get('deep_scan'))
+        )
         db.session.commit()
         
-        return jsonify({'result': result})
+        return jsonify(analysis)
         
+    except LookupError:
+        return jsonify({'error': 'File not found'}), 404
     except Exception as e:
         logging.error(f"Error performing code analysis: {e}")
         return jsonify({'error': 'Failed to analyze code'}), 500
 
+@app.route('/api/repository/<path:full_name>/security-prescan')
+def api_security_prescan(full_name):
+    """Queue a ranking of a repository's files by local security risk; poll /api/jobs/<id> for it"""
+    if 'access_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    max_files = min(request.args.get('max_files', 200, type=int), 1000)
+    
+    try:
+        job_id = enqueue(security_prescan_job, session['user_id'], full_name, request.args.get('ref', 'HEAD'),
+                         max_files)
+        return _job_accepted(job_id)
+        
+    except Exception as e:
+        logging.error(f"Error queueing security pre-scan: {e}")
+        return jsonify({'error': 'Failed to start security pre-scan'}), 500
+
 @app.route('/api/analytics')
+@replica_reads()
 def api_analytics():
     """Get comprehensive real-time analytics data"""
     if 'access_token' not in session:
@@ -369,96 +438,27 @@ def api_analytics():
     try:
         user_id = session['user_id']
         
-        # Get or create analytics record
-        analytics = Analytics.query.filter_by(user_id=user_id).first()
-        if not analytics:
-            analytics = Analytics()
-            analytics.user_id = user_id
-            db.session.add(analytics)
-        
-        # Calculate comprehensive analytics
-        test_cases = TestCase.query.filter_by(user_id=user_id).all()
-        code_analyses = CodeAnalysis.query.filter_by(user_id=user_id).all()
-        repositories = Repository.query.filter_by(user_id=user_id).all()
-        
-        # Basic Stats
-        total_files = len(test_cases)
-        total_repos = len(repositories)
-        total_analyses = len(code_analyses)
-        
-        # Calculate commits (from test cases with committed status)
-        total_commits = sum(1 for tc in test_cases if tc.status == 'committed')
-        
-        # Quality Metrics
-        if test_cases:
-            quality_scores = [tc.quality_score or 0 for tc in test_cases if tc.quality_score]
-            avg_quality = sum(quality_scores) / len(quality_scores) if quality_scores else 0
-            top_notch_count = sum(1 for score in quality_scores if score >= 8.0)
-            top_notch_percentage = (top_notch_count / len(quality_scores)) * 100 if quality_scores else 0
-        else:
-            avg_quality = 0
-            top_notch_percentage = 0
-        
-        # Technology Breakdown
-        tech_breakdown = {}
-        lang_breakdown = {}
-        for tc in test_cases:
-            tech = tc.technology or 'unknown'
-            tech_breakdown[tech] = tech_breakdown.get(tech, 0) + 1
-            
-            # Map technology to language
-            lang_map = {
-                'python': 'Python', 'javascript': 'JavaScript', 'typescript': 'TypeScript',
-                'java': 'Java', 'csharp': 'C#', 'php': 'PHP', 'ruby': 'Ruby',
-                'go': 'Go', 'rust': 'Rust', 'swift': 'Swift', 'kotlin': 'Kotlin'
-            }
-            lang = lang_map.get(tech.lower(), tech.title())
-            lang_breakdown[lang] = lang_breakdown.get(lang, 0) + 1
-        
-        # Security Metrics
-        critical_vulns = sum(1 for ca in code_analyses if ca.analysis_type == 'vulnerability' and 'critical' in ca.analysis_result.lower())
-        high_vulns = sum(1 for ca in code_analyses if ca.analysis_type == 'vulnerability' and 'high' in ca.analysis_result.lower())
-        medium_vulns = sum(1 for ca in code_analyses if ca.analysis_type == 'vulnerability' and 'medium' in ca.analysis_result.lower())
-        low_vulns = sum(1 for ca in code_analyses if ca.analysis_type == 'vulnerability' and 'low' in ca.analysis_result.lower())
-        
-        # Refactoring Metrics
-        refactor_analyses = [ca for ca in code_analyses if ca.analysis_type == 'refactor']
-        refactor_suggestions = len(refactor_analyses)
-        
-        # Time-based Analytics (last 30 days)
-        from datetime import timedelta
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_test_cases = [tc for tc in test_cases if tc.created_at >= thirty_days_ago]
-        recent_analyses = [ca for ca in code_analyses if ca.created_at >= thirty_days_ago]
-        
-        daily_activity = {}
-        for i in range(30):
-            date = (datetime.utcnow() - timedelta(days=i)).strftime('%Y-%m-%d')
-            daily_activity[date] = {
-                'test_cases': sum(1 for tc in recent_test_cases if tc.created_at.strftime('%Y-%m-%d') == date),
-                'analyses': sum(1 for ca in recent_analyses if ca.created_at.strftime('%Y-%m-%d') == date)
-            }
-        
-        # Update analytics record
-        analytics.total_files_generated = total_files
-        analytics.total_repos = total_repos
-        analytics.total_commits = total_commits
-        analytics.total_analyses = total_analyses
-        analytics.average_quality_score = avg_quality
-        analytics.top_notch_percentage = top_notch_percentage
-        analytics.technology_breakdown = tech_breakdown
-        analytics.language_breakdown = lang_breakdown
-        analytics.daily_activity = daily_activity
-        analytics.critical_vulnerabilities_found = critical_vulns
-        analytics.high_vulnerabilities_found = high_vulns
-        analytics.medium_vulnerabilities_found = medium_vulns
-        analytics.low_vulnerabilities_found = low_vulns
-        analytics.refactoring_suggestions_generated = refactor_suggestions
-        analytics.last_updated = datetime.utcnow()
-        
-        db.session.commit()
-        
-        return jsonify({
+        # Idle polls only check the version counter and get an empty 304
+        etag = analytics_etag(user_id)
+        if etag and request.if_none_match.contains(etag):
+            return _not_modified(etag)
+        
+        metrics, etag = get_cached_user_analytics(user_id, etag)
+        total_files = metrics['total_files_generated']
+        total_repos = metrics['total_repos']
+        total_analyses = metrics['total_analyses']
+        avg_quality = metrics['average_quality_score']
+        top_notch_percentage = metrics['top_notch_percentage']
+        tech_breakdown = metrics['technology_breakdown']
+        lang_breakdown = metrics['language_breakdown']
+        critical_vulns = metrics['vulnerabilities']['critical']
+        high_vulns = metrics['vulnerabilities']['high']
+        medium_vulns = metrics['vulnerabilities']['medium']
+        low_vulns = metrics['vulnerabilities']['low']
+        refactor_suggestions = metrics['refactoring_suggestions_generated']
+        daily_activity = metrics['daily_activity']
+        
+        response = jsonify({
             # Basic Stats
             'total_files_generated': total_files,
             'total_repos': total_repos,
@@ -486,78 +486,198 @@ def api_analytics():
             'daily_activity': daily_activity,
             
             # Performance Indicators
-            'productivity_score': round((total_files + total_analyses) / max(total_repos, 1), 2),
-            'quality_trend': 'improving' if avg_quality > 7.0 else 'stable' if avg_quality > 5.0 else 'needs_improvement',
-            'security_health': 'excellent' if (critical_vulns + high_vulns) == 0 else 'good' if (critical_vulns + high_vulns) <= 2 else 'needs_attention'
+            **performance_indicators(metrics)
         })
+        return _revalidate(response, etag)
         
     except Exception as e:
         logging.error(f"Error fetching analytics: {e}")
         return jsonify({'error': 'Failed to fetch analytics'}), 500
 
+@app.route('/api/analytics/activity')
+@replica_reads()
+def api_analytics_activity():
+    """Activity history per hour, day or month, served from rollups"""
+    if 'access_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f"Granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+    
+    metrics = request.args.get('metrics', ','.join(METRICS)).split(',')
+    if not set(metrics) <= set(METRICS):
+        return jsonify({'error': f"Metrics must be among {', '.join(METRICS)}"}), 400
+    
+    try:
+        end = datetime.fromisoformat(request.args['end']) if 'end' in request.args else datetime.utcnow()
+        start = (
+            datetime.fromisoformat(request.args['start']) if 'start' in request.args
+            else recent_bucket_starts(granularity, 30, end)[-1]
+        )
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO 8601 dates'}), 400
+    
+    try:
+        buckets = activity_series(session['user_id'], granularity, start, end, metrics)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    retention = RETENTION[granularity]
+    return jsonify({
+        'granularity': granularity,
+        'retained_since': (
+            bucket_start(granularity, datetime.utcnow() - retention).isoformat() if retention else None
+        ),
+        'buckets': buckets
+    })
+
+@app.route('/api/events')
+def api_events():
+    """Server-sent events for the dashboard: analytics changes, generation and task progress"""
+    if 'access_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    # EventSource sends Last-Event-ID on reconnect; the query parameter
+    # lets a fresh page resume from an ID it stored itself
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    return Response(
+        stream_events(session['user_id'], last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/export/<dataset>')
+def api_export(dataset):
+    """Stream all of the user's test cases or analyses as NDJSON or CSV"""
+    if 'access_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    if dataset not in EXPORTS:
+        return jsonify({'error': f"Dataset must be one of {', '.join(EXPORTS)}"}), 404
+    
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"Format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    # Validated up front: once streaming starts the status code is sent
+    try:
+        columns = resolve_columns(dataset, request.args['columns'].split(',') if request.args.get('columns') else None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    compress = request.args.get('gzip') == 'true'
+    filename = f"{dataset}.{export_format}{'.gz' if compress else ''}"
+    mimetype = 'application/gzip' if compress else (
+        'application/x-ndjson' if export_format == 'ndjson' else 'text/csv'
+    )
+    return Response(
+        stream_with_context(export_stream(dataset, session['user_id'], export_format, columns, compress)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/search')
+@replica_reads()
+def api_search():
+    """Ranked full-text search over the user's generated tests and analyses"""
+    if 'access_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    kind = request.args.get('type', 'all')
+    if kind != 'all' and kind not in SEARCH_KINDS:
+        return jsonify({'error': f"type must be all or one of {', '.join(SEARCH_KINDS)}"}), 400
+    
+    try:
+        results, next_cursor = search(
+            session['user_id'], request.args.get('q', ''),
+            kinds=tuple(SEARCH_KINDS) if kind == 'all' else (kind,),
+            limit=request.args.get('limit', 20, type=int),
+            cursor=request.args.get('cursor')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error searching: {e}")
+        return jsonify({'error': 'Search failed'}), 500
+    
+    return jsonify({
+        'results': results,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    })
+
+@app.route('/api/test-cases/<int:test_case_id>/versions')
+def api_test_case_versions(test_case_id):
+    """List every version of the test case's file, newest first"""
+    if 'access_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    test_case = TestCase.query.filter_by(id=test_case_id, user_id=session['user_id']).first()
+    if not test_case:
+        return jsonify({'error': 'Test case not found'}), 404
+    
+    return jsonify({'file_path': test_case.file_path, 'versions': version_history(test_case)})
+
+@app.route('/api/test-cases/<int:test_case_id>/diff')
+def api_test_case_diff(test_case_id):
+    """Unified diff of a test case against another version, by default the one before it"""
+    if 'access_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    test_case = TestCase.query.filter_by(id=test_case_id, user_id=session['user_id']).first()
+    if not test_case:
+        return jsonify({'error': 'Test case not found'}), 404
+    
+    against_id = request.args.get('against', type=int) or test_case.previous_version_id
+    if against_id is None:
+        return jsonify({'error': 'No earlier version to compare with'}), 404
+    other = TestCase.query.filter_by(
+        id=against_id, user_id=session['user_id'],
+        repository_id=test_case.repository_id, file_path=test_case.file_path
+    ).first()
+    if not other:
+        return jsonify({'error': 'Version not found for this file'}), 404
+    
+    old, new = sorted((other, test_case), key=lambda version: (version.created_at, version.id))
+    return jsonify({
+        'from_id': old.id,
+        'to_id': new.id,
+        'diff': diff_versions(old, new, context=request.args.get('context', 3, type=int))
+    })
+
 @app.route('/api/generate-ai-report', methods=['POST'])
 def api_generate_ai_report():
-    """Generate AI-powered analytics report"""
+    """Generate AI-powered analytics report, or queue it with ``async=true``"""
     if 'access_token' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
+    # The report is built from server-side analytics; a posted 'analytics'
+    # payload from older clients is ignored
+    data = request.get_json(silent=True) or {}
+    refresh = bool(data.get('refresh')) or request.args.get('refresh') == 'true'
+    
     try:
-        data = request.get_json()
-        analytics = data.get('analytics', {})
-        
-        # Generate AI report using Groq
-        groq_service = GroqService()
-        
-        # Create comprehensive prompt for AI report
-        prompt = f"""
-        As an expert software development analyst, create a comprehensive and insightful analytics report based on the following data:
-
-        **Development Activity:**
-        - Total files generated: {analytics.get('total_files_generated', 0)}
-        - Total repositories: {analytics.get('total_repos', 0)}
-        - Total commits: {analytics.get('total_commits', 0)}
-        - Total code analyses: {analytics.get('total_analyses', 0)}
-
-        **Quality Metrics:**
-        - Average quality score: {analytics.get('average_quality_score', 0)}/10
-        - Top-notch code percentage: {analytics.get('top_notch_percentage', 0)}%
-        - Productivity score: {analytics.get('productivity_score', 0)}
-
-        **Security Analysis:**
-        - Critical vulnerabilities: {analytics.get('critical_vulnerabilities_found', 0)}
-        - High vulnerabilities: {analytics.get('high_vulnerabilities_found', 0)}
-        - Medium vulnerabilities: {analytics.get('medium_vulnerabilities_found', 0)}
-        - Low vulnerabilities: {analytics.get('low_vulnerabilities_found', 0)}
-        - Security health: {analytics.get('security_health', 'good')}
-
-        **Technology Breakdown:**
-        {analytics.get('technology_breakdown', {})}
-
-        **Performance Indicators:**
-        - Quality trend: {analytics.get('quality_trend', 'stable')}
-
-        Please provide:
-        1. **Executive Summary** - Key insights and overall performance assessment
-        2. **Detailed Analysis** - Breakdown of each metric with actionable insights
-        3. **Recommendations** - Specific suggestions for improvement
-        4. **Trend Analysis** - Patterns and predictions based on the data
-        5. **Action Items** - Prioritized next steps for the developer
-
-        Format the response in HTML with proper styling, using emojis and clear sections. Make it engaging and professional.
-        """
-        
-        # Generate report using Groq
-        report_content = groq_service.generate_ai_report(prompt)
-        
-        return jsonify({
-            'success': True,
-            'report_content': report_content
-        })
+        if _wants_async(data):
+            return _job_accepted(enqueue(ai_report_job, session['user_id'], refresh))
+        
+        return jsonify(report_payload(get_ai_report(session['user_id'], refresh=refresh)))
         
     except Exception as e:
         logging.error(f"Error generating AI report: {e}")
         return jsonify({'error': 'Failed to generate AI report'}), 500
 
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """Get the state and progress of a queued LLM job, and its result once done"""
+    if 'access_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    if job_owner(job_id) != session['user_id']:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(describe_job(job_id))
+
 @app.route('/api/pull-requests')
 def api_pull_requests():
     """Get pull requests for user repositories"""
@@ -608,6 +728,8 @@ def api_commit_tests():
         result = github_service.create_file(repo_name, file_path, encoded_content, message)
         
         if result:
+            record_commit(session['user_id'])
+            db.session.commit()
             return jsonify({'success': True, 'message': 'Tests committed successfully'})
         else:
             return jsonify({'error': 'Failed to commit tests'}), 500
@@ -623,43 +745,32 @@ def logout():
     flash('Logged out successfully', 'success')
     return redirect(url_for('home'))
 
+def _revalidate(response, etag):
+    """Let browsers keep the response but check the ETag before reusing it"""
+    if etag:
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _not_modified(etag):
+    return _revalidate(app.response_class(status=304), etag)
+
 def _get_or_create_repo_id(repo_full_name):
     """Get or create repository ID"""
-    user_id = session['user_id']
-    repo = Repository.query.filter_by(full_name=repo_full_name, user_id=user_id).first()
-    
-    if repo:
-        return repo.id
-    
-    # If repo doesn't exist, create a minimal one
-    try:
-        github_service = GitHubService(session['access_token'])
-        repo_data = github_service.get_user_repositories(user_id)
-        
-        # Find the repo in the API response
-        target_repo = next((r for r in repo_data if r['full_name'] == repo_full_name), None)
-        
-        if target_repo:
-            new_repo = Repository(
-                github_id=str(target_repo['id']),
-                user_id=user_id,
-                name=target_repo['name'],
-                full_name=target_repo['full_name'],
-                description=target_repo.get('description'),
-                language=target_repo.get('language'),
-                private=target_repo['private'],
-                clone_url=target_repo['clone_url'],
-                html_url=target_repo['html_url'],
-                cache_updated_at=datetime.utcnow()
-            )
-            db.session.add(new_repo)
-            db.session.commit()
-            return new_repo.id
-            
-    except Exception as e:
-        logging.error(f"Error creating repository record: {e}")
-    
-    return None
+    github_service = GitHubService(session.get('access_token'))
+    return github_service.get_repository_id(session['user_id'], repo_full_name)
+
+def _wants_async(data):
+    """Whether the client asked for a job ID to poll instead of waiting for the LLM"""
+    flag = request.args.get('async', (data or {}).get('async', False))
+    return str(flag).lower() == 'true'
+
+def _job_accepted(job_id):
+    return jsonify({
+        'job_id': job_id,
+        'state': 'PENDING',
+        'status_url': url_for('api_job_status', job_id=job_id)
+    }), 202
 
 @app.errorhandler(404)
 def not_found(error):
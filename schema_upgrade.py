@@ -0,0 +1,95 @@
+import logging
+
+from sqlalchemy import inspect, text
+
+from app import db
+
+# Indexes superseded by another one, dropped once their replacement exists
+RETIRED_INDEXES = {
+    'repositories': {'ix_repositories_user_github': 'uq_repositories_user_github'},
+}
+
+# Older releases could store a repository twice for a user; point everything
+# at the oldest copy and drop the others so the unique index can be built
+_DUPLICATE_REPOSITORIES = """
+    SELECT id FROM repositories AS duplicate
+    WHERE id > (SELECT MIN(id) FROM repositories AS original
+                WHERE original.user_id = duplicate.user_id AND original.github_id = duplicate.github_id)
+"""
+_ORIGINAL_REPOSITORY = """
+    (SELECT MIN(original.id) FROM repositories AS original
+     JOIN repositories AS duplicate
+       ON original.user_id = duplicate.user_id AND original.github_id = duplicate.github_id
+     WHERE duplicate.id = {table}.repository_id)
+"""
+
+
+def _merge_duplicate_repositories(connection):
+    for table in ('test_cases', 'code_analysis', 'generation_jobs'):
+        connection.execute(text(
+            f"UPDATE {table} SET repository_id = {_ORIGINAL_REPOSITORY.format(table=table)} "
+            f"WHERE repository_id IN ({_DUPLICATE_REPOSITORIES})"
+        ))
+    result = connection.execute(text(f"DELETE FROM repositories WHERE id IN ({_DUPLICATE_REPOSITORIES})"))
+    if result.rowcount:
+        logging.info(f"Merged {result.rowcount} duplicate repositories")
+
+
+# Data fixes run just before the named index is first created
+BEFORE_INDEX = {'uq_repositories_user_github': _merge_duplicate_repositories}
+
+
+def upgrade_schema():
+    """Bring tables created by older releases up to date with the models.
+
+    ``db.create_all()`` only creates missing tables, so columns added to an
+    existing model are appended here with ``ALTER TABLE`` and indexes added
+    to an existing model are created. New columns must be nullable or carry
+    a server default for this to work on populated tables.
+    """
+    inspector = inspect(db.engine)
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+
+            if not column.nullable and column.server_default is None:
+                logging.warning(
+                    f"Cannot add NOT NULL column {table.name}.{column.name} without a server default"
+                )
+                continue
+
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+
+            with db.engine.begin() as connection:
+                connection.execute(text(ddl))
+            logging.info(f"Added column {table.name}.{column.name}")
+
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            try:
+                if index.name in BEFORE_INDEX:
+                    with db.engine.begin() as connection:
+                        BEFORE_INDEX[index.name](connection)
+                index.create(db.engine, checkfirst=True)
+                existing_indexes.add(index.name)
+                logging.info(f"Created index {index.name}")
+            except Exception as e:
+                # e.g. a new unique index over rows that still contain duplicates
+                logging.error(f"Could not create index {index.name}: {e}")
+        
+        for retired, replacement in RETIRED_INDEXES.get(table.name, {}).items():
+            if retired in existing_indexes and replacement in existing_indexes:
+                with db.engine.begin() as connection:
+                    connection.execute(text(f"DROP INDEX {retired}"))
+                logging.info(f"Dropped index {retired}, replaced by {replacement}")
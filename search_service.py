@@ -0,0 +1,330 @@
+import base64
+import html
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.orm import Session
+
+from app import db
+from models import CodeAnalysis, Repository, TestCase
+
+MAX_PAGE_SIZE = 50
+SNIPPET_TOKENS = 24
+# Searchable rows: model, text column, kind token and the bit that makes a
+# document id from the row id
+KINDS = {
+    'test-cases': (TestCase, 'test_content', 'testcase', 0),
+    'analyses': (CodeAnalysis, 'analysis_result', 'analysis', 1),
+}
+
+# Snippet markers that cannot occur in escaped text; replaced by <mark> at the end
+_START, _STOP = '\ue000', '\ue001'
+
+_TERM = re.compile(r'[^\s"]+')
+
+# SQLite keeps the index in an FTS5 table keyed by document id. The owner
+# column holds one token per kind and user (``testcase42``), so the user and
+# kind filter is an OR of short posting lists inside the MATCH
+_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+    "owner, file_path, body, tokenize = 'unicode61 remove_diacritics 2')",
+]
+_SQLITE_DROP = ["DROP TABLE IF EXISTS search_index"]
+
+# Postgres keeps a generated tsvector with a GIN index; 'simple' matches the
+# unstemmed tokens of the SQLite index and suits identifiers in code
+_POSTGRES_DDL = [
+    "CREATE TABLE IF NOT EXISTS search_documents ("
+    "doc_id BIGINT PRIMARY KEY, user_id INTEGER NOT NULL, kind VARCHAR(20) NOT NULL, "
+    "file_path TEXT NOT NULL, body TEXT NOT NULL, "
+    "document tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', file_path), 'A') || setweight(to_tsvector('simple', body), 'D')) STORED)",
+    "CREATE INDEX IF NOT EXISTS ix_search_documents_document ON search_documents USING GIN (document)",
+    "CREATE INDEX IF NOT EXISTS ix_search_documents_user ON search_documents (user_id, kind)",
+]
+_POSTGRES_DROP = ["DROP TABLE IF EXISTS search_documents"]
+
+_DDL = {'sqlite': (_SQLITE_DDL, _SQLITE_DROP), 'postgresql': (_POSTGRES_DDL, _POSTGRES_DROP)}
+
+
+@event.listens_for(db.metadata, 'after_create')
+def create_search_index(metadata, connection, **kw):
+    """Create the dialect's full-text index next to the tables; rows written before it existed need ``reindex``"""
+    for statement in _DDL.get(connection.dialect.name, ([], []))[0]:
+        connection.execute(text(statement))
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def drop_search_index(metadata, connection, **kw):
+    for statement in _DDL.get(connection.dialect.name, ([], []))[1]:
+        connection.execute(text(statement))
+
+
+def document_id(kind, row_id) -> int:
+    return row_id * 2 + KINDS[kind][3]
+
+
+def _kind_of(instance) -> Optional[str]:
+    for kind, (model, _, _, _) in KINDS.items():
+        if isinstance(instance, model):
+            return kind
+    return None
+
+
+def document(kind, row_id, user_id, file_path, body) -> Dict[str, Any]:
+    """Index entry for one row, as ``index_documents`` takes it"""
+    token = KINDS[kind][2]
+    return {
+        'doc_id': document_id(kind, row_id), 'user_id': user_id, 'owner': f'{token}{user_id}',
+        'kind': token, 'file_path': file_path, 'body': body or '',
+    }
+
+
+def _document(kind, row) -> Dict[str, Any]:
+    return document(kind, row.id, row.user_id, row.file_path, getattr(row, KINDS[kind][1]))
+
+
+def index_documents(connection, documents: List[Dict[str, Any]]):
+    """Insert or replace index entries in the caller's transaction"""
+    if not documents:
+        return
+    if connection.dialect.name == 'sqlite':
+        remove_documents(connection, [document['doc_id'] for document in documents])
+        connection.execute(text(
+            "INSERT INTO search_index (rowid, owner, file_path, body) "
+            "VALUES (:doc_id, :owner, :file_path, :body)"
+        ), documents)
+    elif connection.dialect.name == 'postgresql':
+        connection.execute(text(
+            "INSERT INTO search_documents (doc_id, user_id, kind, file_path, body) "
+            "VALUES (:doc_id, :user_id, :kind, :file_path, :body) "
+            "ON CONFLICT (doc_id) DO UPDATE SET file_path = excluded.file_path, body = excluded.body"
+        ), documents)
+
+
+def remove_documents(connection, doc_ids: Iterable[int]):
+    doc_ids = list(doc_ids)
+    if not doc_ids:
+        return
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text("DELETE FROM search_index WHERE rowid = :doc_id"),
+                           [{'doc_id': doc_id} for doc_id in doc_ids])
+    elif connection.dialect.name == 'postgresql':
+        connection.execute(text("DELETE FROM search_documents WHERE doc_id = :doc_id"),
+                           [{'doc_id': doc_id} for doc_id in doc_ids])
+
+
+def remove_rows(kind, row_ids: Iterable[int]):
+    """Drop the entries of deleted rows, for set-based deletes that skip the ORM"""
+    remove_documents(db.session.connection(), [document_id(kind, row_id) for row_id in row_ids])
+
+
+def _content_changed(instance, column) -> bool:
+    attrs = inspect(instance).attrs
+    if attrs.file_path.history.has_changes():
+        return True
+    # Older versions turned into deltas drop their blob but keep their text
+    hash_history = getattr(attrs, f'{column}_hash').history
+    inline_history = getattr(attrs, f'{column}_inline').history
+    return any(hash_history.added) or any(inline_history.added)
+
+
+@event.listens_for(Session, 'after_flush')
+def _maintain_index(session, flush_context):
+    # Index entries change in the same transaction as their rows
+    changed, removed = [], []
+    for instance in session.new:
+        kind = _kind_of(instance)
+        if kind:
+            changed.append(_document(kind, instance))
+    for instance in session.dirty:
+        kind = _kind_of(instance)
+        if kind and _content_changed(instance, KINDS[kind][1]):
+            changed.append(_document(kind, instance))
+    for instance in session.deleted:
+        kind = _kind_of(instance)
+        if kind:
+            removed.append(document_id(kind, instance.id))
+    if changed or removed:
+        connection = session.connection()
+        remove_documents(connection, removed)
+        index_documents(connection, changed)
+
+
+def reindex(kind, batch_size=500, after_id=0) -> int:
+    """Index one batch of ``kind`` rows by primary key, e.g. rows from before the index existed.
+
+    Returns the last id seen, or 0 once no rows are left.
+    """
+    model = KINDS[kind][0]
+    rows = db.session.scalars(
+        select(model).where(model.id > after_id).order_by(model.id).limit(batch_size)
+    ).all()
+    index_documents(db.session.connection(), [_document(kind, row) for row in rows])
+    db.session.commit()
+    return rows[-1].id if len(rows) == batch_size else 0
+
+
+def encode_cursor(score: float, doc_id: int) -> str:
+    raw = json.dumps([score, doc_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        score, doc_id = json.loads(raw)
+        return float(score), int(doc_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _terms(query: str) -> List[Tuple[str, bool]]:
+    """``(term, is_prefix)`` pairs; a trailing ``*`` asks for a prefix match"""
+    terms = []
+    for term in _TERM.findall(query):
+        prefix = term.endswith('*')
+        term = term.rstrip('*')
+        if term:
+            terms.append((term, prefix))
+    return terms
+
+
+def _quoted(terms) -> str:
+    return ' AND '.join('"' + term.replace('"', '""') + '"' + ('*' if prefix else '') for term, prefix in terms)
+
+
+def _keyset(after) -> str:
+    # Best first, then by descending document id
+    condition = "WHERE score < :score OR (score = :score AND doc_id < :doc_id) " if after else ""
+    return condition + "ORDER BY score DESC, doc_id DESC LIMIT :limit"
+
+
+def _sqlite_page(user_id, terms, kinds, limit, after):
+    owner = 'owner : (' + ' OR '.join(f'{KINDS[kind][2]}{int(user_id)}' for kind in kinds) + ')'
+    match = f'{owner} AND {_quoted(terms)}'
+    # Not bm25: its term weights count matches across every user's rows,
+    # which costs a pass over the whole doclist of a common term per query.
+    # Hits whose path has every term come first instead
+    # Hits is materialized so the path tier is worked out once per row,
+    # not again for every mention of score in the keyset condition
+    rows = db.session.execute(text(
+        "WITH hits AS MATERIALIZED ("
+        "  SELECT rowid AS doc_id, CASE WHEN rowid IN ("
+        "    SELECT rowid FROM search_index WHERE search_index MATCH :path_match"
+        "  ) THEN 1.0 ELSE 0.0 END AS score"
+        "  FROM search_index WHERE search_index MATCH :match"
+        f") SELECT doc_id, score FROM hits {_keyset(after)}"
+    ), {
+        'match': match, 'path_match': f'{owner} AND file_path : ({_quoted(terms)})',
+        'score': after and after[0], 'doc_id': after and after[1], 'limit': limit + 1,
+    }).all()
+    snippets = {}
+    if rows:
+        snippets = dict(db.session.execute(text(
+            # Column 2 is the body; -1 would pick the owner token, which always matches
+            f"SELECT rowid, snippet(search_index, 2, :start, :stop, '…', {SNIPPET_TOKENS}) "
+            "FROM search_index WHERE search_index MATCH :match AND rowid IN "
+            f"({', '.join(str(row.doc_id) for row in rows[:limit])})"
+        ), {'match': match, 'start': _START, 'stop': _STOP}).all())
+    return rows, snippets
+
+
+def _postgres_page(user_id, terms, kinds, limit, after):
+    query = ' & '.join(
+        "'" + term.replace("'", "''").replace('\\', '\\\\') + "'" + (':*' if prefix else '') for term, prefix in terms
+    )
+    # ts_rank_cd only reads the matching rows; path tokens carry weight A, so they count ten times the text
+    rows = db.session.execute(text(
+        "SELECT doc_id, score FROM ("
+        "  SELECT doc_id, ts_rank_cd(document, to_tsquery('simple', :query))::float8 AS score"
+        "  FROM search_documents"
+        "  WHERE user_id = :user_id AND kind = ANY(:kinds) AND document @@ to_tsquery('simple', :query)"
+        f") AS ranked {_keyset(after)}"
+    ), {
+        'query': query, 'user_id': user_id, 'kinds': [KINDS[kind][2] for kind in kinds],
+        'score': after and after[0], 'doc_id': after and after[1], 'limit': limit + 1,
+    }).all()
+    snippets = {}
+    if rows:
+        snippets = dict(db.session.execute(text(
+            "SELECT doc_id, ts_headline('simple', file_path || E'\\n' || body, to_tsquery('simple', :query), :options) "
+            "FROM search_documents WHERE doc_id = ANY(:doc_ids)"
+        ), {
+            'query': query, 'doc_ids': [row.doc_id for row in rows[:limit]],
+            'options': f'StartSel={_START}, StopSel={_STOP}, MaxWords={SNIPPET_TOKENS}, MinWords=8, MaxFragments=2',
+        }).all())
+    return rows, snippets
+
+
+_PAGES = {'sqlite': _sqlite_page, 'postgresql': _postgres_page}
+
+
+def _render_snippet(snippet: Optional[str]) -> str:
+    escaped = html.escape(snippet or '')
+    return escaped.replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+def _page_rows(doc_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Listing fields of the documents' rows, two id lookups in all"""
+    found = {}
+    test_case_ids = [doc_id // 2 for doc_id in doc_ids if doc_id % 2 == KINDS['test-cases'][3]]
+    analysis_ids = [doc_id // 2 for doc_id in doc_ids if doc_id % 2 == KINDS['analyses'][3]]
+    if test_case_ids:
+        for row in db.session.execute(
+            select(TestCase.id, TestCase.file_path, TestCase.technology, TestCase.quality_score,
+                   TestCase.created_at, Repository.full_name)
+            .join(Repository, Repository.id == TestCase.repository_id)
+            .where(TestCase.id.in_(test_case_ids))
+        ):
+            found[document_id('test-cases', row.id)] = {
+                'type': 'test-case', 'id': row.id, 'file_path': row.file_path, 'repository': row.full_name,
+                'technology': row.technology, 'quality_score': row.quality_score,
+                'created_at': row.created_at.isoformat(),
+            }
+    if analysis_ids:
+        for row in db.session.execute(
+            select(CodeAnalysis.id, CodeAnalysis.file_path, CodeAnalysis.analysis_type, CodeAnalysis.max_severity,
+                   CodeAnalysis.created_at, Repository.full_name)
+            .join(Repository, Repository.id == CodeAnalysis.repository_id)
+            .where(CodeAnalysis.id.in_(analysis_ids))
+        ):
+            found[document_id('analyses', row.id)] = {
+                'type': 'analysis', 'id': row.id, 'file_path': row.file_path, 'repository': row.full_name,
+                'analysis_type': row.analysis_type, 'max_severity': row.max_severity,
+                'created_at': row.created_at.isoformat(),
+            }
+    return found
+
+
+def search(user_id, query: str, kinds=tuple(KINDS), limit=20,
+           cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of the user's test cases and analyses matching every term, best first.
+
+    Terms match whole tokens of the file path or text, or prefixes when
+    they end in ``*``. Postgres scores hits with ``ts_rank_cd``; SQLite
+    puts hits whose path has every term first. Either way ties go by
+    descending document id, newest rows of each kind first, and pages continue after the ``(score, document id)`` of the
+    previous page's last hit, so only the page's hits get snippets and row
+    lookups. Raises ValueError for a query without terms or an invalid
+    cursor.
+    """
+    terms = _terms(query)
+    if not terms:
+        raise ValueError("Search query must contain at least one term")
+    page = _PAGES.get(db.session.get_bind().dialect.name)
+    if page is None:
+        raise ValueError("Full-text search needs SQLite or PostgreSQL")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    after = decode_cursor(cursor) if cursor else None
+
+    rows, snippets = page(user_id, terms, kinds, limit, after)
+    details = _page_rows([row.doc_id for row in rows[:limit]])
+    results = [
+        {**details[row.doc_id], 'score': row.score, 'snippet': _render_snippet(snippets.get(row.doc_id))}
+        for row in rows[:limit] if row.doc_id in details
+    ]
+    next_cursor = encode_cursor(rows[limit - 1].score, rows[limit - 1].doc_id) if len(rows) > limit else None
+    return results, next_cursor
@@ -0,0 +1,275 @@
+import ast
+import re
+from typing import Any, Dict, Iterable, List, Tuple
+
+SEVERITY_WEIGHTS = {'critical': 10.0, 'high': 5.0, 'medium': 2.0, 'low': 0.5}
+SEVERITY_ORDER = ('critical', 'high', 'medium', 'low')
+
+DEEP_SCAN_RISK_THRESHOLD = 2.0
+MAX_RISK_SCORE = 100.0
+
+# (rule id, severity, message, lowercase keywords, pattern, covered by the Python AST rules)
+#
+# A rule's regex only runs on lines containing one of its keywords. Keyword
+# checks are plain substring searches on the lowercased file, which keeps the
+# common no-finding case close to memchr speed.
+_REGEX_RULES = [
+    ('private_key', 'critical', 'Private key committed to source', ('private key-----',),
+     r'-----BEGIN (?:RSA |EC |DSA |OPENSSH |PGP )?PRIVATE KEY-----', False),
+    ('aws_access_key', 'critical', 'Hardcoded AWS access key', ('akia', 'asia'),
+     r'\b(?:AKIA|ASIA)[0-9A-Z]{16}\b', False),
+    ('github_token', 'critical', 'Hardcoded GitHub token', ('ghp_', 'gho_', 'ghu_', 'ghs_', 'ghr_'),
+     r'\bgh[pousr]_[A-Za-z0-9]{36,}\b', False),
+    ('hardcoded_secret', 'high', 'Hardcoded credential',
+     ('password', 'passwd', 'pwd', 'secret', 'api_key', 'apikey', 'token', 'private_key', 'privatekey'),
+     r'''(?i:(?:password|passwd|pwd|secret|api_?key|auth_?token|access_?token|private_?key)\w*["']?\s*[:=]\s*["'][^"'\s]{8,}["'])''', False),
+    ('eval_exec', 'high', 'Dynamic code execution with eval/exec', ('eval', 'exec'),
+     r'(?<![\w.])(?:eval|exec)\s*\(', True),
+    ('shell_injection', 'high', 'Command executed through a shell',
+     ('shell', 'os.system', 'os.popen', 'runtime.getruntime', 'passthru', 'proc_open', 'child_process'),
+     r'\bshell\s*=\s*True\b|\bos\.(?:system|popen)\s*\(|Runtime\.getRuntime\(\)\.exec\s*\(|\b(?:shell_exec|passthru|proc_open)\s*\(|child_process\.exec(?:Sync)?\s*\(', True),
+    ('unsafe_deserialization', 'high', 'Unsafe deserialization of untrusted data',
+     ('pickle.', 'dill.', 'marshal.', 'shelve.', 'yaml.load', 'unserialize', 'objectinputstream'),
+     r'\b(?:pickle|cPickle|dill|marshal|shelve)\.(?:loads?|open)\s*\(|\byaml\.(?:load|load_all)\s*\((?![^)]*Safe)|\bunserialize\s*\(|ObjectInputStream\s*\(', True),
+    ('sql_string_building', 'high', 'SQL query built from strings', ('.execute', '.raw', '.query'),
+     r'''(?i:\.(?:execute|executemany|raw|query)\s*\(\s*(?:f["']|["'][^"'\n]*\b(?:select|insert|update|delete)\b[^"'\n]*["']\s*(?:%|\+|\.format\b)))''', True),
+    ('tls_verification_disabled', 'medium', 'TLS certificate verification disabled',
+     ('verify', 'rejectunauthorized', 'insecureskipverify'),
+     r'\bverify\s*=\s*False\b|rejectUnauthorized\s*:\s*false|InsecureSkipVerify\s*:\s*true', False),
+    ('dom_injection', 'medium', 'Unescaped HTML written to the DOM', ('innerhtml', 'document.write'),
+     r'\.innerHTML\s*=|\bdocument\.write\s*\(|dangerouslySetInnerHTML', False),
+    ('weak_hash', 'low', 'Weak hash algorithm', ('md5', 'sha1', 'sha-1'),
+     r'\bhashlib\.(?:md5|sha1)\s*\(|\bMessageDigest\.getInstance\(\s*"(?:MD5|SHA-?1)"|\bcreateHash\(\s*["\'](?:md5|sha1)["\']', False),
+    ('debug_enabled', 'low', 'Debug mode enabled', ('debug',),
+     r'\bdebug\s*=\s*True\b|\bDEBUG\s*=\s*True\b', False),
+]
+
+_RULES = [
+    (rule_id, severity, message, keywords, re.compile(pattern), ast_covered)
+    for rule_id, severity, message, keywords, pattern, ast_covered in _REGEX_RULES
+]
+
+# Code that touches these surfaces deserves a model review even without findings.
+# Words match whole (plus s/ed/ing), so ``author`` or ``sqlalchemy`` do not;
+# ``crypt`` and ``deserializ`` are stems and match as prefixes.
+_SENSITIVE_SURFACE_RE = re.compile(
+    r'(?i)\b(?:request\.|req\.(?:body|query|params)\b|crypt|deserializ|'
+    r'(?:flask|django|express|login|password|auth|session|cookie|token|cipher|jwt|oauth|upload|socket|sql|'
+    r'cursor|subprocess|xml|render_template)(?:s|ed|ing)?\b)'
+)
+
+_ASCII_LOWERCASE = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+_SUBPROCESS_FUNCTIONS = {'call', 'check_call', 'check_output', 'run', 'Popen', 'getoutput', 'getstatusoutput'}
+_SQL_METHODS = {'execute', 'executemany', 'raw', 'executescript'}
+_DESERIALIZERS = {('pickle', 'loads'), ('pickle', 'load'), ('cPickle', 'loads'), ('cPickle', 'load'),
+                  ('dill', 'loads'), ('dill', 'load'), ('marshal', 'loads'), ('marshal', 'load'),
+                  ('shelve', 'open')}
+
+
+def _finding(rule_id, severity, message, line, snippet) -> Dict[str, Any]:
+    return {
+        'rule_id': rule_id,
+        'severity': severity,
+        'message': message,
+        'line': line,
+        'snippet': snippet.strip()[:200],
+    }
+
+
+def _call_name(node: ast.Call) -> Tuple[str, str]:
+    """Return ``(owner, attribute)`` for ``owner.attr(...)`` or ``('', name)`` for ``name(...)``."""
+    func = node.func
+    if isinstance(func, ast.Attribute):
+        owner = func.value.id if isinstance(func.value, ast.Name) else ''
+        return owner, func.attr
+    if isinstance(func, ast.Name):
+        return '', func.id
+    return '', ''
+
+
+def _is_dynamic_string(node: ast.AST) -> bool:
+    """True for f-strings, ``%``/``+`` concatenation and ``str.format`` calls."""
+    if isinstance(node, ast.JoinedStr):
+        return any(isinstance(value, ast.FormattedValue) for value in node.values)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Mod)):
+        return True
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'format':
+        return True
+    return False
+
+
+def _check_call(node: ast.Call):
+    """Return ``(rule_id, severity, message)`` for a dangerous call, else ``None``."""
+    owner, name = _call_name(node)
+
+    if not owner and name in ('eval', 'exec'):
+        literal = node.args and isinstance(node.args[0], ast.Constant)
+        return ('eval_exec', 'medium' if literal else 'high',
+                f'{name}() on {"a literal" if literal else "dynamic input"}')
+
+    if owner == 'subprocess' and name in _SUBPROCESS_FUNCTIONS:
+        shell = next((keyword.value for keyword in node.keywords if keyword.arg == 'shell'), None)
+        if name in ('getoutput', 'getstatusoutput') or (isinstance(shell, ast.Constant) and shell.value):
+            dynamic = node.args and not isinstance(node.args[0], ast.Constant)
+            return 'shell_injection', 'high' if dynamic else 'medium', f'subprocess.{name} runs through a shell'
+        return None
+
+    if owner == 'os' and name in ('system', 'popen'):
+        return 'shell_injection', 'high', f'os.{name} runs through a shell'
+
+    if (owner, name) in _DESERIALIZERS:
+        return 'unsafe_deserialization', 'high', f'{owner}.{name} can execute arbitrary code'
+
+    if owner == 'yaml' and name in ('load', 'load_all'):
+        loader = next((keyword.value for keyword in node.keywords if keyword.arg == 'Loader'), None)
+        if 'Safe' not in getattr(loader, 'attr', getattr(loader, 'id', '')):
+            return 'unsafe_deserialization', 'high', 'yaml.load without SafeLoader'
+        return None
+
+    if name in _SQL_METHODS and node.args and _is_dynamic_string(node.args[0]):
+        return 'sql_string_building', 'high', f'{name}() with a query built from strings'
+
+    return None
+
+
+def _refine_python_findings(content: str, findings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Re-check AST-covered regex hits with the Python parser.
+
+    Each flagged line is parsed on its own first, which costs microseconds
+    instead of parsing the whole file. A line that does not parse, or parses
+    without a dangerous call (it may be a fragment of a multi-line statement
+    such as ``cmd, shell=True``), falls back to a full-file parse.
+    """
+    lines = content.splitlines()
+    refined = []
+    for line_number in sorted({finding['line'] for finding in findings}):
+        line = lines[line_number - 1] if line_number <= len(lines) else ''
+        try:
+            tree = ast.parse(line.strip())
+        except (SyntaxError, ValueError):
+            return _scan_python_ast(content)
+
+        confirmed = [
+            _finding(*match, line_number, line)
+            for match in (_check_call(node) for node in ast.walk(tree) if type(node) is ast.Call)
+            if match
+        ]
+        if not confirmed:
+            return _scan_python_ast(content)
+        refined.extend(confirmed)
+    return refined
+
+
+def _scan_python_ast(content: str) -> List[Dict[str, Any]]:
+    """Run the precise Python rules; returns None when the file does not parse."""
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+
+    lines = content.splitlines()
+    findings = []
+    for node in ast.walk(tree):
+        if type(node) is not ast.Call:
+            continue
+        match = _check_call(node)
+        if match:
+            snippet = lines[node.lineno - 1] if 0 < node.lineno <= len(lines) else ''
+            findings.append(_finding(*match, node.lineno, snippet))
+    return findings
+
+
+def scan_source(content: str, file_path: str) -> Dict[str, Any]:
+    """Scan one file locally and decide whether an LLM deep scan is warranted.
+
+    Each rule's regex runs only on lines containing one of its keywords.
+    In Python files, hits for AST-covered rules are re-checked with the
+    parser, and the AST findings replace them to cut false positives such as
+    ``eval`` inside a string.
+    """
+    findings = []
+    ast_triggered = False
+    lowered = content.lower()
+    if len(lowered) != len(content):
+        # Some non-ASCII characters change length when lowercased
+        lowered = content.translate(_ASCII_LOWERCASE)
+
+    for rule_id, severity, message, keywords, pattern, ast_covered in _RULES:
+        checked_lines = set()
+        for keyword in keywords:
+            position = lowered.find(keyword)
+            while position != -1:
+                line_start = lowered.rfind('\n', 0, position) + 1
+                line_end = lowered.find('\n', position)
+                if line_end == -1:
+                    line_end = len(content)
+
+                if line_start not in checked_lines:
+                    checked_lines.add(line_start)
+                    if pattern.search(content, line_start, line_end):
+                        line = content.count('\n', 0, line_start) + 1
+                        findings.append(
+                            _finding(rule_id, severity, message, line, content[line_start:line_end])
+                            | {'_ast_covered': ast_covered}
+                        )
+                        ast_triggered = ast_triggered or ast_covered
+
+                position = lowered.find(keyword, line_end)
+
+    if ast_triggered and file_path.endswith('.py'):
+        covered = [finding for finding in findings if finding['_ast_covered']]
+        ast_findings = _refine_python_findings(content, covered)
+        if ast_findings is not None:
+            findings = [finding for finding in findings if not finding['_ast_covered']] + ast_findings
+
+    for finding in findings:
+        finding.pop('_ast_covered', None)
+    findings.sort(key=lambda finding: (SEVERITY_ORDER.index(finding['severity']), finding['line']))
+
+    risk_score = min(sum(SEVERITY_WEIGHTS[finding['severity']] for finding in findings), MAX_RISK_SCORE)
+    sensitive_surface = bool(_SENSITIVE_SURFACE_RE.search(content))
+
+    return {
+        'file_path': file_path,
+        'findings': findings,
+        'risk_score': risk_score,
+        'max_severity': findings[0]['severity'] if findings else None,
+        'sensitive_surface': sensitive_surface,
+        'needs_deep_scan': risk_score >= DEEP_SCAN_RISK_THRESHOLD or sensitive_surface,
+    }
+
+
+def rank_files(files: Iterable[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """Scan ``(file_path, content)`` pairs and order them by descending risk.
+
+    Files that touch a sensitive surface break ties, so the LLM budget goes
+    to the riskiest files first.
+    """
+    results = [scan_source(content, file_path) for file_path, content in files]
+    results.sort(key=lambda result: (result['risk_score'], result['sensitive_surface']), reverse=True)
+    return results
+
+
+def format_prescan_report(result: Dict[str, Any]) -> str:
+    """Render local findings as the markdown report shown when no deep scan runs."""
+    lines = [
+        '# 🔒 Security Pre-Scan Report',
+        '',
+        f"**File:** `{result['file_path']}`",
+        f"**Risk Score:** {result['risk_score']:.1f}",
+        '',
+    ]
+    if not result['findings']:
+        lines.append('✅ No security issues were detected by the local rule engine, and the file does not '
+                     'touch authentication, input handling, storage or process execution. '
+                     'Request a deep scan to have the AI review it anyway.')
+        return '\n'.join(lines)
+
+    lines.append('## Findings')
+    for finding in result['findings']:
+        lines.append(
+            f"- **Severity:** {finding['severity'].title()} — {finding['message']} "
+            f"(line {finding['line']}): `{finding['snippet']}`"
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,179 @@
+import hashlib
+import os
+import re
+import zlib
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from app import db
+from models import SourceFingerprint, SourceFingerprintBand, TestCase
+
+# 64 permutations split into 8 bands of 8 rows puts the LSH candidate
+# threshold around 0.77 Jaccard similarity, below the reuse threshold.
+NUM_PERMUTATIONS = 64
+NUM_BANDS = 8
+ROWS_PER_BAND = NUM_PERMUTATIONS // NUM_BANDS
+SHINGLE_SIZE = 5
+MAX_CANDIDATES = 20
+
+SIMILARITY_THRESHOLD = float(os.environ.get("SIMILARITY_REUSE_THRESHOLD", "0.9"))
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed coefficients so signatures stay comparable across processes and releases
+_PERMUTATIONS = [
+    (
+        int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % (_MERSENNE_PRIME - 1) + 1,
+        int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME,
+    )
+    for i in range(NUM_PERMUTATIONS)
+]
+
+_COMMENT_RE = re.compile(r"/\*.*?\*/|//[^\n]*|#[^\n]*", re.DOTALL)
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def normalize_source(source: str) -> List[str]:
+    """Tokenize source with comments and whitespace removed."""
+    return _TOKEN_RE.findall(_COMMENT_RE.sub(" ", source))
+
+
+def content_hash(source: str) -> str:
+    """Hash of the normalized token stream, used for exact duplicate lookups."""
+    return _token_hash(normalize_source(source))
+
+
+def minhash_signature(source: str) -> List[int]:
+    """Compute the MinHash signature of a file's token shingles."""
+    return _token_signature(normalize_source(source))
+
+
+def fingerprint_source(source: str) -> Tuple[str, List[int]]:
+    """Return ``(content_hash, minhash_signature)`` tokenizing the source once."""
+    tokens = normalize_source(source)
+    return _token_hash(tokens), _token_signature(tokens)
+
+
+def _token_hash(tokens: List[str]) -> str:
+    return hashlib.sha256(" ".join(tokens).encode("utf-8")).hexdigest()
+
+
+def _token_signature(tokens: List[str]) -> List[int]:
+    if len(tokens) < SHINGLE_SIZE:
+        shingles = {" ".join(tokens)}
+    else:
+        shingles = {
+            " ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)
+        }
+
+    hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles]
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def band_buckets(signature: List[int]) -> List[int]:
+    """Hash each band of a signature into a signed 64-bit LSH bucket key.
+
+    The band number is part of the hash, so buckets from different bands
+    never collide and lookups can probe all bands with a single ``IN``.
+    """
+    buckets = []
+    for band in range(NUM_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(repr((band, rows)).encode("ascii"), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, "big", signed=True))
+    return buckets
+
+
+def estimate_similarity(first: List[int], second: List[int]) -> float:
+    """Estimate Jaccard similarity from two MinHash signatures."""
+    matches = sum(1 for a, b in zip(first, second) if a == b)
+    return matches / NUM_PERMUTATIONS
+
+
+def index_source(test_case: TestCase, source: str):
+    """Add the source a test case was generated from to the LSH index.
+
+    The caller commits; the fingerprint is written in the same transaction as
+    the test case.
+    """
+    digest, signature = fingerprint_source(source)
+    fingerprint = SourceFingerprint(
+        test_case=test_case,
+        user_id=test_case.user_id,
+        content_hash=digest,
+        signature=signature,
+    )
+    db.session.add(fingerprint)
+
+    for band, bucket in enumerate(band_buckets(signature)):
+        db.session.add(SourceFingerprintBand(
+            fingerprint=fingerprint,
+            user_id=test_case.user_id,
+            band=band,
+            bucket=bucket,
+        ))
+
+
+def find_similar_test_case(user_id, source: str, threshold: float = SIMILARITY_THRESHOLD,
+                           technology: Optional[str] = None) -> Optional[Tuple[TestCase, float]]:
+    """Find the user's most similar prior generation above ``threshold``.
+
+    Exact duplicates are answered from the content hash index; otherwise each
+    LSH band is probed through the ``(user_id, bucket)`` index and the
+    candidates are ranked by estimated similarity. ``technology`` limits the
+    search to test cases generated for that technology.
+    """
+    digest, signature = fingerprint_source(source)
+    return find_similar_by_fingerprint(user_id, digest, signature, threshold, technology)
+
+
+def find_similar_by_fingerprint(user_id, digest: str, signature: List[int],
+                                threshold: float = SIMILARITY_THRESHOLD,
+                                technology: Optional[str] = None) -> Optional[Tuple[TestCase, float]]:
+    """Index lookup half of ``find_similar_test_case`` for a precomputed fingerprint.
+
+    Uses column-only selects so the hot path never hydrates ORM objects for
+    candidates that are rejected.
+    """
+    exact_query = select(SourceFingerprint.test_case_id)\
+        .where(SourceFingerprint.user_id == user_id, SourceFingerprint.content_hash == digest)
+    if technology:
+        exact_query = exact_query.join(SourceFingerprint.test_case).where(TestCase.technology == technology)
+    exact_id = db.session.execute(
+        exact_query.order_by(SourceFingerprint.id.desc()).limit(1)
+    ).scalar()
+    if exact_id is not None:
+        return db.session.get(TestCase, exact_id), 1.0
+
+    # Fingerprints sharing the most bands are the likeliest matches, so they
+    # are the ones kept when more than MAX_CANDIDATES collide
+    candidate_ids = select(SourceFingerprintBand.fingerprint_id)\
+        .where(SourceFingerprintBand.user_id == user_id,
+               SourceFingerprintBand.bucket.in_(band_buckets(signature)))
+    if technology:
+        candidate_ids = candidate_ids.join(SourceFingerprintBand.fingerprint)\
+            .join(SourceFingerprint.test_case)\
+            .where(TestCase.technology == technology)
+    candidate_ids = candidate_ids\
+        .group_by(SourceFingerprintBand.fingerprint_id)\
+        .order_by(func.count().desc(), SourceFingerprintBand.fingerprint_id.desc())\
+        .limit(MAX_CANDIDATES)
+    candidates = db.session.execute(
+        select(SourceFingerprint.test_case_id, SourceFingerprint.signature)
+        .where(SourceFingerprint.id.in_(candidate_ids.scalar_subquery()))
+    ).all()
+
+    best = None
+    for test_case_id, candidate_signature in candidates:
+        similarity = estimate_similarity(signature, candidate_signature)
+        if similarity >= threshold and (best is None or similarity > best[1]):
+            best = (test_case_id, similarity)
+
+    if best is None:
+        return None
+    return db.session.get(TestCase, best[0]), best[1]
@@ -7,6 +7,8 @@ class Dashboard {
         this.currentRepoContents = new Map(); // Cache for repository contents
         this.monacoEditor = null;
         this.qualityChart = null;
+        this.eventSource = null;
+        this.liveUpdates = false; // true while the server event stream is connected
         
         this.init();
     }
@@ -20,12 +22,61 @@ class Dashboard {
         this.initTestCasesTab();
         this.initModals();
         this.initMonacoEditor();
+        this.initEventStream();
         
         // Load initial data
         this.loadRepositories();
         this.loadAnalytics();
     }
     
+    // Live updates pushed by the server; polling is only used without them
+    initEventStream() {
+        if (!window.EventSource) {
+            return;
+        }
+        
+        this.eventSource = new EventSource('/api/events');
+        
+        this.eventSource.onopen = () => {
+            this.liveUpdates = true;
+            if (this.analyticsInterval) {
+                clearInterval(this.analyticsInterval);
+                this.analyticsInterval = null;
+            }
+        };
+        
+        this.eventSource.onerror = () => {
+            // The browser reconnects on its own (resuming from the last event ID)
+            // unless the stream was refused; only then fall back to polling
+            if (this.eventSource.readyState === EventSource.CLOSED) {
+                this.liveUpdates = false;
+                if (this.currentTab === 'analytics') {
+                    this.loadAnalytics();
+                }
+            }
+        };
+        
+        this.eventSource.addEventListener('analytics', () => {
+            if (this.currentTab === 'analytics') {
+                this.refreshAnalytics();
+            }
+        });
+        
+        this.eventSource.addEventListener('generation', (event) => {
+            const progress = JSON.parse(event.data);
+            const generateBtn = document.getElementById('generate-tests-btn');
+            if (generateBtn && generateBtn.disabled && progress.status === 'generating') {
+                generateBtn.innerHTML = `<i class="fas fa-spinner fa-spin me-2"></i>Generating ${progress.current + 1}/${progress.total}...`;
+            }
+        });
+        
+        ['job', 'task'].forEach(type => {
+            this.eventSource.addEventListener(type, (event) => {
+                document.dispatchEvent(new CustomEvent(`dashboard:${type}`, { detail: JSON.parse(event.data) }));
+            });
+        });
+    }
+    
     // Tab Navigation
     initTabNavigation() {
         const navLinks = document.querySelectorAll('.sidebar .nav-link');
@@ -1264,20 +1315,13 @@ class Dashboard {
             const analytics = await ApiClient.get('/api/analytics');
             this.renderAnalytics(analytics);
             
-            // Only set up real-time updates if Analytics tab is active
-            if (this.currentTab === 'analytics') {
+            // Poll only when the Analytics tab is active and no event stream pushes changes
+            if (this.currentTab === 'analytics' && !this.liveUpdates) {
                 if (this.analyticsInterval) {
                     clearInterval(this.analyticsInterval);
                 }
                 
-                this.analyticsInterval = setInterval(async () => {
-                    try {
-                        const updatedAnalytics = await ApiClient.get('/api/analytics');
-                        this.renderAnalytics(updatedAnalytics);
-                    } catch (error) {
-                        console.error('Failed to update analytics:', error);
-                    }
-                }, 30000); // Update every 30 seconds
+                this.analyticsInterval = setInterval(() => this.refreshAnalytics(), 30000); // Update every 30 seconds
             }
             
         } catch (error) {
@@ -1285,17 +1329,22 @@ class Dashboard {
         }
     }
     
+    async refreshAnalytics() {
+        try {
+            const analytics = await ApiClient.get('/api/analytics');
+            this.renderAnalytics(analytics);
+        } catch (error) {
+            console.error('Failed to update analytics:', error);
+        }
+    }
+    
     // Update analytics when user performs actions
     updateAnalyticsOnAction() {
-        // Trigger analytics update after user actions
-        setTimeout(async () => {
-            try {
-                const analytics = await ApiClient.get('/api/analytics');
-                this.renderAnalytics(analytics);
-            } catch (error) {
-                console.error('Failed to update analytics:', error);
-            }
-        }, 2000); // Update after 2 seconds
+        // The event stream already announces the change
+        if (this.liveUpdates) {
+            return;
+        }
+        setTimeout(() => this.refreshAnalytics(), 2000); // Update after 2 seconds
     }
     
     renderAnalytics(analytics) {
@@ -1511,6 +1560,7 @@ class Dashboard {
     async generateReport() {
         const includeCharts = document.getElementById('include-charts').checked;
         const includeDetails = document.getElementById('include-details').checked;
+        const refreshInsights = document.getElementById('refresh-insights')?.checked || false;
         
         // Show loading state
         const reportBtn = document.getElementById('generate-report-btn');
@@ -1523,7 +1573,7 @@ class Dashboard {
             const analytics = await ApiClient.get('/api/analytics');
             
             // Generate AI-powered report content
-            const aiReportContent = await this.generateAIReportContent(analytics);
+            const aiReportContent = await this.generateAIReportContent(analytics, refreshInsights);
             
             // Generate HTML report
             const reportContent = this.createEnhancedReportHTML(analytics, aiReportContent, includeCharts, includeDetails);
@@ -1550,14 +1600,15 @@ class Dashboard {
         }
     }
     
-    async generateAIReportContent(analytics) {
+    async generateAIReportContent(analytics, refresh = false) {
         try {
+            // Insights are cached server-side per analytics snapshot; refresh forces new ones
             const response = await fetch('/api/generate-ai-report', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ analytics })
+                body: JSON.stringify({ refresh })
             });
             
             if (!response.ok) {
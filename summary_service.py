@@ -1,8 +1,22 @@
-from typing import Dict, Any
+import logging
+import threading
+import time
+from typing import Dict, Any, Optional
 from datetime import datetime
 
+from flask import current_app
+from sqlalchemy import func, select
+
+from app import db
+from cache_service import get_json, set_json, try_lock
+from db_routing import replica_reads
 from models import Repository, TestCase, Analytics, CodeAnalysis
 
+USAGE_CACHE_KEY = "summary:usage"
+USAGE_FRESH_SECONDS = 60
+USAGE_MAX_AGE = 24 * 3600  # snapshots older than this are dropped, not served
+REFRESH_LOCK_SECONDS = 30
+
 
 _BASE_SUMMARY = {
     "name": "GitGenius",
@@ -39,33 +53,72 @@ _BASE_SUMMARY = {
 
 
 def _collect_usage_stats() -> Dict[str, Any]:
-    """Collect aggregate usage statistics across all users."""
-    summary = {
-        "total_repositories": Repository.query.count(),
-        "total_test_cases": TestCase.query.count(),
-        "total_analytics_profiles": Analytics.query.count(),
-        "total_code_analyses": CodeAnalysis.query.count(),
-        "last_activity": None,
+    """Collect aggregate usage statistics across all users in one round trip."""
+    def count(model):
+        return select(func.count()).select_from(model).scalar_subquery()
+
+    def latest(model):
+        return select(func.max(model.created_at)).scalar_subquery()
+
+    # The snapshot is up to a minute old anyway, so a replica that far behind will do
+    with replica_reads(max_lag=USAGE_FRESH_SECONDS):
+        row = db.session.execute(select(
+            count(Repository), count(TestCase), count(Analytics), count(CodeAnalysis),
+            latest(TestCase), latest(CodeAnalysis)
+        )).one()
+
+    timestamps = [ts for ts in row[4:] if ts is not None]
+    return {
+        "total_repositories": row[0],
+        "total_test_cases": row[1],
+        "total_analytics_profiles": row[2],
+        "total_code_analyses": row[3],
+        "last_activity": max(timestamps).isoformat() if timestamps else None,
     }
 
-    latest_test_case = TestCase.query.order_by(TestCase.created_at.desc()).first()
-    latest_analysis = CodeAnalysis.query.order_by(CodeAnalysis.created_at.desc()).first()
 
-    timestamps = [
-        getattr(latest_test_case, "created_at", None),
-        getattr(latest_analysis, "created_at", None),
-    ]
-    timestamps = [ts for ts in timestamps if ts is not None]
+def refresh_usage_stats() -> Dict[str, Any]:
+    """Recompute the usage snapshot and store it for every process"""
+    stats = _collect_usage_stats()
+    set_json(USAGE_CACHE_KEY, {"stats": stats, "computed_at": time.time()}, ttl=USAGE_MAX_AGE)
+    return stats
 
-    if timestamps:
-        summary["last_activity"] = max(timestamps).isoformat()
 
-    return summary
+def _refresh_in_background() -> threading.Thread:
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            try:
+                refresh_usage_stats()
+            except Exception as e:
+                logging.error(f"Failed to refresh usage stats: {e}")
+            finally:
+                db.session.remove()
+
+    thread = threading.Thread(target=run, name="usage-stats-refresh", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_usage_stats() -> Optional[Dict[str, Any]]:
+    """Usage snapshot, served stale-while-revalidate.
+
+    Never touches the database: a snapshot older than
+    ``USAGE_FRESH_SECONDS`` is still returned while one process, holding the
+    refresh lock, recomputes it in the background. Before the first
+    snapshot exists this returns None.
+    """
+    snapshot = get_json(USAGE_CACHE_KEY)
+    if snapshot is None or time.time() - snapshot["computed_at"] > USAGE_FRESH_SECONDS:
+        if try_lock(USAGE_CACHE_KEY, REFRESH_LOCK_SECONDS):
+            _refresh_in_background()
+    return snapshot["stats"] if snapshot else None
 
 
 def get_project_summary() -> Dict[str, Any]:
-    """Return a structured summary of the GitGenius project with live stats."""
+    """Return a structured summary of the GitGenius project with cached stats."""
     summary = dict(_BASE_SUMMARY)
-    summary["usage"] = _collect_usage_stats()
+    summary["usage"] = get_usage_stats()
     summary["generated_at"] = datetime.utcnow().isoformat()
     return summary
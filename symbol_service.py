@@ -0,0 +1,302 @@
+import ast
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+MODULE_SYMBOL = "<module>"
+
+_CODE_FENCE_RE = re.compile(r"```[a-zA-Z0-9_+-]*\n(.*?)```", re.DOTALL)
+
+
+def _hash_node(node: ast.AST) -> str:
+    """Hash the structure of a node, ignoring formatting and comments."""
+    dump = ast.dump(node, annotate_fields=False, include_attributes=False)
+    return hashlib.sha256(dump.encode("utf-8")).hexdigest()
+
+
+def _class_shell(node: ast.ClassDef) -> ast.ClassDef:
+    """Return a copy of a class with method bodies removed.
+
+    Methods are hashed on their own, so a change inside one method must not
+    mark the whole class as changed.
+    """
+    body = []
+    for child in node.body:
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            body.append(ast.Name(id=child.name))
+        else:
+            body.append(child)
+    return ast.ClassDef(
+        name=node.name,
+        bases=node.bases,
+        keywords=node.keywords,
+        body=body,
+        decorator_list=node.decorator_list,
+        type_params=getattr(node, "type_params", []),
+    )
+
+
+def extract_symbols(source: str) -> Optional[Dict[str, str]]:
+    """Map each top-level function, class and method to a structural hash.
+
+    Module-level statements that are not definitions (imports, constants) are
+    hashed together under ``MODULE_SYMBOL``. Returns ``None`` when the source
+    cannot be parsed as Python.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+
+    symbols = {}
+    module_statements = []
+
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            symbols[node.name] = _hash_node(node)
+        elif isinstance(node, ast.ClassDef):
+            symbols[node.name] = _hash_node(_class_shell(node))
+            for child in node.body:
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    symbols[f"{node.name}.{child.name}"] = _hash_node(child)
+        else:
+            module_statements.append(node)
+
+    symbols[MODULE_SYMBOL] = _hash_node(ast.Module(body=module_statements, type_ignores=[]))
+    return symbols
+
+
+def diff_symbols(old: Dict[str, str], new: Dict[str, str]) -> Tuple[List[str], List[str], List[str]]:
+    """Return ``(changed, added, removed)`` symbol names between two hash maps."""
+    changed = [name for name, digest in new.items() if name in old and old[name] != digest]
+    added = [name for name in new if name not in old]
+    removed = [name for name in old if name not in new]
+    return changed, added, removed
+
+
+def _node_lines(node: ast.AST) -> Tuple[int, int]:
+    """Return the 1-based line span of a definition including its decorators."""
+    start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+    return start, node.end_lineno
+
+
+def extract_symbol_sources(source: str, names: List[str]) -> str:
+    """Build a reduced source file containing only the requested symbols.
+
+    Module-level imports are always kept so the model sees what the code
+    depends on. Methods are emitted under their class header.
+    """
+    tree = ast.parse(source)
+    lines = source.splitlines()
+    wanted = set(names)
+    parts = []
+
+    imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    if imports:
+        parts.append("\n".join(ast.get_source_segment(source, node) for node in imports))
+
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name in wanted:
+            start, end = _node_lines(node)
+            parts.append("\n".join(lines[start - 1:end]))
+        elif isinstance(node, ast.ClassDef):
+            if node.name in wanted:
+                start, end = _node_lines(node)
+                parts.append("\n".join(lines[start - 1:end]))
+                continue
+
+            methods = [
+                child for child in node.body
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))
+                and f"{node.name}.{child.name}" in wanted
+            ]
+            if methods:
+                header = lines[node.lineno - 1]
+                method_sources = []
+                for method in methods:
+                    start, end = _node_lines(method)
+                    method_sources.append("\n".join(lines[start - 1:end]))
+                parts.append(header + "\n" + "\n\n".join(method_sources))
+
+    return "\n\n\n".join(parts) + "\n"
+
+
+def extract_code(text: str) -> str:
+    """Strip markdown prose from an LLM response, keeping fenced code blocks."""
+    blocks = _CODE_FENCE_RE.findall(text)
+    if blocks:
+        return "\n\n".join(block.strip("\n") for block in blocks) + "\n"
+    return text
+
+
+def _references(node: ast.AST, names, attributes) -> bool:
+    """True if ``node`` uses one of ``names`` or accesses one of ``attributes``."""
+    return any(
+        (isinstance(child, ast.Name) and child.id in names)
+        or (isinstance(child, ast.Attribute) and child.attr in attributes)
+        for child in ast.walk(node)
+    )
+
+
+def _removal_edits(tree: ast.Module, removed: List[str], keep,
+                   changed: List[str] = ()) -> List[Tuple[int, int, List[str]]]:
+    """Line edits dropping what an existing suite holds for ``removed`` symbols.
+
+    Removed functions and classes are taken out of ``from ... import``
+    statements, and tests (or fixtures) using them are dropped. Tests
+    calling a removed method are dropped from the module or their test
+    class. Tests of ``changed`` symbols are dropped the same way, since
+    their regenerated tests may carry new names. Definitions named in
+    ``keep`` are being replaced and left alone.
+    """
+    stale_symbols = list(removed) + list(changed)
+    names = {name for name in stale_symbols if "." not in name}
+    attributes = {name.split(".", 1)[1] for name in stale_symbols if "." in name}
+    removed_names = {name for name in removed if "." not in name}
+    definitions = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+    edits = []
+
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and any(alias.name in removed_names for alias in node.names):
+            kept = [alias for alias in node.names if alias.name not in removed_names]
+            statement = []
+            if kept:
+                imported = ", ".join(
+                    f"{alias.name} as {alias.asname}" if alias.asname else alias.name for alias in kept
+                )
+                statement = [f"from {'.' * node.level}{node.module or ''} import {imported}"]
+            edits.append((node.lineno, node.end_lineno, statement))
+        elif not isinstance(node, definitions) or node.name in keep:
+            continue
+        elif _references(node, names, ()) or (
+            not isinstance(node, ast.ClassDef) and _references(node, (), attributes)
+        ):
+            edits.append((*_node_lines(node), []))
+        elif isinstance(node, ast.ClassDef) and attributes:
+            stale = [
+                child for child in node.body
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))
+                and _references(child, (), attributes)
+            ]
+            if len(stale) == len(node.body):
+                edits.append((*_node_lines(node), []))
+            else:
+                edits.extend((*_node_lines(child), []) for child in stale)
+    return edits
+
+
+def merge_test_suites(existing: str, generated: str, removed: Optional[List[str]] = None,
+                      changed: Optional[List[str]] = None) -> str:
+    """Merge newly generated tests into an existing Python test suite.
+
+    Imports missing from the existing suite are added, top-level tests and
+    test classes with the same name are replaced, and new ones are appended.
+    Tests and imports of ``removed`` symbols are dropped, as are existing
+    tests of the ``changed`` symbols the generated code did not replace. If
+    either side is not valid Python the generated code is appended as-is.
+    """
+    existing_code = extract_code(existing)
+    generated_code = extract_code(generated)
+
+    try:
+        existing_tree = ast.parse(existing_code)
+        generated_tree = ast.parse(generated_code)
+    except SyntaxError:
+        return existing_code.rstrip("\n") + "\n\n\n" + generated_code
+
+    existing_lines = existing_code.splitlines()
+    definitions = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+    replacements = {}
+    new_imports = []
+    new_definitions = []
+
+    existing_imports = {
+        ast.dump(node) for node in existing_tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+    }
+    existing_definitions = {
+        node.name: node for node in existing_tree.body if isinstance(node, definitions)
+    }
+
+    for node in generated_tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            if ast.dump(node) not in existing_imports:
+                new_imports.append(ast.get_source_segment(generated_code, node))
+        elif isinstance(node, definitions):
+            start, end = _node_lines(node)
+            node_source = "\n".join(generated_code.splitlines()[start - 1:end])
+            if node.name in existing_definitions:
+                replacements[node.name] = node_source
+            else:
+                new_definitions.append(node_source)
+
+    edits = [
+        (*_node_lines(existing_definitions[name]), source.splitlines()) for name, source in replacements.items()
+    ]
+    edits += _removal_edits(existing_tree, removed or [], keep=replacements, changed=changed or [])
+
+    # New imports go after the last import, before any edit can shift it
+    last_import = max(
+        (node.end_lineno for node in existing_tree.body if isinstance(node, (ast.Import, ast.ImportFrom))),
+        default=0,
+    )
+    if new_imports:
+        edits.append((last_import + 1, last_import, new_imports))
+
+    # Apply bottom-up so earlier line numbers stay valid
+    for start, end, lines in sorted(edits, key=lambda edit: (edit[0], edit[1]), reverse=True):
+        if not lines and start > last_import:
+            # A dropped definition takes its separating blank lines with it:
+            # the ones above a method, the ones below a top-level definition
+            if existing_lines[start - 1][:1].isspace():
+                while start > 1 and not existing_lines[start - 2].strip():
+                    start -= 1
+            else:
+                while end < len(existing_lines) and not existing_lines[end].strip():
+                    end += 1
+        existing_lines[start - 1:end] = lines
+
+    merged = "\n".join(existing_lines).rstrip("\n")
+    for definition in new_definitions:
+        merged += "\n\n\n" + definition
+    return merged + "\n"
+
+
+def is_incremental_candidate(file_path: str, technology: str) -> bool:
+    """Incremental regeneration relies on the Python AST."""
+    return file_path.endswith(".py") and (technology or "").lower() == "python"
+
+
+def generate_tests_incrementally(groq_service, previous, file_content, file_path, technology, edge_cases):
+    """Generate tests, reusing ``previous`` for symbols whose source is unchanged.
+
+    ``previous`` is the latest ``TestCase`` for the same file, or ``None``.
+    Returns ``(test_content, symbol_hashes, mode)`` where mode is one of
+    ``full``, ``incremental`` or ``unchanged``.
+    """
+    symbol_hashes = extract_symbols(file_content) if is_incremental_candidate(file_path, technology) else None
+
+    if symbol_hashes is None or previous is None or not previous.symbol_hashes:
+        test_content = groq_service.generate_test_cases(file_content, file_path, technology, edge_cases)
+        return test_content, symbol_hashes, "full"
+
+    changed, added, removed = diff_symbols(previous.symbol_hashes, symbol_hashes)
+
+    if MODULE_SYMBOL in changed:
+        # Imports or module constants changed; any test may be affected
+        test_content = groq_service.generate_test_cases(file_content, file_path, technology, edge_cases)
+        return test_content, symbol_hashes, "full"
+
+    changed = [name for name in changed if name != MODULE_SYMBOL]
+    targets = changed + added
+    if not targets and not removed:
+        return previous.test_content, symbol_hashes, "unchanged"
+
+    generated = ""
+    if targets:
+        reduced_source = extract_symbol_sources(file_content, targets)
+        generated = groq_service.generate_test_cases(
+            reduced_source, file_path, technology, edge_cases, target_symbols=targets
+        )
+    return merge_test_suites(previous.test_content, generated, removed, changed), symbol_hashes, "incremental"
@@ -1,196 +1,437 @@
 import json
 import logging
+import os
 from datetime import datetime, timedelta
 
+from celery import chord, group
+from sqlalchemy import update
+
+from celery_app import celery
+from app import db
+from models import User, Repository, TestCase, GenerationJob, GenerationJobFile
+from github_service import GitHubService
+from groq_service import GroqService
+from generation_service import generate_for_file, generate_tests_for_files
+from code_analysis_service import analyze_file
+from similarity_service import index_source
+from version_service import record_version
+from repository_job_service import (
+    MAX_FILE_SIZE, SOURCE_EXTENSIONS, claim_next_files, finish_job_if_done, record_file_result
+)
+from vulnerability_service import backfill_findings
+from blob_service import BLOB_COLUMNS, migrate_inline_content
+from retention_service import RETAINED, purge_expired
+from search_service import KINDS as SEARCH_KINDS, reindex
+from repository_sync_service import sync_user_repositories
+from rollup_service import compact_rollups
+from event_service import publish
+from analytics_service import reconcile_started, reconcile_user_analytics, record_test_generated, schedule_reconcile
+from report_service import get_ai_report, pregenerate_report, report_payload
+from security_scanner import rank_files
+
+def _report_state(task, user_id, state, meta):
+    """Record the task state in Celery and push it to the user's open dashboards"""
+    task.update_state(state=state, meta=meta)
+    publish(user_id, 'task', {'task_id': task.request.id, 'state': state, **meta})
+
+def _publish_success(task, user_id, test_case_id, mode):
+    # Celery stores SUCCESS itself from the return value
+    publish(user_id, 'task', {
+        'task_id': task.request.id, 'state': 'SUCCESS', 'test_case_id': test_case_id, 'generation_mode': mode
+    })
+
 @celery.task(bind=True)
 def generate_test_cases_async(self, user_id, repository_id, file_path, technology, edge_cases=None):
     """Asynchronously generate test cases"""
-    app = create_app()
-    
-    with app.app_context():
-        try:
-            # Update task status
-            self.update_state(state='PROGRESS', meta={'current': 10, 'total': 100, 'status': 'Starting...'})
-            
-            # Get user and repository
-            user = User.query.get(user_id)
-            repository = Repository.query.get(repository_id)
-            
-            if not user or not repository:
-                raise Exception("User or repository not found")
-            
-            self.update_state(state='PROGRESS', meta={'current': 20, 'total': 100, 'status': 'Fetching file content...'})
-            
-            # Get file content from GitHub
-            github_service = GitHubService(user.access_token)
-            file_content = github_service.get_file_content(repository.full_name, file_path)
-            
-            if not file_content:
-                raise Exception("Could not retrieve file content")
-            
-            self.update_state(state='PROGRESS', meta={'current': 40, 'total': 100, 'status': 'Generating test cases...'})
-            
-            # Generate test cases using Groq
-            groq_service = GroqService()
-            test_content = groq_service.generate_test_cases(
-                file_content, file_path, technology, edge_cases
-            )
-            
-            self.update_state(state='PROGRESS', meta={'current': 70, 'total': 100, 'status': 'Analyzing quality...'})
-            
-            # Analyze quality
-            quality_analysis = groq_service.analyze_code_quality(test_content)
-            
-            self.update_state(state='PROGRESS', meta={'current': 90, 'total': 100, 'status': 'Saving results...'})
-            
-            # Save test case
-            test_case = TestCase(
-                user_id=user_id,
-                repository_id=repository_id,
-                file_path=file_path,
-                test_content=test_content,
-                technology=technology,
-                edge_cases=json.loads(edge_cases) if edge_cases else None,
-                quality_score=quality_analysis.get('score', 5.0)
-            )
-            
-            db.session.add(test_case)
-            db.session.commit()
-            
-            # Update analytics
-            update_user_analytics.delay(user_id)
-            
+    try:
+        # Update task status
+        _report_state(self, user_id, 'PROGRESS', {'current': 10, 'total': 100, 'status': 'Starting...'})
+        
+        # Get user and repository
+        user = User.query.get(user_id)
+        repository = Repository.query.get(repository_id)
+        
+        if not user or not repository:
+            raise Exception("User or repository not found")
+        
+        _report_state(self, user_id, 'PROGRESS', {'current': 20, 'total': 100, 'status': 'Fetching file content...'})
+        
+        # Get file content from GitHub
+        github_service = GitHubService(user.access_token)
+        file_content = github_service.get_file_content(repository.full_name, file_path)
+        
+        if not file_content:
+            raise Exception("Could not retrieve file content")
+        
+        _report_state(self, user_id, 'PROGRESS', {'current': 40, 'total': 100, 'status': 'Generating test cases...'})
+        
+        # Generate test cases using Groq, reusing previous or near-duplicate suites where possible
+        groq_service = GroqService()
+        generation = generate_for_file(
+            groq_service, user_id, repository_id, file_path, file_content, technology, edge_cases
+        )
+        test_content = generation['test_content']
+        mode = generation['mode']
+        
+        if mode == 'unchanged':
+            previous = generation['previous']
+            _publish_success(self, user_id, previous.id, mode)
             return {
-                'test_case_id': test_case.id,
+                'test_case_id': previous.id,
                 'test_content': test_content,
-                'quality_score': quality_analysis.get('score', 5.0),
-                'quality_explanation': quality_analysis.get('explanation', ''),
+                'quality_score': previous.quality_score,
+                'quality_explanation': '',
+                'generation_mode': mode,
                 'status': 'completed'
             }
-            
-        except Exception as e:
-            logging.error(f"Test generation task failed: {e}")
-            self.update_state(
-                state='FAILURE',
-                meta={'error': str(e), 'status': 'Failed to generate test cases'}
-            )
-            raise
+        
+        _report_state(self, user_id, 'PROGRESS', {'current': 70, 'total': 100, 'status': 'Analyzing quality...'})
+        
+        # Analyze quality
+        quality_analysis = groq_service.analyze_code_quality(test_content)
+        
+        _report_state(self, user_id, 'PROGRESS', {'current': 90, 'total': 100, 'status': 'Saving results...'})
+        
+        # Save test case
+        test_case = TestCase(
+            user_id=user_id,
+            repository_id=repository_id,
+            file_path=file_path,
+            test_content=test_content,
+            technology=technology,
+            edge_cases=json.loads(edge_cases) if edge_cases else None,
+            quality_score=quality_analysis.get('score', 5.0),
+            symbol_hashes=generation['symbol_hashes']
+        )
+        record_version(test_case, generation['previous'])
+        
+        db.session.add(test_case)
+        index_source(test_case, file_content)
+        record_test_generated(user_id, technology, test_case.quality_score)
+        db.session.commit()
+        _publish_success(self, user_id, test_case.id, mode)
+        
+        return {
+            'test_case_id': test_case.id,
+            'test_content': test_content,
+            'quality_score': quality_analysis.get('score', 5.0),
+            'quality_explanation': quality_analysis.get('explanation', ''),
+            'generation_mode': mode,
+            'status': 'completed'
+        }
+        
+    except Exception as e:
+        logging.error(f"Test generation task failed: {e}")
+        _report_state(self, user_id, 'FAILURE', {'error': str(e), 'status': 'Failed to generate test cases'})
+        raise
+
+@celery.task(bind=True)
+def generate_tests_job(self, user_id, files, technology, edge_cases, reuse_similar=True):
+    """Generate tests for the files of an asynchronous /api/generate-tests request"""
+    try:
+        user = User.query.get(user_id)
+        if not user:
+            raise Exception("User not found")
+        
+        def progress(current, total, file_path):
+            _report_state(self, user_id, 'PROGRESS', {
+                'current': current, 'total': total, 'status': f'Generating tests for {file_path}...'
+            })
+        
+        results = generate_tests_for_files(
+            GroqService(), GitHubService(user.access_token), user_id, files, technology, edge_cases,
+            reuse_similar=reuse_similar, progress=progress
+        )
+        db.session.commit()
+        publish(user_id, 'generation', {'current': len(files), 'total': len(files), 'status': 'completed'})
+        return {'results': results}
+        
+    except Exception as e:
+        logging.error(f"Test generation job failed for user {user_id}: {e}")
+        db.session.rollback()
+        raise
+
+@celery.task
+def code_analysis_job(user_id, repo_name, file_path, analysis_type, deep_scan=False):
+    """Run an asynchronous /api/code-analysis request"""
+    try:
+        user = User.query.get(user_id)
+        if not user:
+            raise Exception("User not found")
+        
+        result = analyze_file(
+            GroqService(), GitHubService(user.access_token), user_id, repo_name, file_path, analysis_type,
+            deep_scan=deep_scan
+        )
+        db.session.commit()
+        return result
+        
+    except Exception as e:
+        logging.error(f"Code analysis job failed for user {user_id}: {e}")
+        db.session.rollback()
+        raise
+
+@celery.task
+def ai_report_job(user_id, refresh=False):
+    """Build the AI report for an asynchronous /api/generate-ai-report request"""
+    try:
+        return report_payload(get_ai_report(user_id, refresh=refresh))
+    except Exception as e:
+        logging.error(f"AI report job failed for user {user_id}: {e}")
+        raise
+
+@celery.task(bind=True)
+def security_prescan_job(self, user_id, full_name, ref='HEAD', max_files=200):
+    """Rank a repository's source files by local security risk from one archive download"""
+    try:
+        user = User.query.get(user_id)
+        if not user:
+            raise Exception("User not found")
+        
+        _report_state(self, user_id, 'PROGRESS', {'current': 0, 'total': max_files,
+                                                   'status': 'Downloading repository...'})
+        extensions = tuple(ext for exts in SOURCE_EXTENSIONS.values() for ext in exts)
+        files = GitHubService(user.access_token).get_archive_files(
+            full_name, ref,
+            include=lambda path, size: path.endswith(extensions) and 0 < size <= MAX_FILE_SIZE,
+            limit=max_files
+        )
+        
+        ranked = rank_files(sorted(files.items()))
+        return {
+            'files_scanned': len(ranked),
+            'deep_scan_recommended': sum(1 for result in ranked if result['needs_deep_scan']),
+            'ranking': ranked
+        }
+        
+    except Exception as e:
+        logging.error(f"Security pre-scan job failed for user {user_id}: {e}")
+        raise
 
 @celery.task
 def update_user_analytics(user_id):
-    """Update user analytics data"""
-    app = create_app()
+    """Rebuild a user's analytics counters from source rows to repair drift
     
-    with app.app_context():
-        try:
-            user = User.query.get(user_id)
-            if not user:
-                return
-            
-            # Get or create analytics record
-            analytics = Analytics.query.filter_by(user_id=user_id).first()
-            if not analytics:
-                analytics = Analytics(user_id=user_id)
-                db.session.add(analytics)
-            
-            # Calculate statistics
-            total_test_cases = TestCase.query.filter_by(user_id=user_id).count()
-            total_repos = Repository.query.filter_by(user_id=user_id).count()
-            
-            # Calculate average quality score
-            avg_quality = db.session.query(db.func.avg(TestCase.quality_score))\
-                                   .filter_by(user_id=user_id).scalar() or 0.0
-            
-            # Technology breakdown
-            tech_breakdown = {}
-            tech_stats = db.session.query(TestCase.technology, db.func.count(TestCase.id))\
-                                  .filter_by(user_id=user_id)\
-                                  .group_by(TestCase.technology).all()
-            
-            for tech, count in tech_stats:
-                tech_breakdown[tech] = count
-            
-            # Update analytics
-            analytics.total_files_generated = total_test_cases
-            analytics.total_repos = total_repos
-            analytics.average_quality_score = round(avg_quality, 2)
-            analytics.technology_breakdown = tech_breakdown
-            analytics.last_updated = datetime.utcnow()
-            
-            db.session.commit()
-            logging.info(f"Updated analytics for user {user_id}")
-            
-        except Exception as e:
-            logging.error(f"Analytics update failed for user {user_id}: {e}")
-            db.session.rollback()
+    Queue it with ``schedule_reconcile`` so bursts of triggers share one run.
+    """
+    try:
+        # Release the debounce lock first so a failed run never blocks the
+        # next sweep's trigger; concurrent writes are safe under the row lock
+        # reconcile_user_analytics takes
+        reconcile_started(user_id)
+        if not User.query.get(user_id):
+            return
+        
+        reconcile_user_analytics(user_id)
+        db.session.commit()
+        logging.info(f"Reconciled analytics for user {user_id}")
+        
+    except Exception as e:
+        logging.error(f"Analytics update failed for user {user_id}: {e}")
+        db.session.rollback()
 
 @celery.task
-def cleanup_old_test_cases():
-    """Clean up old test cases (older than 30 days)"""
-    app = create_app()
-    
-    with app.app_context():
-        try:
-            cutoff_date = datetime.utcnow() - timedelta(days=30)
-            old_test_cases = TestCase.query.filter(TestCase.created_at < cutoff_date).all()
-            
-            count = len(old_test_cases)
-            for test_case in old_test_cases:
-                db.session.delete(test_case)
-            
-            db.session.commit()
-            logging.info(f"Cleaned up {count} old test cases")
-            
-        except Exception as e:
-            logging.error(f"Cleanup task failed: {e}")
-            db.session.rollback()
+def pregenerate_ai_report(user_id):
+    """Generate a user's AI report ahead of their next request if its snapshot changed"""
+    try:
+        if pregenerate_report(user_id):
+            logging.info(f"Pregenerated AI report for user {user_id}")
+    except Exception as e:
+        logging.error(f"AI report pregeneration failed for user {user_id}: {e}")
+        db.session.rollback()
+
+@celery.task
+def reconcile_all_analytics():
+    """Queue a counter reconciliation for every user without one pending"""
+    for (user_id,) in db.session.query(User.id):
+        schedule_reconcile(user_id)
+
+@celery.task
+def compact_activity_rollups():
+    """Apply the rollup retention policy"""
+    try:
+        deleted = compact_rollups()
+        logging.info(f"Compacted {deleted} expired activity rollup buckets")
+        
+    except Exception as e:
+        logging.error(f"Activity rollup compaction failed: {e}")
+        db.session.rollback()
+
+@celery.task
+def cleanup_old_test_cases(retention_days=30, archive_dir=None):
+    """Clean up test cases and code analyses older than ``retention_days`` in small batches"""
+    archive_dir = archive_dir or os.environ.get('RETENTION_ARCHIVE_DIR')
+    try:
+        cutoff_date = datetime.utcnow() - timedelta(days=retention_days)
+        for dataset in RETAINED:
+            result = purge_expired(dataset, cutoff_date, archive_dir=archive_dir)
+            logging.info(f"Cleaned up {result['deleted']} old {dataset}")
+        
+    except Exception as e:
+        logging.error(f"Cleanup task failed: {e}")
+        db.session.rollback()
 
 @celery.task
 def sync_repositories(user_id):
     """Sync user repositories from GitHub"""
-    app = create_app()
+    try:
+        user = User.query.get(user_id)
+        if not user:
+            return
+        
+        github_service = GitHubService(user.access_token)
+        repos_data = github_service.fetch_user_repositories()
+        
+        # Update repository cache
+        result = sync_user_repositories(user_id, repos_data)
+        db.session.commit()
+        logging.info(f"Synced repositories for user {user_id}: {result}")
+        
+    except Exception as e:
+        logging.error(f"Repository sync failed for user {user_id}: {e}")
+        db.session.rollback()
+
+@celery.task
+def dispatch_repository_job(job_id):
+    """Fan out the next wave of a repository generation job
+    
+    Each wave is a chord whose callback dispatches the following wave, so a
+    job never has more than ``max_parallel`` files in flight.
+    """
+    job = GenerationJob.query.get(job_id)
+    if not job or job.status in ('cancelled', 'completed'):
+        return
+    
+    if job.status == 'pending':
+        job.status = 'running'
+        job.started_at = job.started_at or datetime.utcnow()
+        db.session.commit()
+    
+    file_ids = claim_next_files(job)
+    if file_ids:
+        chord(group(generate_job_file.s(file_id) for file_id in file_ids))(
+            dispatch_repository_job.si(job_id)
+        )
+    elif finish_job_if_done(job):
+        logging.info(f"Repository generation job {job_id} finished")
+
+@celery.task
+def generate_job_file(job_file_id):
+    """Generate tests for one file of a repository job
     
-    with app.app_context():
-        try:
-            user = User.query.get(user_id)
-            if not user:
-                return
-            
-            github_service = GitHubService(user.access_token)
-            repos_data = github_service.get_user_repositories(user_id)
-            
-            # Update repository cache
-            for repo_data in repos_data:
-                existing_repo = Repository.query.filter_by(
-                    github_id=str(repo_data['id']),
-                    user_id=user_id
-                ).first()
-                
-                if existing_repo:
-                    # Update existing repository
-                    existing_repo.name = repo_data['name']
-                    existing_repo.description = repo_data.get('description')
-                    existing_repo.language = repo_data.get('language')
-                    existing_repo.cache_updated_at = datetime.utcnow()
-                else:
-                    # Create new repository record
-                    new_repo = Repository(
-                        github_id=str(repo_data['id']),
-                        user_id=user_id,
-                        name=repo_data['name'],
-                        full_name=repo_data['full_name'],
-                        description=repo_data.get('description'),
-                        language=repo_data.get('language'),
-                        private=repo_data.get('private', False),
-                        clone_url=repo_data['clone_url'],
-                        html_url=repo_data['html_url'],
-                        cache_updated_at=datetime.utcnow()
-                    )
-                    db.session.add(new_repo)
-            
-            db.session.commit()
-            logging.info(f"Synced repositories for user {user_id}")
-            
-        except Exception as e:
-            logging.error(f"Repository sync failed for user {user_id}: {e}")
-            db.session.rollback()
+    Never raises: failures are recorded on the file so the chord callback
+    always runs and the job keeps moving.
+    """
+    claimed = db.session.execute(
+        update(GenerationJobFile)
+        .where(GenerationJobFile.id == job_file_id, GenerationJobFile.status == 'queued')
+        .values(status='running', started_at=datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        # Cancelled or already picked up by another dispatch chain
+        return
+    
+    job_file = GenerationJobFile.query.get(job_file_id)
+    job = job_file.job
+    
+    if job.status == 'cancelled':
+        job_file.status = 'pending'
+        job_file.started_at = None
+        db.session.commit()
+        return
+    
+    try:
+        user = User.query.get(job.user_id)
+        repository = Repository.query.get(job.repository_id)
+        
+        github_service = GitHubService(user.access_token)
+        file_content = github_service.get_file_content(repository.full_name, job_file.file_path)
+        if not file_content:
+            raise Exception("Could not retrieve file content")
+        
+        groq_service = GroqService()
+        generation = generate_for_file(
+            groq_service, job.user_id, job.repository_id, job_file.file_path,
+            file_content, job.technology, job.edge_cases
+        )
+        
+        if generation['mode'] == 'unchanged':
+            record_file_result(job_file, 'completed', generation['previous'].id, generation['mode'])
+            return
+        
+        quality_analysis = groq_service.analyze_code_quality(generation['test_content'])
+        
+        test_case = TestCase(
+            user_id=job.user_id,
+            repository_id=job.repository_id,
+            file_path=job_file.file_path,
+            test_content=generation['test_content'],
+            technology=job.technology,
+            edge_cases=job.edge_cases,
+            quality_score=quality_analysis.get('score', 5.0),
+            symbol_hashes=generation['symbol_hashes']
+        )
+        record_version(test_case, generation['previous'])
+        db.session.add(test_case)
+        index_source(test_case, file_content)
+        record_test_generated(job.user_id, job.technology, test_case.quality_score)
+        db.session.flush()
+        
+        record_file_result(job_file, 'completed', test_case.id, generation['mode'])
+        
+    except Exception as e:
+        logging.error(f"Job file {job_file_id} ({job_file.file_path}) failed: {e}")
+        db.session.rollback()
+        job_file = GenerationJobFile.query.get(job_file_id)
+        record_file_result(job_file, 'failed', error=str(e))
+
+@celery.task
+def backfill_vulnerability_findings(batch_size=500):
+    """Parse severities for vulnerability analyses saved before extraction existed"""
+    try:
+        total = 0
+        while True:
+            processed = backfill_findings(batch_size)
+            total += processed
+            if processed < batch_size:
+                break
+        
+        logging.info(f"Backfilled findings for {total} vulnerability analyses")
+        
+    except Exception as e:
+        logging.error(f"Vulnerability findings backfill failed: {e}")
+        db.session.rollback()
+
+@celery.task
+def rebuild_search_index(batch_size=500):
+    """Index test cases and analyses written before the full-text index existed"""
+    try:
+        for kind in SEARCH_KINDS:
+            after_id = 0
+            while True:
+                after_id = reindex(kind, batch_size, after_id)
+                if not after_id:
+                    break
+            logging.info(f"Indexed {kind} for search")
+        
+    except Exception as e:
+        logging.error(f"Search index rebuild failed: {e}")
+        db.session.rollback()
+
+@celery.task
+def migrate_content_to_blobs(batch_size=500):
+    """Move test and analysis text saved inline before content blobs existed"""
+    try:
+        for model, columns in BLOB_COLUMNS.items():
+            for column in columns:
+                after_id = 0
+                while True:
+                    after_id = migrate_inline_content(model, column, batch_size, after_id)
+                    if not after_id:
+                        break
+                logging.info(f"Moved {model.__tablename__}.{column} into content blobs")
+        
+    except Exception as e:
+        logging.error(f"Content blob migration failed: {e}")
+        db.session.rollback()
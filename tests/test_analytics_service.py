@@ -0,0 +1,191 @@
+import sqlite3
+
+import fakeredis
+import pytest
+from datetime import datetime, timedelta
+from app import db
+from models import TestCase, CodeAnalysis, Analytics
+import analytics_service
+import cache_service
+import tasks
+from analytics_service import (
+    RECONCILE_DELAY, analytics_etag, compute_user_analytics, daily_activity, get_user_analytics, reconcile_user_analytics,
+    record_test_generated, record_analysis, record_commit, record_repository_total, schedule_reconcile
+)
+
+def _test_case(user, repo, technology, quality_score, status='generated', created_at=None):
+    return TestCase(
+        user_id=user.id,
+        repository_id=repo.id,
+        file_path='src/module.py',
+        test_content='def test_x(): pass',
+        technology=technology,
+        quality_score=quality_score,
+        status=status,
+        created_at=created_at or datetime.utcnow()
+    )
+
+def test_compute_user_analytics(app, sample_user, sample_repository):
+    """Test aggregates match the per-row definitions"""
+    with app.app_context():
+        db.session.add_all([
+            _test_case(sample_user, sample_repository, 'python', 9.0, status='committed'),
+            _test_case(sample_user, sample_repository, 'python', 6.0),
+            _test_case(sample_user, sample_repository, 'javascript', None),
+            CodeAnalysis(user_id=sample_user.id, repository_id=sample_repository.id, file_path='a.py',
+                         analysis_type='refactor', original_code='', analysis_result=''),
+        ])
+        db.session.commit()
+
+        metrics = compute_user_analytics(sample_user.id)
+        assert metrics['total_files_generated'] == 3
+        assert metrics['total_commits'] == 1
+        assert metrics['total_repos'] == 1
+        assert metrics['total_analyses'] == 1
+        assert metrics['refactoring_suggestions_generated'] == 1
+        assert metrics['average_quality_score'] == 7.5
+        assert metrics['top_notch_percentage'] == 50.0
+        assert metrics['technology_breakdown'] == {'python': 2, 'javascript': 1}
+        assert metrics['language_breakdown'] == {'Python': 2, 'JavaScript': 1}
+
+def test_daily_activity_buckets_by_day(app, sample_user, sample_repository):
+    """Test daily counts cover exactly the window, newest day first"""
+    now = datetime(2024, 5, 31, 12, 0)
+    with app.app_context():
+        db.session.add_all([
+            _test_case(sample_user, sample_repository, 'python', 8.0, created_at=now),
+            _test_case(sample_user, sample_repository, 'python', 8.0, created_at=datetime(2024, 5, 30, 0, 0)),
+            _test_case(sample_user, sample_repository, 'python', 8.0, created_at=datetime(2024, 5, 30, 23, 59)),
+            _test_case(sample_user, sample_repository, 'python', 8.0, created_at=now - timedelta(days=30)),
+        ])
+        db.session.commit()
+
+        activity = daily_activity(sample_user.id, now=now)
+        assert len(activity) == 30
+        assert list(activity)[0] == '2024-05-31'
+        assert activity['2024-05-31'] == {'test_cases': 1, 'analyses': 0}
+        assert activity['2024-05-30'] == {'test_cases': 2, 'analyses': 0}
+        assert sum(day['test_cases'] for day in activity.values()) == 3
+
+def test_events_increment_counters(app, sample_user, sample_repository):
+    """Test events upsert and increment the counter rows"""
+    with app.app_context():
+        reconcile_user_analytics(sample_user.id)
+        record_test_generated(sample_user.id, 'python', 9.0)
+        record_test_generated(sample_user.id, 'python', 5.0)
+        record_test_generated(sample_user.id, 'go')
+        record_analysis(sample_user.id, 'vulnerability', ['high', 'high', 'low'])
+        record_analysis(sample_user.id, 'refactor')
+        record_commit(sample_user.id)
+        record_repository_total(sample_user.id)
+        db.session.commit()
+
+        metrics = get_user_analytics(sample_user.id)
+        assert metrics['total_files_generated'] == 3
+        assert metrics['technology_breakdown'] == {'python': 2, 'go': 1}
+        assert metrics['average_quality_score'] == 7.0
+        assert metrics['top_notch_percentage'] == 50.0
+        assert metrics['total_analyses'] == 2
+        assert metrics['refactoring_suggestions_generated'] == 1
+        assert metrics['vulnerabilities'] == {'critical': 0, 'high': 2, 'medium': 0, 'low': 1}
+        assert metrics['total_commits'] == 1
+        assert metrics['total_repos'] == 1
+        today = list(metrics['daily_activity'].values())[0]
+        assert today == {'test_cases': 3, 'analyses': 2}
+        assert Analytics.query.filter_by(user_id=sample_user.id).count() == 1
+
+def test_first_read_and_reconcile_repair_drift(app, sample_user, sample_repository):
+    """Test counters are rebuilt from source rows"""
+    with app.app_context():
+        db.session.add(_test_case(sample_user, sample_repository, 'python', 9.0))
+        db.session.commit()
+
+        # First read builds the counters from existing rows
+        assert get_user_analytics(sample_user.id)['total_files_generated'] == 1
+
+        # An event with no matching row is drift; reconciling removes it
+        record_test_generated(sample_user.id, 'rust', 4.0)
+        db.session.commit()
+        assert get_user_analytics(sample_user.id)['total_files_generated'] == 2
+
+        reconcile_user_analytics(sample_user.id)
+        db.session.commit()
+        metrics = get_user_analytics(sample_user.id)
+        assert metrics['total_files_generated'] == 1
+        assert metrics['technology_breakdown'] == {'python': 1}
+        assert metrics['average_quality_score'] == 9.0
+
+def test_reconcile_triggers_are_coalesced(app, sample_user, monkeypatch):
+    """Test a burst of triggers queues one delayed reconciliation until that run starts"""
+    monkeypatch.setattr(cache_service, '_cache', cache_service.MemoryCache())
+    queued = []
+    monkeypatch.setattr(tasks.update_user_analytics, 'apply_async',
+                        lambda args, countdown: queued.append((args, countdown)))
+
+    with app.app_context():
+        assert sum(schedule_reconcile(sample_user.id) for _ in range(100)) == 1
+        assert schedule_reconcile(sample_user.id + 1) is True
+        assert queued == [((sample_user.id,), RECONCILE_DELAY), ((sample_user.id + 1,), RECONCILE_DELAY)]
+
+        tasks.update_user_analytics.run(sample_user.id)
+        assert Analytics.query.filter_by(user_id=sample_user.id).one().reconciled_at is not None
+        assert schedule_reconcile(sample_user.id) is True
+        assert len(queued) == 3
+
+def test_etag_changes_on_writes_from_other_processes(app, sample_user, monkeypatch):
+    """Test a write bumped through another process's cache connection changes the ETag"""
+    server = fakeredis.FakeServer()
+    urls = []
+
+    def from_url(url, **kwargs):
+        urls.append(url)
+        return fakeredis.FakeRedis(server=server, **kwargs)
+
+    monkeypatch.setattr(cache_service.redis.Redis, 'from_url', from_url)
+    monkeypatch.delenv('REDIS_URL', raising=False)
+    monkeypatch.setattr(cache_service, '_cache', None)
+
+    with app.app_context():
+        etag = analytics_etag(sample_user.id)
+        web_cache = cache_service.get_cache()
+        assert urls == [cache_service.DEFAULT_REDIS_URL]
+
+        # The write happens in a Celery worker with its own connection
+        monkeypatch.setattr(cache_service, '_cache', cache_service.RedisCache(cache_service.DEFAULT_REDIS_URL))
+        record_test_generated(sample_user.id, 'python', 8.0)
+        db.session.commit()
+
+        monkeypatch.setattr(cache_service, '_cache', web_cache)
+        assert analytics_etag(sample_user.id) != etag
+
+def test_reconcile_holds_writers_off_while_it_reads(app, sample_user, sample_repository, monkeypatch):
+    """Test a write cannot land between the reconcile's reads and its absolute counter update"""
+    if db.engine.dialect.name != 'sqlite':
+        pytest.skip('simulates the concurrent writer with a second SQLite connection')
+    compute = analytics_service.compute_user_analytics
+    concurrent_write = []
+
+    def compute_while_writing(user_id, now=None):
+        other = sqlite3.connect(db.engine.url.database, timeout=0)
+        try:
+            other.execute('UPDATE analytics SET total_files_generated = total_files_generated + 1 '
+                          'WHERE user_id = ?', (user_id,))
+            other.commit()
+            concurrent_write.append('committed')
+        except sqlite3.OperationalError as e:
+            concurrent_write.append(str(e))
+        finally:
+            other.close()
+        return compute(user_id, now=now)
+
+    with app.app_context():
+        db.session.add(_test_case(sample_user, sample_repository, 'python', 8.0))
+        record_test_generated(sample_user.id, 'python', 8.0)
+        db.session.commit()
+
+        monkeypatch.setattr(analytics_service, 'compute_user_analytics', compute_while_writing)
+        reconcile_user_analytics(sample_user.id)
+        db.session.commit()
+
+        assert concurrent_write == ['database is locked']
+        assert Analytics.query.filter_by(user_id=sample_user.id).one().total_files_generated == 1
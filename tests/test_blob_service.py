@@ -0,0 +1,78 @@
+import json
+from app import db
+from models import CodeAnalysis, ContentBlob, TestCase
+from blob_service import content_hash, migrate_inline_content
+from export_service import export_stream
+
+SOURCE = "def add(a, b):\n    return a + b\n" * 20
+
+def _analysis(user_id, repository_id, code):
+    return CodeAnalysis(user_id=user_id, repository_id=repository_id, file_path='src/calc.py',
+                        analysis_type='refactor', original_code=code, analysis_result='Looks fine')
+
+def test_identical_content_shares_one_compressed_blob(app, sample_user, sample_repository):
+    """Test repeated analyses of one file store its source once, compressed"""
+    with app.app_context():
+        db.session.add_all([_analysis(sample_user.id, sample_repository.id, SOURCE) for _ in range(3)])
+        db.session.commit()
+        db.session.expunge_all()
+
+        assert ContentBlob.query.count() == 2
+        blob = db.session.get(ContentBlob, content_hash(SOURCE))
+        assert blob.codec == 'zlib'
+        assert blob.size == len(SOURCE) and len(blob.data) < blob.size
+
+        analysis = CodeAnalysis.query.first()
+        assert analysis.original_code_inline == ''
+        assert analysis.original_code == SOURCE
+        assert analysis.analysis_result == 'Looks fine'
+        # On the class the attribute compares content hashes
+        assert CodeAnalysis.query.filter(CodeAnalysis.original_code == content_hash(SOURCE)).count() == 3
+
+def test_small_text_is_stored_uncompressed(app, sample_user, sample_repository):
+    """Test text that zlib cannot shrink keeps its raw bytes"""
+    with app.app_context():
+        test_case = TestCase(user_id=sample_user.id, repository_id=sample_repository.id, file_path='a.py',
+                             test_content='pass', technology='python')
+        db.session.add(test_case)
+        db.session.commit()
+        assert test_case.test_content_blob.codec == 'none'
+        assert test_case.test_content == 'pass'
+
+def test_inline_rows_are_read_and_migrated(app, sample_user, sample_repository):
+    """Test rows written before blobs still load and move into blobs in batches"""
+    with app.app_context():
+        db.session.execute(TestCase.__table__.insert(), [{
+            'user_id': sample_user.id, 'repository_id': sample_repository.id, 'file_path': f'src/m{i}.py',
+            'test_content': f'def test_{i % 2}(): pass', 'technology': 'python'
+        } for i in range(5)])
+        db.session.commit()
+        assert TestCase.query.first().test_content == 'def test_0(): pass'
+
+        after_id = migrate_inline_content(TestCase, 'test_content', batch_size=2)
+        assert after_id
+        while after_id:
+            after_id = migrate_inline_content(TestCase, 'test_content', batch_size=2, after_id=after_id)
+        db.session.expunge_all()
+
+        rows = TestCase.query.order_by(TestCase.id).all()
+        assert all(row.test_content_hash and row.test_content_inline == '' for row in rows)
+        assert [row.test_content for row in rows] == [f'def test_{i % 2}(): pass' for i in range(5)]
+        assert ContentBlob.query.count() == 2
+
+def test_export_decompresses_blob_and_inline_rows(app, sample_user, sample_repository):
+    """Test exports return the text whether it lives in a blob or inline"""
+    with app.app_context():
+        db.session.add(_analysis(sample_user.id, sample_repository.id, SOURCE))
+        db.session.execute(CodeAnalysis.__table__.insert().values(
+            user_id=sample_user.id, repository_id=sample_repository.id, file_path='src/old.py',
+            analysis_type='refactor', original_code='old source', analysis_result='old report'
+        ))
+        db.session.commit()
+        body = ''.join(export_stream('analyses', sample_user.id, 'ndjson',
+                                     ['file_path', 'original_code', 'analysis_result']))
+    rows = [json.loads(line) for line in body.splitlines()]
+    by_path = {row['file_path']: row for row in rows}
+    assert by_path['src/calc.py']['original_code'] == SOURCE
+    assert by_path['src/old.py'] == {'file_path': 'src/old.py', 'original_code': 'old source',
+                                      'analysis_result': 'old report'}
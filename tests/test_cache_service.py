@@ -0,0 +1,26 @@
+import pytest
+import cache_service
+from cache_service import MemoryCache, get_version, bump_version, get_json, set_json
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    cache = MemoryCache()
+    monkeypatch.setattr(cache_service, '_cache', cache)
+    return cache
+
+def test_versions_start_unique_and_bump(memory_cache):
+    """Test missing counters start from a fresh value and bumps change them"""
+    first = get_version('analytics:1')
+    assert get_version('analytics:1') == first
+    bump_version('analytics:1')
+    assert get_version('analytics:1') != first
+    assert get_version('analytics:2') != first
+
+def test_json_round_trip_and_expiry(memory_cache, monkeypatch):
+    """Test cached values round-trip and expire"""
+    set_json('key', {'a': [1, 2]}, ttl=10)
+    assert get_json('key') == {'a': [1, 2]}
+
+    now = cache_service.time.monotonic()
+    monkeypatch.setattr(cache_service.time, 'monotonic', lambda: now + 11)
+    assert get_json('key') is None
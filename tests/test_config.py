@@ -0,0 +1,25 @@
+from sqlalchemy import text
+from app import db
+from config import engine_options, postgres_pool_size
+
+def test_sqlite_connections_use_wal_and_tuned_pragmas(app):
+    """Test every pooled SQLite connection comes up in WAL mode with the tuned pragmas"""
+    with app.app_context():
+        with db.engine.connect() as connection:
+            assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert connection.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+            assert connection.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+            assert connection.execute(text('PRAGMA cache_size')).scalar() == -65536
+
+def test_postgres_pool_is_split_across_workers(monkeypatch):
+    """Test the Postgres pool keeps one connection per thread and caps bursts at the worker's share"""
+    monkeypatch.setenv('WEB_CONCURRENCY', '4')
+    monkeypatch.setenv('GUNICORN_THREADS', '8')
+    assert postgres_pool_size() == (8, 7)
+
+    monkeypatch.setenv('WEB_CONCURRENCY', '16')
+    assert postgres_pool_size() == (3, 0)
+
+    options = engine_options('postgresql://app@db/app')
+    assert options['pool_size'] == 3 and 'statement_timeout=30000' in options['connect_args']['options']
+    assert 'pool_size' not in engine_options('sqlite:///app.db')
@@ -0,0 +1,95 @@
+import pytest
+from datetime import datetime, timedelta
+from flask import session
+from sqlalchemy import create_engine, update
+from app import db
+from models import ReplicationHeartbeat, User
+from db_routing import WRITTEN_AT_KEY, forget_replica_positions, primary_reads, replica_reads
+import db_routing
+
+@pytest.fixture
+def replica(app, tmp_path, monkeypatch):
+    """A second SQLite file registered as replica bind, measured on every read"""
+    engine = create_engine(f'sqlite:///{tmp_path}/replica.db')
+    monkeypatch.setattr(db_routing, 'REPLICA_CHECK_SECONDS', 0)
+    monkeypatch.setattr(db_routing, '_last_beat', 0.0)
+    forget_replica_positions()
+    db.engines['replica_1'] = engine
+    yield engine
+    del db.engines['replica_1']
+    engine.dispose()
+    forget_replica_positions()
+
+def _replicate(replica):
+    """Copy the primary file over the replica, as replication would"""
+    db.session.commit()
+    source, target = db.engine.raw_connection(), replica.raw_connection()
+    try:
+        source.driver_connection.backup(target.driver_connection)
+    finally:
+        source.close()
+        target.close()
+
+def _add_user(name):
+    db.session.add(User(github_id=name, username=name, access_token='t'))
+    db.session.commit()
+
+def test_replica_reads_go_to_a_caught_up_replica(app, sample_user, replica):
+    """Test designated reads use the replica while other reads and writing transactions use the primary"""
+    with app.app_context():
+        _add_user('replicated')
+        _replicate(replica)
+        _add_user('not-replicated')
+
+        with replica_reads():
+            assert User.query.count() == 2
+            with primary_reads():
+                db.session.rollback()
+                assert User.query.count() == 3
+        db.session.rollback()
+        assert User.query.count() == 3
+
+        with replica_reads():
+            db.session.add(User(github_id='pending', username='pending', access_token='t'))
+            db.session.flush()
+            assert User.query.count() == 4
+        db.session.rollback()
+
+def test_replica_without_heartbeat_is_skipped(app, sample_user, replica):
+    """Test a replica that has never received a heartbeat the primary has is treated as behind"""
+    with app.app_context():
+        _replicate(replica)
+        _add_user('first-beat')
+
+        with replica_reads():
+            assert User.query.count() == 2
+
+def test_lagging_replica_is_skipped(app, sample_user, replica):
+    """Test a replica whose heartbeat trails the primary by more than the allowed lag is not used"""
+    with app.app_context():
+        _add_user('beat')
+        _replicate(replica)
+        db.session.execute(update(ReplicationHeartbeat).values(beat_at=datetime.utcnow() + timedelta(seconds=30)))
+        _add_user('late')
+
+        with replica_reads():
+            assert User.query.count() == 3
+        db.session.rollback()
+        with replica_reads(max_lag=60):
+            assert User.query.count() == 2
+
+def test_user_reads_their_own_writes(app, sample_user, replica):
+    """Test a user's reads stay on the primary until a replica has their last write"""
+    with app.app_context(), app.test_request_context('/api/analytics'):
+        _replicate(replica)
+        _add_user('mine')
+        assert session[WRITTEN_AT_KEY] == 1
+
+        with replica_reads():
+            assert User.query.count() == 2
+        db.session.rollback()
+
+        _replicate(replica)
+        with replica_reads():
+            assert User.query.count() == 2
+            assert db.session.info['routing_replica'] == 'replica_1'
@@ -0,0 +1,75 @@
+import pytest
+import event_service
+from event_service import MemoryBroker, publish, stream_events
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = MemoryBroker(replay_size=3)
+    monkeypatch.setattr(event_service, '_broker', broker)
+    return broker
+
+def test_live_events_and_heartbeat(broker):
+    """Test a stream delivers published events and sends heartbeats when idle"""
+    stream = stream_events(1, heartbeat=0.01)
+    assert next(stream) == 'retry: 3000\n\n'
+    assert next(stream) == ': heartbeat\n\n'
+
+    event_id = publish(1, 'analytics', {'version': '2'})
+    publish(2, 'analytics', {'version': '9'})
+    assert next(stream) == f'id: {event_id}\nevent: analytics\ndata: {{"version": "2"}}\n\n'
+    assert next(stream) == ': heartbeat\n\n'
+
+    stream.close()
+    assert broker._subscriptions == {}
+
+def test_resume_replays_missed_events(broker):
+    """Test reconnecting with Last-Event-ID replays only newer buffered events"""
+    ids = [publish(1, 'task', {'n': n}) for n in range(5)]
+    assert ids == sorted(ids, key=event_service._id_key)
+
+    stream = stream_events(1, last_event_id=ids[2], heartbeat=0.01)
+    next(stream)
+    assert [next(stream) for _ in range(2)] == [
+        f'id: {ids[3]}\nevent: task\ndata: {{"n": 3}}\n\n',
+        f'id: {ids[4]}\nevent: task\ndata: {{"n": 4}}\n\n',
+    ]
+    assert next(stream) == ': heartbeat\n\n'
+    stream.close()
+
+    # Only the newest events are buffered; malformed IDs replay nothing
+    assert [event['data']['n'] for event in broker.replay(1, ids[0])] == [2, 3, 4]
+    assert broker.replay(1, 'not-an-id') == []
+
+def test_stalled_subscriber_is_disconnected(broker):
+    """Test a full subscriber queue ends the stream instead of growing"""
+    stream = stream_events(1, heartbeat=0.01)
+    next(stream)
+    subscription = next(iter(broker._subscriptions['1']))
+    subscription.queue = event_service.queue.Queue(1)
+
+    publish(1, 'job', {'n': 1})
+    publish(1, 'job', {'n': 2})
+    assert subscription.overflowed
+    assert list(stream) == []
+    assert broker._subscriptions == {}
+
+def test_analytics_commit_publishes_delta(app, sample_user, broker, monkeypatch):
+    """Test committed analytics events notify the user's streams once per commit"""
+    import cache_service
+    from app import db
+    from analytics_service import record_test_generated
+    monkeypatch.setattr(cache_service, '_cache', cache_service.MemoryCache())
+
+    with app.app_context():
+        subscription = broker.subscribe(sample_user.id)
+        record_test_generated(sample_user.id, 'python', 9.0)
+        record_test_generated(sample_user.id, 'python', 5.0)
+        assert subscription.queue.empty()
+        db.session.commit()
+
+    event = subscription.queue.get_nowait()
+    assert event['event'] == 'analytics'
+    assert event['data']['version'] == cache_service.get_version(f'analytics:{sample_user.id}')
+    assert event['data']['delta']['total_files_generated'] == 2
+    assert event['data']['delta']['top_notch_count'] == 1
+    assert subscription.queue.empty()
@@ -0,0 +1,44 @@
+import csv
+import gzip
+import io
+import json
+import pytest
+from app import db
+from models import TestCase
+from export_service import export_stream, resolve_columns
+
+@pytest.fixture
+def test_cases(app, sample_user, sample_repository):
+    with app.app_context():
+        db.session.add_all([
+            TestCase(user_id=sample_user.id, repository_id=sample_repository.id, file_path=f'src/m{i}.py',
+                     test_content=f'def test_{i}(): pass', technology='python', quality_score=float(i),
+                     edge_cases=['null', 'empty'])
+            for i in range(5)
+        ])
+        db.session.commit()
+
+def test_ndjson_export_selected_columns(app, sample_user, test_cases):
+    """Test NDJSON rows come in id order with only the chosen columns"""
+    with app.app_context():
+        body = ''.join(export_stream('test-cases', sample_user.id, 'ndjson', ['id', 'file_path', 'edge_cases']))
+    rows = [json.loads(line) for line in body.splitlines()]
+    assert [row['file_path'] for row in rows] == [f'src/m{i}.py' for i in range(5)]
+    assert set(rows[0]) == {'id', 'file_path', 'edge_cases'}
+    assert rows[0]['edge_cases'] == ['null', 'empty']
+
+def test_gzip_csv_export_round_trips(app, sample_user, test_cases):
+    """Test compressed CSV decodes to a header and one line per row"""
+    with app.app_context():
+        body = b''.join(export_stream('test-cases', sample_user.id, 'csv', compress=True))
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(body).decode())))
+    assert len(rows) == 5
+    assert rows[2]['test_content'] == 'def test_2(): pass'
+    assert json.loads(rows[2]['edge_cases']) == ['null', 'empty']
+
+def test_empty_export_and_unknown_columns(app, sample_user):
+    """Test an empty CSV still has its header and bad columns are rejected"""
+    with app.app_context():
+        assert ''.join(export_stream('analyses', sample_user.id, 'csv', ['id', 'file_path'])) == 'id,file_path\r\n'
+    with pytest.raises(ValueError):
+        resolve_columns('test-cases', ['id', 'user_password'])
@@ -0,0 +1,198 @@
+import io
+import tarfile
+
+import pytest
+import requests
+from celery.contrib.testing.worker import start_worker
+
+from app import db
+from celery_app import celery
+from github_service import GitHubService
+from groq_service import GroqService
+from models import CodeAnalysis, TestCase
+
+SOURCE = "def add(a, b):\n    return a + b\n"
+
+
+@pytest.fixture
+def memory_celery(monkeypatch):
+    """Queue tasks on Celery's in-memory broker and keep their state in memory"""
+    monkeypatch.setitem(celery.conf, 'broker_url', 'memory://')
+    monkeypatch.setitem(celery.conf, 'result_backend', 'cache+memory://')
+    return celery
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    """Serve SOURCE for every file and record calls to the model instead of making them"""
+    calls = []
+    monkeypatch.setattr(GitHubService, 'get_file_content', lambda self, repo, path: SOURCE)
+
+    def generate_test_cases(self, *args, **kwargs):
+        calls.append('generate')
+        return "def test_add():\n    assert add(1, 2) == 3\n"
+
+    def analyze_code_quality(self, code):
+        calls.append('quality')
+        return {'score': 8.0}
+
+    def refactor_code(self, code, file_path):
+        calls.append('refactor')
+        return 'Inline the addition'
+
+    monkeypatch.setattr(GroqService, 'generate_test_cases', generate_test_cases)
+    monkeypatch.setattr(GroqService, 'analyze_code_quality', analyze_code_quality)
+    monkeypatch.setattr(GroqService, 'refactor_code', refactor_code)
+    return calls
+
+
+def _login(client, user):
+    with client.session_transaction() as sess:
+        sess['access_token'] = 'test_token'
+        sess['user_id'] = user.id
+
+
+def test_async_generation_is_queued_then_run_by_worker(client, sample_user, sample_repository, memory_celery,
+                                                       llm_calls):
+    """async=true returns a job ID before any model call; the status API then serves the result"""
+    _login(client, sample_user)
+
+    response = client.post('/api/generate-tests?async=true', json={
+        'files': [{'path': 'src/add.py', 'repo': sample_repository.full_name}], 'technology': 'python'
+    })
+
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    assert job_id.startswith(f'{sample_user.id}-')
+    assert llm_calls == []
+    assert client.get(f'/api/jobs/{job_id}').get_json()['state'] == 'PENDING'
+
+    with start_worker(memory_celery, pool='solo', perform_ping_check=False, loglevel='WARNING'):
+        memory_celery.AsyncResult(job_id).get(timeout=10)
+
+    status = client.get(response.get_json()['status_url']).get_json()
+    assert status['state'] == 'SUCCESS'
+    assert [result['file_path'] for result in status['result']['results']] == ['src/add.py']
+    db.session.rollback()
+    assert TestCase.query.filter_by(user_id=sample_user.id).count() == 1
+
+
+def test_async_analysis_failure_is_reported(client, sample_user, sample_repository, memory_celery, llm_calls,
+                                            monkeypatch):
+    """Invalid requests fail before queueing; failures inside the job show up in its status"""
+    _login(client, sample_user)
+    payload = {'repo_name': sample_repository.full_name, 'file_path': 'src/add.py', 'async': True}
+
+    invalid = client.post('/api/code-analysis', json={**payload, 'analysis_type': 'style'})
+    assert invalid.status_code == 400
+
+    monkeypatch.setattr(GitHubService, 'get_file_content',
+                        lambda self, repo, path: None if path == 'src/missing.py' else SOURCE)
+    refactor = client.post('/api/code-analysis', json={**payload, 'analysis_type': 'refactor'}).get_json()['job_id']
+    missing = client.post('/api/code-analysis', json={
+        **payload, 'file_path': 'src/missing.py', 'analysis_type': 'refactor'
+    }).get_json()['job_id']
+
+    with start_worker(memory_celery, pool='solo', perform_ping_check=False, loglevel='WARNING'):
+        memory_celery.AsyncResult(refactor).get(timeout=10)
+        memory_celery.AsyncResult(missing).get(timeout=10, propagate=False)
+
+    assert client.get(f'/api/jobs/{refactor}').get_json()['result'] == {'result': 'Inline the addition',
+                                                                        'prescan': None}
+    assert client.get(f'/api/jobs/{missing}').get_json() == {'job_id': missing, 'state': 'FAILURE',
+                                                             'error': 'File not found'}
+    db.session.rollback()
+    assert CodeAnalysis.query.filter_by(user_id=sample_user.id).count() == 1
+
+
+def test_jobs_are_private(client, sample_user, memory_celery):
+    """Job IDs issued to another user, or not issued by us at all, are not found"""
+    _login(client, sample_user)
+
+    assert client.get(f'/api/jobs/{sample_user.id + 1}-0123abcd').status_code == 404
+    assert client.get('/api/jobs/0123abcd').status_code == 404
+    assert client.get(f'/api/jobs/{sample_user.id}-0123abcd').get_json()['state'] == 'PENDING'
+
+
+class _Tarball:
+    """A GitHub tarball response holding ``files`` under the usual top-level directory"""
+
+    def __init__(self, files):
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+            for path, content in files.items():
+                data = content.encode() if isinstance(content, str) else content
+                member = tarfile.TarInfo(f'owner-repo-0123abc/{path}')
+                member.size = len(data)
+                archive.addfile(member, io.BytesIO(data))
+        buffer.seek(0)
+        self.raw = buffer
+
+    def raise_for_status(self):
+        pass
+
+
+def test_security_prescan_reads_one_archive_in_a_job(client, sample_user, sample_repository, memory_celery,
+                                                     monkeypatch):
+    """The pre-scan is queued and fetches the repository once instead of once per file"""
+    _login(client, sample_user)
+    requested = []
+
+    def get(url, **kwargs):
+        requested.append(url)
+        return _Tarball({
+            'app/views.py': "import os\nos.system(command)\n",
+            'app/utils.py': SOURCE,
+            'README.md': "# Docs\n",
+            'app/logo.py': b'\xff\xfe',
+        })
+
+    monkeypatch.setattr('github_service.requests.get', get)
+    response = client.get(f'/api/repository/{sample_repository.full_name}/security-prescan')
+
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    with start_worker(memory_celery, pool='solo', perform_ping_check=False, loglevel='WARNING'):
+        memory_celery.AsyncResult(job_id).get(timeout=10)
+
+    result = client.get(f'/api/jobs/{job_id}').get_json()['result']
+    assert [file['file_path'] for file in result['ranking']] == ['app/views.py', 'app/utils.py']
+    assert result['files_scanned'] == 2
+    assert requested == [f'https://api.github.com/repos/{sample_repository.full_name}/tarball/HEAD']
+
+
+class _BrokenResponse:
+    """A GitHub response that failed, or whose body is not a tarball"""
+
+    def __init__(self, status_error=None):
+        self.status_error = status_error
+        self.raw = io.BytesIO(b'not a tarball')
+
+    def raise_for_status(self):
+        if self.status_error:
+            raise self.status_error
+
+
+def test_security_prescan_fails_when_the_archive_cannot_be_read(client, sample_user, sample_repository,
+                                                                memory_celery, monkeypatch):
+    """Download and archive errors fail the job instead of reporting an empty scan"""
+    _login(client, sample_user)
+    responses = {
+        'missing': _BrokenResponse(requests.exceptions.HTTPError('404 Client Error: Not Found')),
+        'corrupt': _BrokenResponse(),
+    }
+    monkeypatch.setattr('github_service.requests.get', lambda url, **kwargs: responses[url.rsplit('/', 1)[1]])
+
+    job_ids = {
+        ref: client.get(f'/api/repository/{sample_repository.full_name}/security-prescan?ref={ref}')
+                   .get_json()['job_id']
+        for ref in responses
+    }
+    with start_worker(memory_celery, pool='solo', perform_ping_check=False, loglevel='WARNING'):
+        for job_id in job_ids.values():
+            memory_celery.AsyncResult(job_id).get(timeout=10, propagate=False)
+
+    missing = client.get(f"/api/jobs/{job_ids['missing']}").get_json()
+    assert missing['state'] == 'FAILURE'
+    assert '404' in missing['error']
+    assert client.get(f"/api/jobs/{job_ids['corrupt']}").get_json()['state'] == 'FAILURE'
@@ -0,0 +1,60 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import db
+from models import TestCase
+from analytics_service import reconcile_user_analytics
+from listing_service import count_test_cases, decode_cursor, list_test_cases, summarize_test_case
+
+@pytest.fixture
+def test_cases(app, sample_user, sample_repository):
+    """Seven test cases; three share a timestamp so ties are broken by id"""
+    base = datetime(2024, 5, 1)
+    created = [base + timedelta(hours=hour) for hour in (0, 1, 2, 2, 2, 3, 4)]
+    with app.app_context():
+        db.session.add_all([
+            TestCase(user_id=sample_user.id, repository_id=sample_repository.id, file_path=f'src/m{i}.py',
+                     test_content='x' * 1000, technology='python', created_at=created_at)
+            for i, created_at in enumerate(created)
+        ])
+        db.session.commit()
+
+def test_cursor_pages_cover_every_row_once(app, sample_user, test_cases):
+    """Test walking the cursors returns all rows newest first without gaps"""
+    with app.app_context():
+        seen, cursor = [], None
+        while True:
+            page, cursor = list_test_cases(sample_user.id, limit=3, cursor=cursor)
+            seen.extend(tc.file_path for tc in page)
+            if cursor is None:
+                break
+        assert seen == ['src/m6.py', 'src/m5.py', 'src/m4.py', 'src/m3.py', 'src/m2.py', 'src/m1.py', 'src/m0.py']
+
+def test_listing_is_one_lean_query(app, sample_user, test_cases):
+    """Test a page is a single query that defers test content and includes repository names"""
+    with app.app_context():
+        _, cursor = list_test_cases(sample_user.id, limit=2)
+        db.session.expunge_all()
+        statements = []
+        listener = lambda conn, cursor_, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            page, _ = list_test_cases(sample_user.id, limit=2, cursor=cursor)
+            summaries = [summarize_test_case(tc) for tc in page]
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        assert len(statements) == 1
+        assert '(test_cases.created_at, test_cases.id) <' in statements[0]
+        assert 'test_content' not in statements[0]
+        assert summaries[0]['repository']['full_name'] == 'testuser/test-repo'
+
+def test_totals_and_bad_cursor(app, sample_user, test_cases):
+    """Test exact and counter-based totals, and malformed cursors"""
+    with app.app_context():
+        assert count_test_cases(sample_user.id, 'exact') == 7
+        reconcile_user_analytics(sample_user.id)
+        db.session.commit()
+        assert count_test_cases(sample_user.id, 'approximate') == 7
+        with pytest.raises(ValueError):
+            decode_cursor('not-a-cursor')
@@ -0,0 +1,195 @@
+"""Query-plan regression tests for the hot read and write paths.
+
+Each test runs a real code path, captures the statements it sends and
+EXPLAINs them on the same database. A statement fails the test if its plan
+reads a whole table. Run the suite with DATABASE_URL pointing at
+PostgreSQL to check those plans too; there sequential scans are disabled
+while explaining, so a Seq Scan only remains when no index can serve the
+query, even though the seeded tables are tiny.
+"""
+import json
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from flask import session
+from sqlalchemy import event
+
+from app import app as flask_app, db
+from models import (
+    Analytics, CodeAnalysis, GenerationJob, GenerationJobFile, Repository, TestCase, VulnerabilityFinding
+)
+import routes
+from analytics_service import compute_user_analytics, get_user_analytics, reconcile_user_analytics
+from export_service import iter_rows
+from generation_service import latest_test_case
+from listing_service import count_test_cases, list_test_cases
+from retention_service import purge_expired
+from search_service import search
+from repository_sync_service import sync_user_repositories
+from repository_job_service import claim_next_files, finish_job_if_done, job_status
+from rollup_service import activity_series, compact_rollups
+from similarity_service import find_similar_test_case, index_source
+from vulnerability_service import backfill_findings, severity_counts
+
+SOURCE = "def add(a, b):\n    return a + b\n\n\ndef sub(a, b):\n    return a - b\n"
+
+
+@pytest.fixture
+def seeded(app, sample_user, sample_repository):
+    """A few rows in every table the hot paths read"""
+    now = datetime.utcnow()
+    with app.app_context():
+        test_cases = [
+            TestCase(user_id=sample_user.id, repository_id=sample_repository.id, file_path=f'src/m{i}.py',
+                     test_content='def test_x(): pass', technology='python', quality_score=7.0,
+                     created_at=now - timedelta(days=i))
+            for i in range(5)
+        ]
+        db.session.add_all(test_cases)
+        db.session.flush()
+        index_source(test_cases[0], SOURCE)
+
+        analysis = CodeAnalysis(user_id=sample_user.id, repository_id=sample_repository.id, file_path='src/m0.py',
+                                analysis_type='vulnerability', original_code=SOURCE, analysis_result='report')
+        db.session.add(analysis)
+        db.session.flush()
+        db.session.add(VulnerabilityFinding(analysis_id=analysis.id, user_id=sample_user.id, severity='high',
+                                            title='x', source='model'))
+
+        job = GenerationJob(user_id=sample_user.id, repository_id=sample_repository.id, technology='python',
+                            total_files=2)
+        db.session.add(job)
+        db.session.flush()
+        db.session.add_all([
+            GenerationJobFile(job_id=job.id, file_path='src/a.py', status='pending'),
+            GenerationJobFile(job_id=job.id, file_path='src/b.py', status='completed'),
+        ])
+        db.session.commit()
+        reconcile_user_analytics(sample_user.id)
+        db.session.commit()
+        yield {'user_id': sample_user.id, 'repository': sample_repository, 'job_id': job.id}
+
+
+def _capture(work):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        work()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    assert statements, 'the code path ran no queries'
+    return statements
+
+
+def _table_names():
+    return set(db.metadata.tables)
+
+
+def _sqlite_full_scans(connection, statement, parameters):
+    plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    scans = []
+    for row in plan:
+        match = re.match(r'SCAN (\w+)', row[-1])
+        # Aliases such as repositories_1 name the underlying table
+        if match and re.sub(r'_\d+$', '', match.group(1)) in _table_names():
+            scans.append(row[-1])
+    return scans
+
+
+def _postgres_full_scans(connection, statement, parameters):
+    connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    (plan,), = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).all()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans, nodes = [], [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in _table_names():
+            scans.append(f"Seq Scan on {node['Relation Name']}")
+        nodes.extend(node.get('Plans', []))
+    return scans
+
+
+def assert_no_full_scans(work):
+    statements = _capture(work)
+    explain = _postgres_full_scans if db.engine.dialect.name == 'postgresql' else _sqlite_full_scans
+    with db.engine.connect() as connection:
+        for statement, parameters in statements:
+            with connection.begin():
+                scans = explain(connection, statement, parameters)
+            assert not scans, f"{scans} in:\n{statement}"
+
+
+def test_listing_and_export_plans(seeded):
+    """Test test case listing, counting, history, export and search use indexes"""
+    user_id = seeded['user_id']
+    _, cursor = list_test_cases(user_id, limit=2)
+    assert_no_full_scans(lambda: list_test_cases(user_id, limit=2))
+    assert_no_full_scans(lambda: list_test_cases(user_id, limit=2, cursor=cursor))
+    assert_no_full_scans(lambda: count_test_cases(user_id, 'exact'))
+    assert_no_full_scans(lambda: latest_test_case(user_id, seeded['repository'].id, 'src/m1.py'))
+    assert_no_full_scans(lambda: list(iter_rows('test-cases', user_id, ['id', 'file_path', 'test_content'])))
+    assert_no_full_scans(lambda: list(iter_rows('analyses', user_id, ['id', 'original_code', 'analysis_result'])))
+    _, cursor = search(user_id, 'test_x', limit=2)
+    assert_no_full_scans(lambda: search(user_id, 'test_x report', limit=2))
+    assert_no_full_scans(lambda: search(user_id, 'test_x', limit=2, cursor=cursor))
+
+
+def test_repository_lookup_plans(seeded):
+    """Test repository lookups by name and by GitHub id use indexes"""
+    repository = seeded['repository']
+
+    def lookup_by_name():
+        with flask_app.test_request_context():
+            session['user_id'] = repository.user_id
+            assert routes._get_or_create_repo_id(repository.full_name) == repository.id
+
+    assert_no_full_scans(lookup_by_name)
+    listing = [
+        {'id': repository.github_id, 'name': 'renamed', 'full_name': repository.full_name, 'private': False,
+         'clone_url': repository.clone_url, 'html_url': repository.html_url},
+        {'id': 'new', 'name': 'new', 'full_name': 'user/new', 'private': False, 'clone_url': '', 'html_url': ''},
+    ]
+    assert_no_full_scans(lambda: sync_user_repositories(repository.user_id, listing))
+    assert_no_full_scans(lambda: sync_user_repositories(repository.user_id, []))
+
+
+def test_analytics_plans(seeded):
+    """Test the analytics read, reconcile and rollup paths use indexes"""
+    user_id = seeded['user_id']
+    now = datetime.utcnow()
+    assert_no_full_scans(lambda: get_user_analytics(user_id))
+    assert_no_full_scans(lambda: compute_user_analytics(user_id))
+    assert_no_full_scans(lambda: reconcile_user_analytics(user_id))
+    db.session.rollback()
+    assert_no_full_scans(lambda: activity_series(user_id, 'hour', now - timedelta(days=2), now))
+    assert_no_full_scans(lambda: Analytics.query.filter_by(user_id=user_id).first())
+    assert_no_full_scans(lambda: compact_rollups(now))
+
+
+def test_maintenance_and_job_plans(seeded, tmp_path):
+    """Test findings, similarity, job dispatch and retention queries use indexes"""
+    user_id = seeded['user_id']
+    assert_no_full_scans(lambda: severity_counts(user_id))
+    assert_no_full_scans(lambda: backfill_findings())
+    assert_no_full_scans(lambda: find_similar_test_case(user_id, SOURCE))
+    cutoff = datetime.utcnow() - timedelta(days=2)
+    assert_no_full_scans(lambda: purge_expired('test-cases', cutoff, archive_dir=str(tmp_path), pause=0))
+    assert_no_full_scans(lambda: purge_expired('analyses', datetime.utcnow(), pause=0))
+
+    job = db.session.get(GenerationJob, seeded['job_id'])
+    assert_no_full_scans(lambda: claim_next_files(job))
+    assert_no_full_scans(lambda: finish_job_if_done(job))
+    assert_no_full_scans(lambda: job_status(job))
+
+
+def test_unindexed_query_is_reported(seeded):
+    """Test the checker itself flags a query no index can serve"""
+    with pytest.raises(AssertionError):
+        assert_no_full_scans(lambda: TestCase.query.filter_by(technology='go').all())
@@ -0,0 +1,79 @@
+import pytest
+import cache_service
+import report_service
+from app import db
+from analytics_service import record_test_generated, reconcile_user_analytics
+from groq_service import GroqService
+from report_service import get_ai_report, pregenerate_report, report_snapshot, snapshot_hash
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """Capture model calls instead of sending them"""
+    monkeypatch.setattr(cache_service, '_cache', cache_service.MemoryCache())
+    sent = []
+
+    def generate(self, prompt, fallback=True):
+        sent.append(prompt)
+        return f'<p>report {len(sent)}</p>'
+
+    monkeypatch.setattr(GroqService, 'generate_ai_report', generate)
+    return sent
+
+def _metrics(**overrides):
+    metrics = {
+        'total_files_generated': 1234, 'total_repos': 10, 'total_commits': 7, 'total_analyses': 40,
+        'average_quality_score': 7.3, 'top_notch_percentage': 41.0,
+        'vulnerabilities': {'critical': 0, 'high': 1, 'medium': 3, 'low': 5},
+        'technology_breakdown': {'python': 900, 'go': 334},
+    }
+    metrics.update(overrides)
+    return metrics
+
+def test_snapshot_buckets_volatile_fields():
+    """Test small moves keep the hash while significant ones change it"""
+    base = snapshot_hash(report_snapshot(_metrics()))
+    assert snapshot_hash(report_snapshot(_metrics(total_files_generated=1241, average_quality_score=7.4))) == base
+    assert snapshot_hash(report_snapshot(_metrics(total_files_generated=1500))) != base
+    assert snapshot_hash(report_snapshot(_metrics(total_commits=8))) != base
+    assert report_snapshot(_metrics())['productivity_score'] == 130.0
+
+def test_reports_are_served_from_cache_until_refresh(app, sample_user, prompts):
+    """Test repeat requests reuse the report and refresh regenerates it"""
+    with app.app_context():
+        first = get_ai_report(sample_user.id)
+        assert first['cached'] is False
+        assert 'Total files generated: 0' in prompts[0]
+
+        again = get_ai_report(sample_user.id)
+        assert again['cached'] is True
+        assert again['content'] == first['content']
+        assert len(prompts) == 1
+
+        refreshed = get_ai_report(sample_user.id, refresh=True)
+        assert refreshed['content'] == '<p>report 2</p>'
+        assert get_ai_report(sample_user.id)['content'] == '<p>report 2</p>'
+
+def test_pregeneration_only_when_snapshot_changes(app, sample_user, prompts):
+    """Test pregeneration skips cached snapshots and fills new ones"""
+    with app.app_context():
+        reconcile_user_analytics(sample_user.id)
+        db.session.commit()
+        get_ai_report(sample_user.id)
+        assert pregenerate_report(sample_user.id) is False
+
+        record_test_generated(sample_user.id, 'python', 9.0)
+        db.session.commit()
+        assert pregenerate_report(sample_user.id) is True
+        assert get_ai_report(sample_user.id)['cached'] is True
+        assert len(prompts) == 2
+
+def test_failed_generation_is_not_cached(app, sample_user, prompts, monkeypatch):
+    """Test the fallback report is returned but never memoized"""
+    def fail(self, prompt, fallback=True):
+        raise RuntimeError('rate limited')
+
+    monkeypatch.setattr(GroqService, 'generate_ai_report', fail)
+    with app.app_context():
+        report = get_ai_report(sample_user.id)
+        assert report['content'] == report_service.FALLBACK_REPORT
+        assert cache_service.get_json(f"ai-report:{report['snapshot_hash']}") is None
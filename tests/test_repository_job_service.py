@@ -0,0 +1,131 @@
+import pytest
+from datetime import datetime
+from app import db
+from models import GenerationJobFile
+from repository_job_service import (
+    cancel_job,
+    claim_next_files,
+    create_job,
+    discover_eligible_files,
+    job_status,
+    record_file_result,
+    resume_job,
+)
+
+def _tree(*paths, size=100):
+    return [{'path': path, 'type': 'blob', 'size': size} for path in paths]
+
+def test_discover_python_sources():
+    """Test only non-test Python sources are eligible"""
+    tree = _tree(
+        'app.py', 'pkg/service.py', 'pkg/__init__.py', 'tests/test_app.py',
+        'pkg/service_test.py', 'conftest.py', 'venv/lib/site.py', '.github/scripts/ci.py', 'README.md'
+    )
+    assert discover_eligible_files(tree, 'python') == ['app.py', 'pkg/service.py']
+
+def test_discover_javascript_sources():
+    """Test JavaScript discovery skips specs and dependencies"""
+    tree = _tree('src/index.js', 'src/index.test.js', 'src/button.spec.jsx', 'node_modules/lib/index.js', 'dist/bundle.js')
+    assert discover_eligible_files(tree, 'javascript') == ['src/index.js']
+
+def test_discover_skips_empty_and_oversized_files():
+    """Test file size limits"""
+    tree = _tree('small.py', size=10) + _tree('empty.py', size=0) + _tree('huge.py', size=10 * 1024 * 1024)
+    assert discover_eligible_files(tree, 'python') == ['small.py']
+
+def test_discover_unknown_technology():
+    """Test unsupported technologies yield nothing"""
+    assert discover_eligible_files(_tree('main.py'), 'cobol') == []
+
+def _job(user, repository, paths=('a.py', 'b.py', 'c.py'), max_parallel=2):
+    return create_job(user.id, repository.id, 'python', [], list(paths), max_parallel=max_parallel)
+
+def _file_statuses(job):
+    return [job_file.status for job_file in job.files.order_by(GenerationJobFile.id)]
+
+def test_claim_next_files_respects_parallelism(app, sample_user, sample_repository):
+    """Test claims never put more than max_parallel files in flight"""
+    with app.app_context():
+        job = _job(sample_user, sample_repository)
+
+        first = claim_next_files(job)
+        assert len(first) == 2
+        assert claim_next_files(job) == []
+        assert _file_statuses(job) == ['queued', 'queued', 'pending']
+
+        record_file_result(GenerationJobFile.query.get(first[0]), 'completed')
+        assert len(claim_next_files(job)) == 1
+        assert _file_statuses(job) == ['completed', 'queued', 'queued']
+
+def test_create_job_clamps_parallelism(app, sample_user, sample_repository):
+    """Test max_parallel is kept between 1 and the service limit"""
+    with app.app_context():
+        assert _job(sample_user, sample_repository, max_parallel=0).max_parallel == 1
+        assert _job(sample_user, sample_repository, max_parallel=1000).max_parallel == 16
+
+def test_record_file_result_counts_outcomes(app, sample_user, sample_repository):
+    """Test completed and failed files bump their own job counters"""
+    with app.app_context():
+        job = _job(sample_user, sample_repository)
+        first, second, third = job.files.order_by(GenerationJobFile.id).all()
+
+        record_file_result(first, 'completed', generation_mode='full')
+        record_file_result(second, 'failed', error='Model timeout')
+        record_file_result(third, 'completed', generation_mode='reused')
+
+        db.session.refresh(job)
+        assert (job.completed_files, job.failed_files) == (2, 1)
+        assert second.error == 'Model timeout'
+        assert second.finished_at is not None
+
+def test_cancel_then_resume_reruns_only_unfinished_files(app, sample_user, sample_repository):
+    """Test resuming re-queues failed and cancelled files but never completed ones"""
+    with app.app_context():
+        job = _job(sample_user, sample_repository, paths=('a.py', 'b.py', 'c.py', 'd.py'))
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+        claimed = claim_next_files(job)
+        record_file_result(GenerationJobFile.query.get(claimed[0]), 'completed')
+        record_file_result(GenerationJobFile.query.get(claimed[1]), 'failed', error='boom')
+        claim_next_files(job)
+
+        cancel_job(job)
+        assert job.status == 'cancelled'
+        assert _file_statuses(job) == ['completed', 'failed', 'pending', 'pending']
+
+        assert resume_job(job)
+        assert job.status == 'running'
+        assert job.failed_files == 0
+        assert job.completed_files == 1
+        assert _file_statuses(job) == ['completed', 'pending', 'pending', 'pending']
+        assert all(job_file.error is None for job_file in job.files)
+        assert not resume_job(job)
+
+def test_resume_before_first_wave_stays_pending(app, sample_user, sample_repository):
+    """Test a job cancelled before it started resumes as pending so dispatch still sets started_at"""
+    with app.app_context():
+        job = _job(sample_user, sample_repository)
+        cancel_job(job)
+
+        assert resume_job(job)
+        assert job.status == 'pending'
+        assert job.started_at is None
+
+def test_job_status_aggregates_progress(app, sample_user, sample_repository):
+    """Test job status reports counters, per-state counts and files"""
+    with app.app_context():
+        job = _job(sample_user, sample_repository, paths=('a.py', 'b.py', 'c.py', 'd.py'))
+        job.started_at = datetime.utcnow()
+        claimed = claim_next_files(job)
+        record_file_result(GenerationJobFile.query.get(claimed[0]), 'completed', test_case_id=None,
+                           generation_mode='full')
+
+        status = job_status(job)
+        assert status['total_files'] == 4
+        assert status['completed_files'] == 1
+        assert status['progress'] == 25.0
+        assert status['file_states'] == {'completed': 1, 'queued': 1, 'pending': 2}
+        assert [job_file['status'] for job_file in status['files']] == ['completed', 'queued', 'pending', 'pending']
+        assert status['files'][0]['generation_mode'] == 'full'
+        assert 'files' not in job_status(job, include_files=False)
@@ -0,0 +1,60 @@
+from sqlalchemy import text
+from app import db
+from models import Analytics, Repository, TestCase
+from repository_sync_service import sync_user_repositories
+from schema_upgrade import upgrade_schema
+
+def _repo_data(github_id, name=None, **overrides):
+    name = name or f'repo-{github_id}'
+    return {'id': github_id, 'name': name, 'full_name': f'testuser/{name}', 'description': None,
+            'language': 'Python', 'private': False, 'clone_url': f'https://github.com/testuser/{name}.git',
+            'html_url': f'https://github.com/testuser/{name}', **overrides}
+
+def _add_test_case(user_id, repository_id):
+    db.session.add(TestCase(user_id=user_id, repository_id=repository_id, file_path='a.py',
+                            test_content='def test_a(): pass', technology='python'))
+    db.session.commit()
+
+def test_sync_upserts_and_removes_only_vanished_repositories(app, sample_user):
+    """Test a sync keeps row ids, updates changes and deletes or marks missing repositories"""
+    with app.app_context():
+        result = sync_user_repositories(sample_user.id, [_repo_data(i) for i in range(1, 5)])
+        db.session.commit()
+        assert result == {'inserted': 4, 'updated': 0, 'deleted': 0, 'vanished': 0}
+        ids = {repo.github_id: repo.id for repo in Repository.query.all()}
+        _add_test_case(sample_user.id, ids['3'])
+
+        listing = [_repo_data(1), _repo_data(2, description='now described'), _repo_data(5)]
+        result = sync_user_repositories(sample_user.id, listing)
+        db.session.commit()
+
+        assert result == {'inserted': 1, 'updated': 1, 'deleted': 1, 'vanished': 1}
+        repos = {repo.github_id: repo for repo in Repository.query.all()}
+        assert set(repos) == {'1', '2', '3', '5'}
+        assert repos['1'].id == ids['1'] and repos['2'].description == 'now described'
+        # Repository 3 still has a test case, so it stays but drops out of the count
+        assert repos['3'].vanished_at is not None and TestCase.query.count() == 1
+        assert Analytics.query.filter_by(user_id=sample_user.id).one().total_repos == 3
+
+        result = sync_user_repositories(sample_user.id, [_repo_data(1), _repo_data(2), _repo_data(3)])
+        db.session.commit()
+        assert result['updated'] == 2 and Repository.query.filter_by(github_id='3').one().vanished_at is None
+
+def test_upgrade_merges_duplicate_repositories(app, sample_user, sample_repository):
+    """Test the unique index upgrade folds duplicates into the oldest row, keeping their test cases"""
+    with app.app_context():
+        db.session.execute(text('DROP INDEX uq_repositories_user_github'))
+        db.session.execute(Repository.__table__.insert().values(
+            github_id=sample_repository.github_id, user_id=sample_user.id, name='copy', full_name='copy',
+            clone_url='', html_url=''
+        ))
+        db.session.commit()
+        duplicate = Repository.query.filter_by(name='copy').one()
+        _add_test_case(sample_user.id, duplicate.id)
+
+        upgrade_schema()
+
+        assert [repo.id for repo in Repository.query.all()] == [sample_repository.id]
+        assert TestCase.query.one().repository_id == sample_repository.id
+        indexes = db.session.execute(text("PRAGMA index_list(repositories)")).all()
+        assert any(index[1] == 'uq_repositories_user_github' and index[2] for index in indexes)
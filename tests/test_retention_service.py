@@ -0,0 +1,62 @@
+import gzip
+import json
+from datetime import datetime, timedelta
+from app import db
+from models import (
+    CodeAnalysis, ContentBlob, SourceFingerprint, SourceFingerprintBand, TestCase, VulnerabilityFinding
+)
+from retention_service import purge_expired
+from similarity_service import index_source
+from version_service import record_version
+
+SOURCE = "def add(a, b):\n    return a + b\n"
+
+def _test_case(user_id, repository_id, path, content, age_days):
+    test_case = TestCase(user_id=user_id, repository_id=repository_id, file_path=path, test_content=content,
+                         technology='python', created_at=datetime.utcnow() - timedelta(days=age_days))
+    record_version(test_case)
+    db.session.add(test_case)
+    index_source(test_case, SOURCE)
+    db.session.commit()
+    return test_case
+
+def test_purge_deletes_expired_rows_in_batches(app, sample_user, sample_repository, tmp_path):
+    """Test expired test cases, their fingerprints and unshared blobs go, after being archived"""
+    with app.app_context():
+        for i in range(5):
+            _test_case(sample_user.id, sample_repository.id, f'src/m{i}.py', f'def test_{i}(): pass', 40)
+        _test_case(sample_user.id, sample_repository.id, 'src/shared.py', 'def test_shared(): pass', 40)
+        kept = _test_case(sample_user.id, sample_repository.id, 'src/shared.py', 'def test_shared(): pass', 1)
+
+        result = purge_expired('test-cases', datetime.utcnow() - timedelta(days=30), batch_size=2,
+                               archive_dir=str(tmp_path), pause=0)
+
+        assert (result['deleted'], result['batches']) == (6, 3)
+        assert [row.id for row in TestCase.query.all()] == [kept.id]
+        assert db.session.get(TestCase, kept.id).previous_version_id is None
+        assert SourceFingerprint.query.count() == 1 and SourceFingerprintBand.query.count() > 0
+        # Only the blob the surviving version still uses is left
+        assert [blob.hash for blob in ContentBlob.query.all()] == [kept.test_content_hash]
+
+        with gzip.open(result['archive'], 'rt') as archive:
+            rows = [json.loads(line) for line in archive]
+    assert [row['file_path'] for row in rows] == [f'src/m{i}.py' for i in range(5)] + ['src/shared.py']
+    assert rows[0]['test_content'] == 'def test_0(): pass' and rows[0]['user_id'] == sample_user.id
+
+def test_purge_analyses_removes_findings(app, sample_user, sample_repository):
+    """Test expired analyses are deleted with their findings and newer ones are kept"""
+    with app.app_context():
+        for age_days in (60, 5):
+            analysis = CodeAnalysis(user_id=sample_user.id, repository_id=sample_repository.id, file_path='a.py',
+                                    analysis_type='vulnerability', original_code=SOURCE, analysis_result='report',
+                                    created_at=datetime.utcnow() - timedelta(days=age_days))
+            analysis.findings.append(VulnerabilityFinding(user_id=sample_user.id, severity='high', title='x'))
+            db.session.add(analysis)
+        db.session.commit()
+
+        result = purge_expired('analyses', datetime.utcnow() - timedelta(days=30), pause=0)
+
+        assert result == {'deleted': 1, 'batches': 1, 'longest_batch_seconds': result['longest_batch_seconds'],
+                          'archive': None}
+        assert CodeAnalysis.query.count() == 1 and VulnerabilityFinding.query.count() == 1
+        assert CodeAnalysis.query.one().original_code == SOURCE
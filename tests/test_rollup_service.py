@@ -0,0 +1,72 @@
+import pytest
+from datetime import datetime, timedelta
+from app import db
+from models import ActivityRollup, TestCase
+from rollup_service import (
+    bucket_start, bucket_starts, record_activity, activity_series, compact_rollups, rebuild_rollups
+)
+
+def test_bucket_boundaries():
+    """Test bucket starts for each granularity, including year rollover"""
+    when = datetime(2024, 12, 31, 23, 45, 10)
+    assert bucket_start('hour', when) == datetime(2024, 12, 31, 23)
+    assert bucket_start('day', when) == datetime(2024, 12, 31)
+    assert bucket_start('month', when) == datetime(2024, 12, 1)
+    assert bucket_starts('month', when, datetime(2025, 2, 3)) == [
+        datetime(2024, 12, 1), datetime(2025, 1, 1), datetime(2025, 2, 1)
+    ]
+
+def test_range_is_bounded():
+    """Test oversized ranges are rejected instead of scanned"""
+    with pytest.raises(ValueError):
+        bucket_starts('hour', datetime(2020, 1, 1), datetime(2024, 1, 1))
+
+def test_record_activity_writes_every_tier(app, sample_user):
+    """Test one event increments its hour, day and month buckets"""
+    when = datetime(2024, 5, 14, 9, 30)
+    with app.app_context():
+        record_activity(sample_user.id, {'test_cases': 1}, when)
+        record_activity(sample_user.id, {'test_cases': 2, 'commits': 1}, when + timedelta(hours=2))
+        db.session.commit()
+
+        hours = activity_series(sample_user.id, 'hour', datetime(2024, 5, 14, 9), datetime(2024, 5, 14, 11))
+        assert [bucket['test_cases'] for bucket in hours] == [1, 0, 2]
+        assert hours[0]['start'] == '2024-05-14T09:00:00'
+
+        months = activity_series(sample_user.id, 'month', datetime(2024, 4, 1), datetime(2024, 5, 31), ['test_cases'])
+        assert months == [
+            {'start': '2024-04-01T00:00:00', 'test_cases': 0},
+            {'start': '2024-05-01T00:00:00', 'test_cases': 3},
+        ]
+
+def test_compaction_keeps_coarser_totals(app, sample_user):
+    """Test retention drops expired hourly buckets but not the day totals"""
+    now = datetime(2024, 5, 31, 12)
+    old = now - timedelta(days=10)
+    with app.app_context():
+        record_activity(sample_user.id, {'analyses': 4}, old)
+        record_activity(sample_user.id, {'analyses': 1}, now)
+        db.session.commit()
+
+        assert compact_rollups(now) == 1
+        assert ActivityRollup.query.filter_by(granularity='hour').count() == 1
+        days = activity_series(sample_user.id, 'day', old, now, ['analyses'])
+        assert days[0]['analyses'] == 4
+        assert days[-1]['analyses'] == 1
+
+def test_rebuild_recounts_source_rows(app, sample_user, sample_repository):
+    """Test reconciliation replaces drifted rollups with real counts"""
+    now = datetime(2024, 5, 31, 12)
+    with app.app_context():
+        record_activity(sample_user.id, {'test_cases': 5}, now)
+        db.session.add(TestCase(
+            user_id=sample_user.id, repository_id=sample_repository.id, file_path='a.py',
+            test_content='', technology='python', created_at=now
+        ))
+        db.session.commit()
+
+        rebuild_rollups(sample_user.id, now=now)
+        db.session.commit()
+        for granularity in ('hour', 'day', 'month'):
+            series = activity_series(sample_user.id, granularity, now, now, ['test_cases'])
+            assert series[0]['test_cases'] == 1
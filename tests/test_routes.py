@@ -54,3 +54,77 @@ def test_github_callback_no_code(client):
     response = client.get('/auth/github/callback')
     assert response.status_code == 302
     assert '/' in response.location
+
+def test_analytics_etag_and_invalidation(client, app, sample_user, monkeypatch):
+    """Test idle analytics polls get 304 and recorded writes invalidate them"""
+    import cache_service
+    from app import db
+    from analytics_service import record_test_generated
+    monkeypatch.setattr(cache_service, '_cache', cache_service.MemoryCache())
+    
+    with client.session_transaction() as sess:
+        sess['access_token'] = 'test_token'
+        sess['user_id'] = sample_user.id
+    
+    # The first read builds the counters, so only the second is cacheable
+    client.get('/api/analytics')
+    response = client.get('/api/analytics')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    
+    response = client.get('/api/analytics', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    
+    with app.app_context():
+        record_test_generated(sample_user.id, 'python', 8.0)
+        db.session.commit()
+    
+    response = client.get('/api/analytics', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['total_files_generated'] == 1
+
+def test_event_stream_resumes_from_last_event_id(client, sample_user, monkeypatch):
+    """Test the event stream requires a session and replays after Last-Event-ID"""
+    import event_service
+    broker = event_service.MemoryBroker()
+    monkeypatch.setattr(event_service, '_broker', broker)
+    
+    assert client.get('/api/events').status_code == 401
+    
+    with client.session_transaction() as sess:
+        sess['access_token'] = 'test_token'
+        sess['user_id'] = sample_user.id
+    
+    first = broker.publish(sample_user.id, 'task', {'state': 'PROGRESS'})
+    second = broker.publish(sample_user.id, 'task', {'state': 'SUCCESS'})
+    
+    response = client.get('/api/events', headers={'Last-Event-ID': first})
+    assert response.mimetype == 'text/event-stream'
+    chunks = response.iter_encoded()
+    assert next(chunks).startswith(b'retry:')
+    assert next(chunks) == f'id: {second}\nevent: task\ndata: {{"state": "SUCCESS"}}\n\n'.encode()
+    response.close()
+
+def test_health_endpoints(client):
+    """Test liveness and readiness checks respond without a session"""
+    assert client.get('/healthz').get_json() == {'status': 'ok'}
+    response = client.get('/readyz')
+    assert response.status_code == 200
+    assert response.get_json() == {'status': 'ok'}
+
+def test_export_endpoint_validates_before_streaming(client, sample_user):
+    """Test export parameters are rejected with 400 and valid ones stream a download"""
+    with client.session_transaction() as sess:
+        sess['access_token'] = 'test_token'
+        sess['user_id'] = sample_user.id
+    
+    assert client.get('/api/export/test-cases?columns=id,secret').status_code == 400
+    assert client.get('/api/export/test-cases?format=xml').status_code == 400
+    assert client.get('/api/export/users').status_code == 404
+    
+    response = client.get('/api/export/analyses?format=csv&columns=id,file_path')
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == 'attachment; filename=analyses.csv'
+    assert response.data == b'id,file_path\r\n'
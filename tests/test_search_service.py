@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from app import db
+from models import CodeAnalysis, TestCase, User
+from retention_service import purge_expired
+from search_service import reindex, search
+from version_service import record_version
+
+def _test_case(user_id, repository_id, path, content, age_days=0):
+    test_case = TestCase(user_id=user_id, repository_id=repository_id, file_path=path, test_content=content,
+                         technology='python', created_at=datetime.utcnow() - timedelta(days=age_days))
+    record_version(test_case)
+    db.session.add(test_case)
+    db.session.commit()
+    return test_case
+
+def _analysis(user_id, repository_id, path, result):
+    analysis = CodeAnalysis(user_id=user_id, repository_id=repository_id, file_path=path,
+                            analysis_type='vulnerability', original_code='x = 1', analysis_result=result)
+    db.session.add(analysis)
+    db.session.commit()
+    return analysis
+
+def test_search_ranks_path_matches_and_marks_snippets(app, sample_user, sample_repository):
+    """Test every term must match, path matches rank first and snippets are escaped with marks"""
+    with app.app_context():
+        body = _test_case(sample_user.id, sample_repository.id, 'src/views.py',
+                          'def test_checkout():\n    assert render("<b>") and checkout_total() == 10\n')
+        path = _test_case(sample_user.id, sample_repository.id, 'src/checkout.py', 'def test_total(): pass')
+        _test_case(sample_user.id, sample_repository.id, 'src/other.py', 'def test_login(): pass')
+        analysis = _analysis(sample_user.id, sample_repository.id, 'src/pay.py', 'SQL injection in checkout query')
+
+        results, cursor = search(sample_user.id, 'checkout')
+        assert [(r['type'], r['id']) for r in results] == [
+            ('test-case', path.id), ('analysis', analysis.id), ('test-case', body.id)
+        ]
+        assert results[0]['score'] > results[1]['score'] and cursor is None
+        snippet = next(r['snippet'] for r in results if r['id'] == body.id and r['type'] == 'test-case')
+        assert '<mark>checkout</mark>' in snippet and '&lt;b&gt;' in snippet
+
+        assert [r['id'] for r in search(sample_user.id, 'checkout injection')[0]] == [analysis.id]
+        assert [r['id'] for r in search(sample_user.id, 'check*', kinds=('analyses',))[0]] == [analysis.id]
+        assert search(sample_user.id, 'logout')[0] == []
+
+def test_search_pages_with_keyset_cursor_and_isolates_users(app, sample_user, sample_repository):
+    """Test pages follow each other without repeats and other users' rows never match"""
+    with app.app_context():
+        for i in range(5):
+            _test_case(sample_user.id, sample_repository.id, f'src/m{i}.py', 'def test_parser(): ' + 'parse() ' * i)
+        other = User(github_id='other', username='other', access_token='t')
+        db.session.add(other)
+        db.session.commit()
+        _test_case(other.id, sample_repository.id, 'src/parser.py', 'def test_parser(): pass')
+
+        first, cursor = search(sample_user.id, 'parser', limit=2)
+        second, cursor = search(sample_user.id, 'parser', limit=2, cursor=cursor)
+        third, cursor = search(sample_user.id, 'parser', limit=2, cursor=cursor)
+        ids = [r['id'] for r in first + second + third]
+        assert len(ids) == 5 and len(set(ids)) == 5 and cursor is None
+
+def test_index_follows_updates_deletes_and_retention(app, sample_user, sample_repository):
+    """Test the index is maintained on write, on bulk retention deletes and by reindex"""
+    with app.app_context():
+        test_case = _test_case(sample_user.id, sample_repository.id, 'src/a.py', 'def test_alpha(): pass', 40)
+        test_case.test_content = 'def test_beta(): pass'
+        db.session.commit()
+        assert search(sample_user.id, 'test_alpha')[0] == []
+        assert [r['id'] for r in search(sample_user.id, 'test_beta')[0]] == [test_case.id]
+
+        purge_expired('test-cases', datetime.utcnow() - timedelta(days=30), pause=0)
+        db.session.expunge_all()
+        assert db.session.execute(text('SELECT count(*) FROM search_index')).scalar() == 0
+
+        analysis = _analysis(sample_user.id, sample_repository.id, 'src/b.py', 'Hardcoded secret')
+        db.session.delete(analysis)
+        db.session.commit()
+        assert search(sample_user.id, 'secret')[0] == []
+
+        kept = _test_case(sample_user.id, sample_repository.id, 'src/c.py', 'def test_gamma(): pass')
+        db.session.execute(text('DELETE FROM search_index'))
+        assert reindex('test-cases') == 0
+        assert [r['id'] for r in search(sample_user.id, 'gamma')[0]] == [kept.id]
+
+def test_search_api(client, app, sample_user, sample_repository):
+    """Test the search endpoint validates its input and returns ranked hits"""
+    with app.app_context():
+        _test_case(sample_user.id, sample_repository.id, 'src/a.py', 'def test_widget(): pass')
+    with client.session_transaction() as sess:
+        sess['access_token'] = 'test_token'
+        sess['user_id'] = sample_user.id
+
+    response = client.get('/api/search?q=widget')
+    assert response.status_code == 200
+    assert response.json['results'][0]['file_path'] == 'src/a.py' and response.json['has_more'] is False
+    assert client.get('/api/search?q=%20').status_code == 400
+    assert client.get('/api/search?q=widget&type=commits').status_code == 400
+    assert client.get('/api/search?q=widget&cursor=bogus').status_code == 400
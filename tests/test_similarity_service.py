@@ -0,0 +1,163 @@
+import pytest
+import generation_service
+import similarity_service
+from app import db
+from models import Repository, TestCase
+from similarity_service import (
+    normalize_source,
+    content_hash,
+    minhash_signature,
+    band_buckets,
+    estimate_similarity,
+    index_source,
+    find_similar_test_case,
+    NUM_BANDS,
+    NUM_PERMUTATIONS,
+)
+
+UTILS = '''
+def slugify(value):
+    """Turn a title into a URL slug."""
+    value = value.strip().lower()
+    return "-".join(part for part in value.split() if part)
+
+
+def chunk(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def flatten(nested):
+    return [item for group in nested for item in group]
+
+
+def clamp(value, low, high):
+    return max(low, min(high, value))
+'''
+
+def test_normalize_ignores_comments_and_whitespace():
+    """Test formatting-only differences normalize to the same tokens"""
+    assert normalize_source("x = 1  # one\n") == normalize_source("x=1")
+    assert content_hash("a = 1 // note") == content_hash("a   =   1")
+
+def test_signature_shape_is_stable():
+    """Test signatures are deterministic and fully banded"""
+    signature = minhash_signature(UTILS)
+    assert len(signature) == NUM_PERMUTATIONS
+    assert signature == minhash_signature(UTILS)
+    assert len(band_buckets(signature)) == NUM_BANDS
+
+def test_near_duplicates_score_higher_than_unrelated_code():
+    """Test similarity estimate separates forks from unrelated files"""
+    fork = UTILS.replace('def clamp(value, low, high):', 'def clamp(value, low=0, high=1):')
+    unrelated = "class Parser:\n    def parse(self, text):\n        return text.split(',')\n"
+
+    original = minhash_signature(UTILS)
+    assert estimate_similarity(original, minhash_signature(fork)) > 0.8
+    assert estimate_similarity(original, minhash_signature(unrelated)) < 0.2
+
+def test_find_similar_test_case(app, sample_user, sample_repository):
+    """Test indexed sources are found for exact and near-duplicate files"""
+    with app.app_context():
+        test_case = TestCase(
+            user_id=sample_user.id,
+            repository_id=sample_repository.id,
+            file_path="utils.py",
+            test_content="def test_slugify(): pass",
+            technology="python"
+        )
+        db.session.add(test_case)
+        index_source(test_case, UTILS)
+        db.session.commit()
+
+        exact = find_similar_test_case(sample_user.id, UTILS.replace("    ", "\t"))
+        assert exact[0].id == test_case.id
+        assert exact[1] == 1.0
+
+        fork = UTILS + "\n\ndef identity(value):\n    return value\n"
+        match = find_similar_test_case(sample_user.id, fork, threshold=0.8)
+        assert match[0].id == test_case.id
+        assert 0.8 <= match[1] < 1.0
+
+        assert find_similar_test_case(sample_user.id, "print('hello world')") is None
+
+
+def _indexed_case(user, repository, file_path, source, technology="python"):
+    test_case = TestCase(
+        user_id=user.id,
+        repository_id=repository.id,
+        file_path=file_path,
+        test_content=f"# tests for {file_path}",
+        technology=technology
+    )
+    db.session.add(test_case)
+    index_source(test_case, source)
+    db.session.commit()
+    return test_case
+
+
+def test_find_similar_keeps_candidates_sharing_most_bands(app, sample_user, sample_repository, monkeypatch):
+    """Test the candidate cap drops the fingerprints sharing the fewest bands"""
+    monkeypatch.setattr(similarity_service, "MAX_CANDIDATES", 1)
+    with app.app_context():
+        _indexed_case(sample_user, sample_repository, "helpers.py",
+                      UTILS.replace("def clamp(value, low, high):\n    return max(low, min(high, value))", ""))
+        closest = _indexed_case(sample_user, sample_repository, "utils.py", UTILS)
+
+        fork = UTILS + "\n\ndef identity(value):\n    return value\n"
+        match = find_similar_test_case(sample_user.id, fork, threshold=0.5)
+        assert match[0].id == closest.id
+
+
+def test_find_similar_filters_on_technology(app, sample_user, sample_repository):
+    """Test suites generated for another technology are never offered"""
+    with app.app_context():
+        pytest_case = _indexed_case(sample_user, sample_repository, "utils.py", UTILS)
+        _indexed_case(sample_user, sample_repository, "utils_copy.py", UTILS, technology="unittest")
+
+        assert find_similar_test_case(sample_user.id, UTILS, technology="python")[0].id == pytest_case.id
+        assert find_similar_test_case(sample_user.id, UTILS, technology="jest") is None
+        fork = UTILS + "\n\ndef identity(value):\n    return value\n"
+        assert find_similar_test_case(sample_user.id, fork, threshold=0.8, technology="jest") is None
+
+
+class _AdaptingGroq:
+    def __init__(self):
+        self.adapted = []
+
+    def adapt_test_cases(self, test_content, file_content, file_path, technology):
+        self.adapted.append(file_path)
+        return "# adapted tests"
+
+
+def test_full_similarity_estimate_is_adapted_unless_source_is_identical(app, sample_user, sample_repository,
+                                                                         monkeypatch):
+    """Test only an identical source at the same path reuses a suite verbatim; anything else is adapted"""
+    with app.app_context():
+        indexed = _indexed_case(sample_user, sample_repository, "utils.py", UTILS)
+        fork = Repository(github_id="67891", user_id=sample_user.id, name="test-repo-fork",
+                          full_name="testuser/test-repo-fork", clone_url="c", html_url="h")
+        db.session.add(fork)
+        db.session.commit()
+        groq = _AdaptingGroq()
+
+        reused = generation_service.generate_for_file(
+            groq, sample_user.id, fork.id, "utils.py", UTILS, "python", []
+        )
+        assert reused["mode"] == "reused"
+        assert reused["test_content"] == indexed.test_content
+
+        moved = generation_service.generate_for_file(
+            groq, sample_user.id, fork.id, "lib/text.py", UTILS, "python", []
+        )
+        assert moved["mode"] == "adapted"
+        assert moved["test_content"] == "# adapted tests"
+
+        monkeypatch.setattr(generation_service, "find_similar_by_fingerprint",
+                            lambda *args, **kwargs: (indexed, 1.0))
+        edited = UTILS.replace("lower()", "upper()")
+        adapted = generation_service.generate_for_file(
+            groq, sample_user.id, fork.id, "utils.py", edited, "python", []
+        )
+        assert adapted["mode"] == "adapted"
+        assert groq.adapted == ["lib/text.py", "utils.py"]
@@ -0,0 +1,55 @@
+import pytest
+import cache_service
+import summary_service
+from app import db
+from models import TestCase
+from summary_service import get_usage_stats, refresh_usage_stats, USAGE_CACHE_KEY
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    """Run background refreshes to completion and record them"""
+    monkeypatch.setattr(cache_service, '_cache', cache_service.MemoryCache())
+    threads = []
+    refresh = summary_service._refresh_in_background
+
+    def run_and_wait():
+        thread = refresh()
+        thread.join()
+        threads.append(thread)
+        return thread
+
+    monkeypatch.setattr(summary_service, '_refresh_in_background', run_and_wait)
+    return threads
+
+def test_usage_stats_counts(app, sample_user, sample_repository):
+    """Test the snapshot counts rows and finds the latest activity"""
+    with app.app_context():
+        db.session.add(TestCase(user_id=sample_user.id, repository_id=sample_repository.id,
+                                file_path='a.py', test_content='', technology='python'))
+        db.session.commit()
+        stats = refresh_usage_stats()
+        assert stats['total_repositories'] == 1
+        assert stats['total_test_cases'] == 1
+        assert stats['total_code_analyses'] == 0
+        assert stats['last_activity'] is not None
+
+def test_cold_then_stale_snapshot_refreshes_in_background(app, sample_repository, refreshes, monkeypatch):
+    """Test reads never compute inline: cold and stale reads trigger one refresh"""
+    with app.app_context():
+        assert get_usage_stats() is None
+        assert len(refreshes) == 1
+        assert get_usage_stats()['total_repositories'] == 1
+
+        # Fresh snapshots are served without refreshing
+        get_usage_stats()
+        assert len(refreshes) == 1
+
+        # Stale snapshots are still served while a single refresh runs
+        snapshot = cache_service.get_json(USAGE_CACHE_KEY)
+        snapshot['computed_at'] -= summary_service.USAGE_FRESH_SECONDS + 1
+        snapshot['stats']['total_repositories'] = 99
+        cache_service.set_json(USAGE_CACHE_KEY, snapshot)
+        monkeypatch.setattr(summary_service, 'try_lock', lambda key, ttl: len(refreshes) < 2)
+        assert get_usage_stats()['total_repositories'] == 99
+        assert len(refreshes) == 2
+        assert get_usage_stats()['total_repositories'] == 1
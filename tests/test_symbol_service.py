@@ -0,0 +1,183 @@
+import pytest
+from unittest.mock import MagicMock
+from symbol_service import (
+    MODULE_SYMBOL,
+    extract_symbols,
+    diff_symbols,
+    extract_symbol_sources,
+    merge_test_suites,
+    generate_tests_incrementally,
+)
+
+SOURCE = '''import math
+
+
+def area(radius):
+    return math.pi * radius ** 2
+
+
+class Account:
+    rate = 0.1
+
+    def deposit(self, amount):
+        self.balance += amount
+
+    def interest(self):
+        return self.balance * self.rate
+'''
+
+def test_extract_symbols_covers_functions_classes_and_methods():
+    """Test every definition gets its own hash"""
+    symbols = extract_symbols(SOURCE)
+    assert set(symbols) == {MODULE_SYMBOL, 'area', 'Account', 'Account.deposit', 'Account.interest'}
+
+def test_extract_symbols_ignores_formatting_and_comments():
+    """Test hashes are structural rather than textual"""
+    reformatted = SOURCE.replace('return math.pi * radius ** 2', 'return math.pi * (radius ** 2)  # area')
+    assert extract_symbols(SOURCE) == extract_symbols(reformatted)
+
+def test_extract_symbols_invalid_source():
+    """Test unparsable source returns None"""
+    assert extract_symbols('def broken(:') is None
+
+def test_method_change_only_marks_method():
+    """Test editing a method does not mark its class as changed"""
+    edited = SOURCE.replace('self.balance += amount', 'self.balance += abs(amount)')
+    changed, added, removed = diff_symbols(extract_symbols(SOURCE), extract_symbols(edited))
+    assert changed == ['Account.deposit']
+    assert added == []
+    assert removed == []
+
+def test_extract_symbol_sources_keeps_imports_and_class_header():
+    """Test reduced source includes imports and the owning class"""
+    reduced = extract_symbol_sources(SOURCE, ['Account.deposit'])
+    assert 'import math' in reduced
+    assert 'class Account:' in reduced
+    assert 'def deposit' in reduced
+    assert 'def interest' not in reduced
+    assert 'def area' not in reduced
+
+def test_merge_replaces_and_appends_tests():
+    """Test merged suite replaces same-named tests and adds new ones"""
+    existing = "```python\nimport pytest\n\n\ndef test_area():\n    assert False\n\n\ndef test_other():\n    pass\n```"
+    generated = "import math\n\n\ndef test_area():\n    assert True\n\n\ndef test_deposit():\n    pass\n"
+    merged = merge_test_suites(existing, generated)
+    assert 'import math' in merged
+    assert 'assert False' not in merged
+    assert 'assert True' in merged
+    assert 'def test_other' in merged
+    assert 'def test_deposit' in merged
+    compile(merged, 'merged.py', 'exec')
+
+def test_incremental_generation_sends_only_changed_symbols():
+    """Test only changed symbols reach the model"""
+    previous = MagicMock()
+    previous.symbol_hashes = extract_symbols(SOURCE)
+    previous.test_content = "def test_area():\n    pass\n"
+    groq_service = MagicMock()
+    groq_service.generate_test_cases.return_value = "def test_deposit():\n    pass\n"
+
+    edited = SOURCE.replace('self.balance += amount', 'self.balance += abs(amount)')
+    content, hashes, mode = generate_tests_incrementally(
+        groq_service, previous, edited, 'bank.py', 'python', []
+    )
+
+    assert mode == 'incremental'
+    sent_source = groq_service.generate_test_cases.call_args[0][0]
+    assert 'def deposit' in sent_source
+    assert 'def area' not in sent_source
+    assert groq_service.generate_test_cases.call_args[1]['target_symbols'] == ['Account.deposit']
+    assert 'def test_area' in content and 'def test_deposit' in content
+    assert hashes == extract_symbols(edited)
+
+def test_unchanged_source_skips_generation():
+    """Test identical source reuses the previous suite"""
+    previous = MagicMock()
+    previous.symbol_hashes = extract_symbols(SOURCE)
+    previous.test_content = "def test_area():\n    pass\n"
+    groq_service = MagicMock()
+
+    content, _, mode = generate_tests_incrementally(groq_service, previous, SOURCE, 'bank.py', 'python', [])
+
+    assert mode == 'unchanged'
+    assert content == previous.test_content
+    groq_service.generate_test_cases.assert_not_called()
+
+def test_module_change_triggers_full_generation():
+    """Test import changes regenerate the whole suite"""
+    previous = MagicMock()
+    previous.symbol_hashes = extract_symbols(SOURCE)
+    groq_service = MagicMock()
+    groq_service.generate_test_cases.return_value = "full"
+
+    edited = 'import os\n' + SOURCE
+    content, _, mode = generate_tests_incrementally(groq_service, previous, edited, 'bank.py', 'python', [])
+
+    assert mode == 'full'
+    assert content == 'full'
+
+def test_removed_function_drops_its_tests_and_imports():
+    """Test tests and imports of a deleted function are dropped without calling the model"""
+    previous = MagicMock()
+    previous.symbol_hashes = extract_symbols(SOURCE)
+    previous.test_content = (
+        "from bank import Account, area\n\n\n"
+        "def test_area():\n    assert area(1) > 3\n\n\n"
+        "class TestAccount:\n"
+        "    def test_deposit(self):\n        account = Account()\n        account.deposit(1)\n\n"
+        "    def test_interest(self):\n        assert Account().interest() == 0\n"
+    )
+    groq_service = MagicMock()
+
+    edited = SOURCE.replace('def area(radius):\n    return math.pi * radius ** 2\n', '')
+    content, hashes, mode = generate_tests_incrementally(groq_service, previous, edited, 'bank.py', 'python', [])
+
+    assert mode == 'incremental'
+    groq_service.generate_test_cases.assert_not_called()
+    assert 'area' not in content
+    assert 'from bank import Account\n' in content
+    assert 'def test_deposit' in content and 'def test_interest' in content
+    compile(content, 'merged.py', 'exec')
+    assert hashes == extract_symbols(edited)
+
+def test_removed_method_drops_only_tests_calling_it():
+    """Test a deleted method removes the tests calling it while new tests are merged"""
+    existing = (
+        "from bank import Account\n\n\n"
+        "class TestAccount:\n"
+        "    def test_deposit(self):\n        Account().deposit(1)\n\n"
+        "    def test_interest(self):\n        assert Account().interest() == 0\n\n\n"
+        "def test_deposit_twice():\n    Account().deposit(2)\n"
+    )
+    generated = "import pytest\n\n\ndef test_withdraw():\n    Account().withdraw(1)\n"
+
+    merged = merge_test_suites(existing, generated, removed=['Account.deposit'])
+
+    assert 'deposit' not in merged
+    assert 'def test_interest' in merged and 'def test_withdraw' in merged
+    assert merged.index('import pytest') < merged.index('class TestAccount')
+    compile(merged, 'merged.py', 'exec')
+
+def test_changed_symbol_drops_tests_the_regeneration_renamed():
+    """Test a changed function's old test goes even when its regenerated test has a new name"""
+    previous = MagicMock()
+    previous.symbol_hashes = extract_symbols(SOURCE)
+    previous.test_content = (
+        "from bank import Account, area\n\n\n"
+        "def test_area():\n    assert area(1) > 3\n\n\n"
+        "def test_interest():\n    assert Account().interest() == 0\n"
+    )
+    groq_service = MagicMock()
+    groq_service.generate_test_cases.return_value = (
+        "from bank import area\n\n\ndef test_area_rejects_negative_radius():\n    assert area(-1) == 0\n"
+    )
+
+    edited = SOURCE.replace('return math.pi * radius ** 2', 'return math.pi * max(radius, 0) ** 2')
+    content, _, mode = generate_tests_incrementally(groq_service, previous, edited, 'bank.py', 'python', [])
+
+    assert mode == 'incremental'
+    assert 'def test_area():' not in content
+    assert 'def test_area_rejects_negative_radius' in content
+    assert 'def test_interest' in content
+    assert 'from bank import Account, area\n' in content
+    compile(content, 'merged.py', 'exec')
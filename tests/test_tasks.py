@@ -0,0 +1,25 @@
+from app import db
+from celery_app import reset_engine_pools
+from models import Analytics
+from tasks import update_user_analytics
+
+
+def test_task_runs_in_worker_app_context(app, sample_user):
+    """Tasks run inside the worker's app without building one per call"""
+    result = update_user_analytics.apply(args=(sample_user.id,))
+
+    assert result.successful()
+    # The task committed in its own context and session
+    assert Analytics.query.filter_by(user_id=sample_user.id).one().reconciled_at is not None
+
+
+def test_reset_engine_pools_leaves_inherited_connections_open(app):
+    """After fork the child gets a fresh pool without closing the parent's connections"""
+    inherited = db.engine.connect()
+    old_pool = db.engine.pool
+
+    reset_engine_pools()
+
+    assert db.engine.pool is not old_pool
+    assert inherited.exec_driver_sql('SELECT 1').scalar() == 1
+    inherited.close()
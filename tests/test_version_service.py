@@ -0,0 +1,84 @@
+import json
+from datetime import datetime, timedelta
+from app import db
+from models import ContentBlob, TestCase
+from export_service import export_stream
+from version_service import SNAPSHOT_INTERVAL, apply_delta, encode_delta, record_version, version_history
+
+def _suite(version):
+    """A suite where each version changes one test and adds another"""
+    tests = [f"def test_case_{i}():\n    assert compute({i}) == {i * 2}\n" for i in range(30)]
+    tests[version % 30] = f"def test_case_{version % 30}():\n    assert compute({version}) is not None\n"
+    tests += [f"def test_added_{i}():\n    assert True\n" for i in range(version)]
+    return 'import pytest\n\n' + '\n'.join(tests)
+
+def _add_versions(user_id, repository_id, count):
+    started = datetime.utcnow()
+    for version in range(1, count + 1):
+        test_case = TestCase(user_id=user_id, repository_id=repository_id, file_path='src/calc.py',
+                             test_content=_suite(version), technology='python',
+                             created_at=started + timedelta(seconds=version))
+        record_version(test_case)
+        db.session.add(test_case)
+        db.session.commit()
+    db.session.expunge_all()
+    return TestCase.query.order_by(TestCase.version).all()
+
+def test_delta_round_trip():
+    """Test a delta rebuilds the older text exactly, trailing newline or not"""
+    new = "a\nb\nc\nd\n"
+    for old in ("a\nc\nx\nd\n", "b\nc", "", "a\nb\nc\nd\n"):
+        assert apply_delta(new, encode_delta(new, old)) == old
+
+def test_older_versions_become_deltas_except_snapshots(app, sample_user, sample_repository):
+    """Test reverse deltas replace old copies and every version still reads back"""
+    with app.app_context():
+        versions = _add_versions(sample_user.id, sample_repository.id, SNAPSHOT_INTERVAL + 2)
+
+        assert [version.version for version in versions] == list(range(1, SNAPSHOT_INTERVAL + 3))
+        for version in versions[:-1]:
+            assert version.test_content_delta is not None or version.version % SNAPSHOT_INTERVAL == 0
+        # The newest version and the snapshot keep their full text
+        assert versions[-1].test_content_hash and versions[SNAPSHOT_INTERVAL - 1].test_content_hash
+        assert versions[0].test_content_hash is None and versions[0].delta_base_id == versions[1].id
+        assert versions[1].previous_version_id == versions[0].id
+
+        assert [version.test_content for version in versions] == [
+            _suite(number) for number in range(1, SNAPSHOT_INTERVAL + 3)
+        ]
+
+        # Full copies replaced by deltas are deleted, not orphaned
+        referenced = {version.test_content_hash for version in versions if version.test_content_hash}
+        assert len(referenced) == 2
+        assert db.session.query(ContentBlob).count() == len(referenced)
+
+def test_version_history_and_diff_routes(client, app, sample_user, sample_repository):
+    """Test the history lists every version and diffs default to the previous one"""
+    with app.app_context():
+        versions = _add_versions(sample_user.id, sample_repository.id, 3)
+        ids = [version.id for version in versions]
+        history = version_history(versions[0])
+    assert [entry['id'] for entry in history] == ids[::-1]
+    assert [entry['storage'] for entry in history] == ['full', 'delta', 'delta']
+
+    with client.session_transaction() as sess:
+        sess['access_token'] = 'test_token'
+        sess['user_id'] = sample_user.id
+
+    response = client.get(f'/api/test-cases/{ids[2]}/diff')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['from_id'], body['to_id']) == (ids[1], ids[2])
+    assert '+def test_added_2():' in body['diff']
+
+    response = client.get(f'/api/test-cases/{ids[0]}/diff?against={ids[2]}')
+    assert response.get_json()['from_id'] == ids[0]
+    assert client.get(f'/api/test-cases/{ids[0]}/diff').status_code == 404
+    assert client.get(f'/api/test-cases/{ids[2]}/versions').get_json()['versions'] == history
+
+def test_export_rebuilds_delta_versions(app, sample_user, sample_repository):
+    """Test exports return the full text of versions stored as deltas"""
+    with app.app_context():
+        _add_versions(sample_user.id, sample_repository.id, 3)
+        body = ''.join(export_stream('test-cases', sample_user.id, 'ndjson', ['test_content']))
+    assert [json.loads(line)['test_content'] for line in body.splitlines()] == [_suite(v) for v in (1, 2, 3)]
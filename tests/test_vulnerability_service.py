@@ -0,0 +1,73 @@
+import pytest
+from app import db
+from models import CodeAnalysis
+from vulnerability_service import extract_findings, max_severity, attach_findings, severity_counts, backfill_findings
+
+def test_json_block_is_parsed_and_stripped():
+    """Test structured findings are read from the trailing JSON block"""
+    report = (
+        "# Security Analysis Report\n\nSQL injection in the login handler.\n\n"
+        "```json\n"
+        '{"findings": [{"severity": "High", "title": "SQL injection", "location": "app.py:12"},'
+        ' {"severity": "bogus", "title": "ignored"}]}\n'
+        "```\n"
+    )
+    findings, display_report = extract_findings(report)
+    assert findings == [{'severity': 'high', 'title': 'SQL injection', 'location': 'app.py:12'}]
+    assert '```json' not in display_report
+    assert display_report.endswith('SQL injection in the login handler.')
+
+def test_markdown_fallback_reads_severity_fields():
+    """Test reports without a JSON block fall back to the severity lines"""
+    report = (
+        "### 1. Hardcoded credentials\n"
+        "- **Severity:** 🔴 Critical\n"
+        "- **Location:** `config.py:3`\n"
+        "### 2. Verbose errors\n"
+        "- **Severity:** Low\n"
+    )
+    findings, display_report = extract_findings(report)
+    assert display_report == report
+    assert [finding['severity'] for finding in findings] == ['critical', 'low']
+    assert findings[0]['title'] == 'Hardcoded credentials'
+    assert findings[0]['location'] == 'config.py:3'
+    assert max_severity(findings) == 'critical'
+
+def test_mentioning_a_severity_word_is_not_a_finding():
+    """Test prose that merely mentions severities is not miscounted"""
+    report = "No issues found. Nothing critical here; follow the low-risk practices below."
+    findings, _ = extract_findings(report)
+    assert findings == []
+    assert max_severity(findings) == 'none'
+
+def test_overall_risk_level_is_not_a_finding():
+    """Test the summary risk level alone does not count as a finding"""
+    report = "## Summary\n- **Overall Risk Level:** High\n\nThe handler looks risky but no issue was confirmed."
+    findings, _ = extract_findings(report)
+    assert findings == []
+    assert max_severity(findings) == 'none'
+
+def test_empty_json_findings_means_clean():
+    """Test an explicit empty findings list wins over prose"""
+    report = "**Overall Risk Level:** High\n```json\n{\"findings\": []}\n```"
+    findings, _ = extract_findings(report)
+    assert findings == []
+
+def test_counts_and_backfill(app, sample_user, sample_repository):
+    """Test stored reports are backfilled and counted per severity"""
+    with app.app_context():
+        analysis = CodeAnalysis(
+            user_id=sample_user.id,
+            repository_id=sample_repository.id,
+            file_path='app.py',
+            analysis_type='vulnerability',
+            original_code='',
+            analysis_result="- **Severity:** High\n- **Severity:** Medium\n"
+        )
+        db.session.add(analysis)
+        db.session.commit()
+
+        assert backfill_findings() == 1
+        assert analysis.max_severity == 'high'
+        assert severity_counts(sample_user.id) == {'critical': 0, 'high': 1, 'medium': 1, 'low': 0}
+        assert backfill_findings() == 0
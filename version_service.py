@@ -0,0 +1,141 @@
+import difflib
+import json
+import zlib
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app import db
+from blob_service import COMPRESSION_LEVEL, delete_orphan_blobs
+from generation_service import latest_test_case
+from models import TestCase
+
+# Every this many versions one is kept whole, so rebuilding any version
+# applies fewer than this many deltas
+SNAPSHOT_INTERVAL = 10
+# A delta is only kept when it is smaller than this share of the compressed full text
+MAX_DELTA_RATIO = 0.5
+
+_REPLACED_BLOBS = 'version_replaced_blobs'
+
+
+def encode_delta(base: str, target: str) -> bytes:
+    """Compressed instructions rebuilding ``target`` from the lines of ``base``.
+
+    Runs of lines shared with ``base`` become ``[start, end]`` line ranges;
+    everything else is stored literally.
+    """
+    base_lines, target_lines = base.splitlines(keepends=True), target.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(target_lines[j1:j2]))
+    return zlib.compress(json.dumps(ops, separators=(',', ':')).encode(), COMPRESSION_LEVEL)
+
+
+def apply_delta(base: str, delta: bytes) -> str:
+    base_lines = base.splitlines(keepends=True)
+    return ''.join(
+        ''.join(base_lines[op[0]:op[1]]) if isinstance(op, list) else op
+        for op in json.loads(zlib.decompress(delta))
+    )
+
+
+def reconstruct_content(test_case: TestCase) -> Optional[str]:
+    """Text of a version stored as a delta, or None when it is stored whole.
+
+    Walks ``delta_base`` towards the newest version until one holds its
+    text, then applies the deltas back down; the snapshot policy bounds the
+    walk. Rebuilt text is kept on the instance.
+    """
+    if test_case.test_content_delta is None:
+        return None
+    if '_reconstructed' not in test_case.__dict__:
+        test_case._reconstructed = apply_delta(test_case.delta_base.test_content, test_case.test_content_delta)
+    return test_case._reconstructed
+
+
+def record_version(test_case: TestCase, previous: Optional[TestCase] = None):
+    """Chain a new test case onto the history of its repository file.
+
+    ``previous`` is the current latest version, looked up when not given.
+    It is rewritten as a reverse delta against the new version unless its
+    version number is a snapshot or the delta would save too little. The
+    caller adds ``test_case`` to the session and commits.
+    """
+    if previous is None:
+        with db.session.no_autoflush:
+            previous = latest_test_case(test_case.user_id, test_case.repository_id, test_case.file_path)
+    if previous is None:
+        test_case.version = 1
+        return
+
+    # Rows from before versioning start the numbering
+    if previous.version is None:
+        previous.version = 1
+    test_case.version = previous.version + 1
+    test_case.previous_version = previous
+
+    if previous.version % SNAPSHOT_INTERVAL == 0 or previous.test_content_delta is not None:
+        return
+    old_text, new_text = previous.test_content, test_case.test_content
+    delta = encode_delta(new_text, old_text)
+    if len(delta) >= MAX_DELTA_RATIO * len(zlib.compress(old_text.encode(), COMPRESSION_LEVEL)):
+        return
+
+    # The full copy goes once the flush has stopped referencing it
+    if previous.test_content_blob is not None:
+        db.session.info.setdefault(_REPLACED_BLOBS, set()).add(previous.test_content_blob.hash)
+    previous._reconstructed = old_text
+    previous.test_content_delta = delta
+    previous.delta_base = test_case
+    previous.test_content_blob = None
+    previous.test_content_inline = ''
+
+
+@event.listens_for(Session, 'after_flush')
+def _delete_replaced_blobs(session, flush_context):
+    hashes = session.info.pop(_REPLACED_BLOBS, None)
+    if hashes:
+        delete_orphan_blobs(hashes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_replaced_blobs(session):
+    session.info.pop(_REPLACED_BLOBS, None)
+
+
+def version_history(test_case: TestCase) -> List[Dict[str, Any]]:
+    """All versions of the test case's file, newest first, without their text"""
+    versions = db.session.execute(
+        select(
+            TestCase.id, TestCase.version, TestCase.previous_version_id, TestCase.quality_score,
+            TestCase.status, TestCase.created_at, TestCase.test_content_delta.is_not(None).label('is_delta')
+        )
+        .where(TestCase.repository_id == test_case.repository_id, TestCase.file_path == test_case.file_path)
+        .order_by(TestCase.created_at.desc(), TestCase.id.desc())
+    )
+    return [{
+        'id': version.id,
+        'version': version.version,
+        'previous_version_id': version.previous_version_id,
+        'quality_score': version.quality_score,
+        'status': version.status,
+        'created_at': version.created_at.isoformat(),
+        'storage': 'delta' if version.is_delta else 'full',
+    } for version in versions]
+
+
+def diff_versions(old: TestCase, new: TestCase, context=3) -> str:
+    """Unified diff between two versions of a file's tests"""
+    return ''.join(difflib.unified_diff(
+        old.test_content.splitlines(keepends=True),
+        new.test_content.splitlines(keepends=True),
+        fromfile=f"{old.file_path} (v{old.version or '?'})",
+        tofile=f"{new.file_path} (v{new.version or '?'})",
+        n=context,
+    ))
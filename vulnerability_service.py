@@ -0,0 +1,136 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from app import db
+from models import CodeAnalysis, VulnerabilityFinding
+
+SEVERITIES = ('critical', 'high', 'medium', 'low')
+
+_JSON_BLOCK_RE = re.compile(r"```json\s*(\{.*?\})\s*```", re.DOTALL | re.IGNORECASE)
+_SEVERITY_LINE_RE = re.compile(
+    r"^[\s>*-]*(?:\*\*)?severity(?:\*\*)?\s*:?\s*(?:\*\*)?[^\w\n]*(critical|high|medium|low)\b",
+    re.IGNORECASE | re.MULTILINE,
+)
+_HEADING_RE = re.compile(r"^#{2,5}\s*(?:\d+\.\s*)?(.+?)\s*$", re.MULTILINE)
+_LOCATION_RE = re.compile(r"location(?:\*\*)?\s*:?\s*(?:\*\*)?\s*`?([^`\n]+)`?", re.IGNORECASE)
+
+
+def _normalize_severity(value) -> Optional[str]:
+    severity = str(value or '').strip().lower()
+    return severity if severity in SEVERITIES else None
+
+
+def _findings_from_json(report: str) -> Tuple[Optional[List[Dict[str, Any]]], str]:
+    """Read the structured findings block the prompt asks the model to append.
+
+    Returns ``(findings, report_without_block)``; findings is ``None`` when
+    there is no valid block.
+    """
+    for match in reversed(list(_JSON_BLOCK_RE.finditer(report))):
+        try:
+            payload = json.loads(match.group(1))
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(payload, dict) or not isinstance(payload.get('findings'), list):
+            continue
+
+        findings = []
+        for item in payload['findings']:
+            if not isinstance(item, dict):
+                continue
+            severity = _normalize_severity(item.get('severity'))
+            if severity:
+                findings.append({
+                    'severity': severity,
+                    'title': str(item.get('title') or '')[:300] or None,
+                    'location': str(item.get('location') or '')[:300] or None,
+                })
+        stripped = (report[:match.start()] + report[match.end():]).rstrip()
+        return findings, stripped
+
+    return None, report
+
+
+def _findings_from_markdown(report: str) -> List[Dict[str, Any]]:
+    """Fall back to the ``**Severity:** ...`` lines of the markdown template.
+
+    Only explicit severity fields count, so a report that merely mentions
+    the word "critical" is not miscounted, and the overall risk level is a
+    summary of the findings rather than one of them.
+    """
+    headings = [(match.start(), match.group(1)) for match in _HEADING_RE.finditer(report)]
+    findings = []
+
+    for match in _SEVERITY_LINE_RE.finditer(report):
+        title = next((text for position, text in reversed(headings) if position < match.start()), None)
+        section = report[match.end():match.end() + 300]
+        location = _LOCATION_RE.search(section)
+        findings.append({
+            'severity': match.group(1).lower(),
+            'title': title[:300] if title else None,
+            'location': location.group(1).strip()[:300] if location else None,
+        })
+
+    return findings
+
+
+def extract_findings(report: str) -> Tuple[List[Dict[str, Any]], str]:
+    """Parse a vulnerability report into findings.
+
+    Returns ``(findings, display_report)`` where the machine-readable JSON
+    block, if present, has been removed from the report shown to users.
+    """
+    findings, display_report = _findings_from_json(report)
+    if findings is None:
+        findings = _findings_from_markdown(report)
+    return findings, display_report
+
+
+def max_severity(findings: List[Dict[str, Any]]) -> str:
+    """Highest severity among findings, or ``none``"""
+    for severity in SEVERITIES:
+        if any(finding['severity'] == severity for finding in findings):
+            return severity
+    return 'none'
+
+
+def attach_findings(analysis: CodeAnalysis, findings: List[Dict[str, Any]], source='model'):
+    """Store parsed findings on an analysis; the caller commits"""
+    analysis.max_severity = max_severity(findings)
+    for finding in findings:
+        analysis.findings.append(VulnerabilityFinding(
+            user_id=analysis.user_id,
+            severity=finding['severity'],
+            title=finding.get('title') or finding.get('message'),
+            location=finding.get('location') or (f"line {finding['line']}" if finding.get('line') else None),
+            source=source,
+        ))
+
+
+def severity_counts(user_id) -> Dict[str, int]:
+    """Count a user's findings per severity with one grouped query"""
+    counts = dict(
+        db.session.query(VulnerabilityFinding.severity, func.count(VulnerabilityFinding.id))
+                  .filter(VulnerabilityFinding.user_id == user_id)
+                  .group_by(VulnerabilityFinding.severity)
+                  .all()
+    )
+    return {severity: counts.get(severity, 0) for severity in SEVERITIES}
+
+
+def backfill_findings(batch_size=500) -> int:
+    """Parse stored vulnerability reports that predate write-time extraction"""
+    analyses = CodeAnalysis.query.filter(
+        CodeAnalysis.analysis_type == 'vulnerability',
+        CodeAnalysis.max_severity.is_(None)
+    ).limit(batch_size).all()
+
+    for analysis in analyses:
+        findings, _ = extract_findings(analysis.analysis_result)
+        attach_findings(analysis, findings)
+
+    db.session.commit()
+    return len(analyses)